@@ -1,9 +1,8 @@
 from typing import Dict, List, Optional
 from collections import deque
+import asyncio
 import time
-from agno.agent import Agent
-from agno.models.google import Gemini
-from app.core.config import settings
+from app.agents.realtime.realtime_tip_provider import TipProvider, default_tip_provider
 
 class RealtimeFeedbackAgent:
     """
@@ -11,8 +10,10 @@ class RealtimeFeedbackAgent:
     Combines facial and voice analysis to provide live scoring, combos, and achievements.
     """
     
-    def __init__(self, difficulty: str = "intermediate"):
+    def __init__(self, difficulty: str = "intermediate", tip_provider: Optional[TipProvider] = None,
+                 user_id: Optional[str] = None, ai_tip_interval: float = 15):
         self.difficulty = difficulty
+        self.user_id = user_id
         
         # Difficulty thresholds
         self.thresholds = {
@@ -35,19 +36,12 @@ class RealtimeFeedbackAgent:
         self.unlocked_achievements = []
         self.achievement_definitions = self._define_achievements()
 
-        # AI Coach Initialization
+        # AI tips are generated in the background and attached to a later response
+        self.tip_provider = tip_provider or default_tip_provider
+        self.ai_tip_interval = ai_tip_interval
         self.last_ai_feedback_time = 0
-        self.ai_coach = Agent(
-            model=Gemini(id="gemini-2.0-flash", api_key=os.getenv("GEMINI_API_KEY")),
-            instructions=[
-                "You are an expert speech coach providing real-time feedback.",
-                "Give ONE concise, actionable tip (max 10 words) based on the user's current performance metrics.",
-                "Focus on the most critical area for improvement.",
-                "Be encouraging but direct.",
-                "Examples: 'Slow down slightly to improve clarity.', 'Great energy! Keep maintaining eye contact.', 'Vary your pitch to sound more engaging.'"
-            ],
-            markdown=False
-        )
+        self._ai_tip_task: Optional[asyncio.Task] = None
+        self._ready_ai_tip: Optional[str] = None
         
     def _define_achievements(self) -> Dict:
         """Define all possible achievements"""
@@ -121,19 +115,22 @@ class RealtimeFeedbackAgent:
         # Generate real-time feedback
         feedback_messages = self._generate_feedback(facial_analysis, voice_analysis, base_score)
         
-        # AI Feedback (every 15 seconds)
+        # AI tip finished since the last frame
+        if self._ready_ai_tip:
+            feedback_messages.insert(0, {"type": "ai_insight", "message": f"{self._ready_ai_tip} ✨", "icon": "sparkles"})
+            self._ready_ai_tip = None
+        
+        # Request a new AI tip (every ai_tip_interval seconds) without waiting for it
         current_time = time.time()
-        if current_time - self.last_ai_feedback_time > 15:
-            ai_tip = self._generate_ai_feedback({
+        if current_time - self.last_ai_feedback_time > self.ai_tip_interval:
+            if self._schedule_ai_tip({
                 "pace": voice_analysis.get("speech_rate_wpm", 0),
                 "pitch_var": voice_analysis.get("pitch_variation", 0),
                 "volume": voice_analysis.get("volume_db", 0),
                 "fillers": voice_analysis.get("filler_word_detected"),
                 "eye_contact": facial_analysis.get("eye_contact_score", 0),
                 "score": base_score
-            })
-            if ai_tip:
-                feedback_messages.insert(0, {"type": "ai_insight", "message": f"{ai_tip} ✨", "icon": "sparkles"})
+            }):
                 self.last_ai_feedback_time = current_time
         
         # Check for achievements
@@ -326,6 +323,7 @@ class RealtimeFeedbackAgent:
     
     def reset(self):
         """Reset the agent state"""
+        self.cancel_ai_tip()
         self.current_combo = 0
         self.max_combo = 0
         self.consecutive_good_frames = 0
@@ -334,22 +332,32 @@ class RealtimeFeedbackAgent:
         self.feedback_history.clear()
         self.unlocked_achievements = []
     
-    def _generate_ai_feedback(self, metrics: Dict) -> Optional[str]:
-        """Generate a short AI coaching tip using Gemini"""
+    def _schedule_ai_tip(self, metrics: Dict) -> bool:
+        """
+        Start generating an AI tip in the background.
+        
+        Returns:
+            True if a request was started (False if one is in flight or there is no event loop)
+        """
+        if self._ai_tip_task and not self._ai_tip_task.done():
+            return False
         try:
-            # Construct a minimal prompt for speed
-            prompt = (
-                f"Metrics: pace={metrics['pace']}wpm (optimum 120-160), "
-                f"pitch_var={metrics['pitch_var']} (low<5, high>20), "
-                f"eye_contact={int(metrics['eye_contact']*100)}%, "
-                f"fillers={metrics['fillers']}, "
-                f"score={int(metrics['score'])}/100."
-            )
-            
-            response = self.ai_coach.run(prompt)
-            if response and response.content:
-                return response.content.strip()
-            return None
-        except Exception as e:
-            print(f"AI Feedback Error: {e}")
-            return None
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return False
+        
+        self._ai_tip_task = loop.create_task(self._generate_ai_feedback(metrics))
+        return True
+    
+    async def _generate_ai_feedback(self, metrics: Dict):
+        """Generate a short AI coaching tip; it is shown with the next response"""
+        tip = await self.tip_provider.generate(metrics, user_id=self.user_id)
+        if tip:
+            self._ready_ai_tip = tip
+    
+    def cancel_ai_tip(self):
+        """Cancel any in-flight AI tip request"""
+        if self._ai_tip_task and not self._ai_tip_task.done():
+            self._ai_tip_task.cancel()
+        self._ai_tip_task = None
+        self._ready_ai_tip = None
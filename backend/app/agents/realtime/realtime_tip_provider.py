@@ -0,0 +1,77 @@
+"""
+Async AI tip providers for the realtime feedback agent.
+Tips come from the shared LLM gateway so no per-session agent or client is
+created and the event loop is never blocked on the network.
+"""
+import logging
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional
+
+from app.core.llm_gateway import llm_gateway
+
+logger = logging.getLogger(__name__)
+
+TIP_INSTRUCTIONS = [
+    "You are an expert speech coach providing real-time feedback.",
+    "Give ONE concise, actionable tip (max 10 words) based on the user's current performance metrics.",
+    "Focus on the most critical area for improvement.",
+    "Be encouraging but direct.",
+    "Examples: 'Slow down slightly to improve clarity.', 'Great energy! Keep maintaining eye contact.', 'Vary your pitch to sound more engaging.'"
+]
+
+
+class TipProvider(ABC):
+    """Interface for async coaching tip sources"""
+
+    @abstractmethod
+    async def generate(self, metrics: Dict, user_id: Optional[str] = None) -> Optional[str]:
+        """
+        Produce a short tip for the given metrics.
+
+        Args:
+            metrics: pace, pitch_var, volume, fillers, eye_contact, score
+            user_id: Used for fair queuing on shared resources
+
+        Returns:
+            Tip text, or None if no tip could be produced
+        """
+
+
+class GatewayTipProvider(TipProvider):
+    """Tips from the shared OpenRouter gateway"""
+
+    def __init__(self, gateway=llm_gateway, max_tokens: int = 40):
+        self.gateway = gateway
+        self.max_tokens = max_tokens
+        self.system_prompt = "\n".join(TIP_INSTRUCTIONS)
+
+    def build_messages(self, metrics: Dict) -> List[Dict]:
+        # Minimal prompt for speed
+        prompt = (
+            f"Metrics: pace={metrics['pace']}wpm (optimum 120-160), "
+            f"pitch_var={metrics['pitch_var']} (low<5, high>20), "
+            f"eye_contact={int(metrics['eye_contact']*100)}%, "
+            f"fillers={metrics['fillers']}, "
+            f"score={int(metrics['score'])}/100."
+        )
+        return [
+            {"role": "system", "content": self.system_prompt},
+            {"role": "user", "content": prompt}
+        ]
+
+    async def generate(self, metrics: Dict, user_id: Optional[str] = None) -> Optional[str]:
+        try:
+            tip = await self.gateway.chat(
+                self.build_messages(metrics),
+                user_id=user_id,
+                temperature=0.7,
+                max_tokens=self.max_tokens
+            )
+            return tip.strip() or None
+        except Exception as e:
+            logger.warning(f"⚠️ AI tip generation failed: {e}")
+            return None
+
+
+# Shared by every RealtimeFeedbackAgent
+default_tip_provider = GatewayTipProvider()
@@ -75,6 +75,16 @@ async def verify_token(
     except Exception:
         raise HTTPException(status_code=401, detail="Invalid token")
 
+async def get_optional_user(
+    request: Request,
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+):
+    """The signed-in user, or None for anonymous requests (never raises 401)"""
+    try:
+        return await verify_token(request, credentials)
+    except HTTPException:
+        return None
+
 @router.post("/signup", response_model=TokenResponse)
 async def signup(user_data: UserSignup, response: Response):
     # Check if user exists
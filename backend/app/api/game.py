@@ -4,7 +4,7 @@ API endpoints for game mechanics: difficulty, challenges, leaderboard
 
 from fastapi import APIRouter, HTTPException, Depends
 from typing import List, Optional
-from datetime import datetime, timedelta
+from datetime import datetime
 from app.db.mongodb import (
     challenges_collection,
     user_challenges_collection,
@@ -14,11 +14,19 @@ from app.db.mongodb import (
 )
 from app.db.models_mongo import (
     ChallengeInDB,
-    UserChallengeInDB,
-    LeaderboardEntryInDB
+    UserChallengeInDB
 )
 from app.core.difficulty import DIFFICULTY_CONFIGS, get_difficulty_config
-from bson import ObjectId
+from app.core.leaderboard import (
+    LEADERBOARD_CATEGORIES,
+    leaderboard_engine,
+    period_bucket,
+    submit_score,
+    get_user_rank as leaderboard_rank
+)
+from redis.exceptions import RedisError
+from app.core.challenge_catalog import challenge_catalog
+from app.db.serialization import serialize_doc
 
 router = APIRouter(prefix="/game", tags=["game-mechanics"])
 
@@ -44,49 +52,11 @@ async def get_difficulty_detail(level: str):
 
 # ============= CHALLENGES ENDPOINTS =============
 
-def serialize_doc(doc):
-    """Convert MongoDB document to JSON-serializable dict"""
-    if doc is None:
-        return None
-    result = {}
-    for key, value in doc.items():
-        if key == "_id":
-            result["id"] = str(value)
-        elif isinstance(value, ObjectId):
-            result[key] = str(value)
-        elif isinstance(value, datetime):
-            result[key] = value.isoformat()
-        elif isinstance(value, dict):
-            result[key] = serialize_doc(value)
-        elif isinstance(value, list):
-            result[key] = [
-                serialize_doc(item) if isinstance(item, dict) else 
-                str(item) if isinstance(item, ObjectId) else item
-                for item in value
-            ]
-        else:
-            result[key] = value
-    return result
-
-
 @router.get("/challenges/active")
 async def get_active_challenges(user_id: Optional[str] = None):
     """Get all currently active challenges"""
-    now = datetime.utcnow()
-    
-    # Get active challenges
-    query = {
-        "active": True,
-        "$or": [
-            {"expires_at": {"$gt": now}},
-            {"expires_at": None}
-        ]
-    }
-    
-    challenges_raw = await challenges_collection.find(query).to_list(100)
-    
-    # Serialize challenges to convert ObjectId to string
-    challenges = [serialize_doc(c) for c in challenges_raw]
+    catalog = await challenge_catalog.get()
+    challenges = catalog.active_serialized()
     
     # If user_id provided, get their progress
     if user_id:
@@ -203,20 +173,9 @@ async def get_active_session_challenges(user_id: str):
     Get challenges that can be progressed during an active practice session.
     Returns challenges with their current progress and targets for real-time display.
     """
-    from datetime import datetime
-    
-    now = datetime.utcnow()
-    
-    # Get active challenges (not expired, not completed or not claimed)
-    query = {
-        "active": True,
-        "$or": [
-            {"expires_at": {"$gt": now}},
-            {"expires_at": None}
-        ]
-    }
-    
-    challenges = await challenges_collection.find(query).to_list(100)
+    # Get active challenges (not expired)
+    catalog = await challenge_catalog.get()
+    challenges = catalog.active()
     
     # Get user's progress
     user_progress = {}
@@ -286,19 +245,19 @@ async def get_active_session_challenges(user_id: str):
 
 def _get_target_display(requirements: dict) -> str:
     """Helper to format target value for display"""
-    if "min_eye_contact_percent" in requirements:
+    if requirements.get("min_eye_contact_percent") is not None:
         return f"{requirements['min_eye_contact_percent']}%"
-    if "target_wpm_min" in requirements and "target_wpm_max" in requirements:
+    if requirements.get("target_wpm_min") is not None and requirements.get("target_wpm_max") is not None:
         return f"{requirements['target_wpm_min']}-{requirements['target_wpm_max']} WPM"
-    if "min_facial_confidence" in requirements:
+    if requirements.get("min_facial_confidence") is not None:
         return f"{requirements['min_facial_confidence']}%"
-    if "min_content_clarity" in requirements:
+    if requirements.get("min_content_clarity") is not None:
         return f"{requirements['min_content_clarity']}%"
-    if "volume_min_db" in requirements and "volume_max_db" in requirements:
+    if requirements.get("volume_min_db") is not None and requirements.get("volume_max_db") is not None:
         return f"{requirements['volume_min_db']}-{requirements['volume_max_db']} dB"
-    if "min_engagement_score" in requirements:
+    if requirements.get("min_engagement_score") is not None:
         return f"{requirements['min_engagement_score']}%"
-    if "target_session_count" in requirements:
+    if requirements.get("target_session_count") is not None:
         return f"{requirements['target_session_count']} sessions"
     return "Complete"
 
@@ -313,32 +272,14 @@ async def get_leaderboard(
 ):
     """Get top performers for a category"""
     
-    # Determine time cutoff
-    now = datetime.utcnow()
-    if category == "daily":
-        cutoff = now - timedelta(days=1)
-    elif category == "weekly":
-        cutoff = now - timedelta(weeks=1)
-    elif category == "all_time":
-        cutoff = None
-    else:
+    if category not in LEADERBOARD_CATEGORIES:
         raise HTTPException(status_code=400, detail="Invalid category")
     
-    # Build query
-    query = {"category": category}
-    if cutoff:
-        query["timestamp"] = {"$gte": cutoff}
-    if difficulty != "all":
-        query["difficulty"] = difficulty
-    
-    # Get leaderboard entries
-    entries = await leaderboard_collection.find(query).sort(
-        "score", -1
-    ).limit(limit).to_list(limit)
-    
-    # Add ranks
-    for i, entry in enumerate(entries):
-        entry["rank"] = i + 1
+    try:
+        entries = await leaderboard_engine.top(category, difficulty, limit)
+    except RedisError as e:
+        print(f"⚠️ Leaderboard cache unavailable, reading Mongo: {e}")
+        entries = await _get_leaderboard_from_mongo(category, difficulty, limit)
     
     return {
         "leaderboard": entries,
@@ -348,6 +289,34 @@ async def get_leaderboard(
     }
 
 
+async def _get_leaderboard_from_mongo(category: str, difficulty: str, limit: int) -> List[dict]:
+    """Fallback leaderboard read used when Redis is unavailable"""
+    query = {"category": category, "period": period_bucket(category)}
+    if difficulty != "all":
+        query["difficulty"] = difficulty
+        entries = await leaderboard_collection.find(query).sort(
+            "score", -1
+        ).limit(limit).to_list(limit)
+    else:
+        # One row per (user, difficulty); keep each user's best, as the Redis "all" set does
+        entries = await leaderboard_collection.aggregate([
+            {"$match": query},
+            {"$sort": {"score": -1}},
+            {"$group": {"_id": "$user_id", "entry": {"$first": "$$ROOT"}}},
+            {"$replaceRoot": {"newRoot": "$entry"}},
+            {"$sort": {"score": -1}},
+            {"$limit": limit}
+        ]).to_list(limit)
+    
+    # Add ranks
+    result = []
+    for i, entry in enumerate(entries):
+        entry = serialize_doc(entry)
+        entry["rank"] = i + 1
+        result.append(entry)
+    return result
+
+
 @router.post("/leaderboard/submit")
 async def submit_leaderboard_entry(
     user_id: str,
@@ -358,43 +327,14 @@ async def submit_leaderboard_entry(
 ):
     """Submit a new leaderboard entry"""
     
-    # Create entry for all categories
-    categories = ["daily", "weekly", "all_time"]
+    # One round-trip: upsert the daily, weekly and all-time buckets together
+    await submit_score(user_id, username, score, difficulty, session_id)
     
-    for category in categories:
-        # Check for existing entry
-        existing = await leaderboard_collection.find_one({
-            "user_id": user_id,
-            "category": category,
-            "difficulty": difficulty
-        })
-
-        if existing:
-            # Only update if new score is higher
-            if score > existing["score"]:
-                await leaderboard_collection.update_one(
-                    {"_id": existing["_id"]},
-                    {
-                        "$set": {
-                            "score": score,
-                            "session_id": session_id,
-                            "timestamp": datetime.utcnow(),
-                            "username": username # Update username in case it changed
-                        }
-                    }
-                )
-        else:
-            # Insert new entry
-            entry = LeaderboardEntryInDB(
-                user_id=user_id,
-                username=username,
-                score=score,
-                difficulty=difficulty,
-                session_id=session_id,
-                category=category,
-                timestamp=datetime.utcnow()
-            )
-            await leaderboard_collection.insert_one(entry.dict(by_alias=True))
+    # Mongo is the durable store; the sorted sets can be rebuilt from it
+    try:
+        await leaderboard_engine.record(user_id, username, score, difficulty, session_id)
+    except RedisError as e:
+        print(f"⚠️ Failed to update leaderboard cache: {e}")
     
     return {
         "success": True,
@@ -406,25 +346,11 @@ async def submit_leaderboard_entry(
 async def get_user_rank(user_id: str, category: str = "all_time", difficulty: str = "all"):
     """Get a user's current rank"""
     
-    # Build query
-    query = {"category": category}
-    if difficulty != "all":
-        query["difficulty"] = difficulty
-    
-    # Get all entries sorted by score
-    all_entries = await leaderboard_collection.find(query).sort(
-        "score", -1
-    ).to_list(10000)
-    
-    # Find user's rank
-    user_rank = None
-    user_score = None
-    
-    for i, entry in enumerate(all_entries):
-        if entry["user_id"] == user_id:
-            user_rank = i + 1
-            user_score = entry["score"]
-            break
+    try:
+        user_rank = await leaderboard_engine.rank(user_id, category, difficulty)
+    except RedisError as e:
+        print(f"⚠️ Leaderboard cache unavailable, ranking from Mongo: {e}")
+        user_rank = await leaderboard_rank(user_id, category, difficulty)
     
     if user_rank is None:
         return {
@@ -432,10 +358,13 @@ async def get_user_rank(user_id: str, category: str = "all_time", difficulty: st
             "message": "User not on leaderboard yet"
         }
     
+    rank = user_rank["rank"]
+    total_players = user_rank["total_players"]
+    
     return {
         "ranked": True,
-        "rank": user_rank,
-        "score": user_score,
-        "total_players": len(all_entries),
-        "percentile": round((1 - (user_rank / len(all_entries))) * 100, 2)
+        "rank": rank,
+        "score": user_rank["score"],
+        "total_players": total_players,
+        "percentile": round((1 - (rank / total_players)) * 100, 2)
     }
@@ -1,25 +1,35 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException, Depends, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, UploadFile, File, HTTPException, Depends, WebSocket, WebSocketDisconnect, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
+from fastapi.encoders import jsonable_encoder
 from pydantic import BaseModel
+from typing import Optional
 from app.worker import analyze_video_task
 import logging
-from celery.result import AsyncResult
 from bson import ObjectId
 from app.db.mongodb import (
     analysis_results_collection,
     realtime_sessions_collection,
-    realtime_metrics_collection,
     realtime_achievements_collection,
     init_db
 )
-from app.api.auth import router as auth_router
+from app.api.auth import router as auth_router, get_optional_user
 from app.api.game import router as game_router
 from app.api.websocket import manager, handle_websocket_message
-import shutil
-import os
+import asyncio
 import uuid
 from datetime import datetime
+from app.core.config import settings
+from app.core.upload_spool import upload_spool, UploadTooLarge
+from app.core.task_status import get_task_status, status_etag, wait_for_status_change
+from app.core.analysis_history import get_history_page
+from app.core.emotion_timeline import format_facial_analysis
+from app.core.realtime_stats import aggregate_session_stats
+from app.core.metrics_buffer import metrics_buffer, flush_session, close_buffers
+from app.core.llm_gateway import llm_gateway
+from app.core.feedback_cache import feedback_cache
+from app.core.metrics_rollup import RESOLUTIONS, run_rollups, get_session_timeline
+from app.core.leaderboard import leaderboard_engine
 
 # Initialize FastAPI app
 app = FastAPI()
@@ -33,6 +43,43 @@ app.include_router(game_router)
 async def startup_db_client():
     await init_db()
 
+# Load the leaderboard sorted sets from Mongo (Redis may have been flushed)
+@app.on_event("startup")
+async def startup_leaderboard():
+    try:
+        await leaderboard_engine.rebuild()
+    except Exception as e:
+        logging.warning(f"⚠️ Leaderboard rebuild skipped, sets load on first read: {e}")
+
+# Sweep uploads orphaned by crashed requests or workers
+@app.on_event("startup")
+async def startup_upload_sweeper():
+    app.state.upload_sweeper = asyncio.create_task(
+        upload_spool.run_sweeper(settings.UPLOAD_SWEEP_INTERVAL_SECONDS)
+    )
+
+# Downsample realtime metrics for replay and history charts
+@app.on_event("startup")
+async def startup_metrics_rollups():
+    app.state.metrics_rollups = asyncio.create_task(
+        run_rollups(settings.METRICS_ROLLUP_INTERVAL_SECONDS, settings.METRICS_ROLLUP_LOOKBACK_SECONDS)
+    )
+
+# Stop the background jobs before the clients they use are closed
+@app.on_event("shutdown")
+async def shutdown_background_jobs():
+    for name in ("upload_sweeper", "metrics_rollups"):
+        task = getattr(app.state, name, None)
+        if task is None or task.done():
+            continue
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logging.error(f"❌ Background job {name} failed during shutdown: {e}")
+
 # Configure CORS with restricted origins for security
 app.add_middleware(
     CORSMiddleware,
@@ -45,6 +92,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Next-Cursor"],
 )
 
 # Define the request body model
@@ -67,137 +115,144 @@ async def root():
 async def health_check():
     """Check if service is running and components are healthy"""
     from app.core.component_health import get_health_status
-    return await get_health_status()
+    status = await get_health_status()
+    status["metrics_buffer"] = metrics_buffer.stats()
+    status["llm_gateway"] = llm_gateway.stats()
+    status["feedback_cache"] = feedback_cache.stats()
+    return status
 
 # Define the analysis endpoint
 @app.post("/analyze")
-async def analyze(video: UploadFile = File(...)):
+async def analyze(video: UploadFile = File(...), current_user: Optional[dict] = Depends(get_optional_user)):
     # Validate file type
     allowed_types = ["video/mp4", "video/quicktime", "video/x-matroska", "video/webm"]
     if video.content_type not in allowed_types:
         raise HTTPException(status_code=400, detail=f"Invalid file type. Allowed: {', '.join(allowed_types)}")
-        
-    # Validate file size (approximate, using seek/tell if needed, or reading chunks)
-    # Using spooled file, we can check size if rolled over to disk or internal attribute
-    # For now, let's rely on content-length header if available or limit read
-    # Better: check file size after saving or check content-length header
-    if video.size and video.size > 50 * 1024 * 1024: # 50MB
+
+    # Reject early when the client declared the size; the spool enforces the
+    # limit again while streaming for uploads without a reliable size
+    if video.size and video.size > upload_spool.max_bytes:
          raise HTTPException(status_code=400, detail="File too large. Maximum size is 50MB.")
-         
-    # Create temp directory if not exists
-    temp_dir = "temp_uploads"
-    os.makedirs(temp_dir, exist_ok=True)
-    
-    # Generate unique filename
-    file_extension = os.path.splitext(video.filename)[1]
-    temp_filename = f"{uuid.uuid4()}{file_extension}"
-    temp_file_path = os.path.join(temp_dir, temp_filename)
-    
+
     try:
-        # Save uploaded file
-        with open(temp_file_path, "wb") as buffer:
-            shutil.copyfileobj(video.file, buffer)
-            
-        # Check size after save to be sure
-        file_size = os.path.getsize(temp_file_path)
-        if file_size > 50 * 1024 * 1024:
-            os.remove(temp_file_path)
-            raise HTTPException(status_code=400, detail="File too large. Maximum size is 50MB.")
-            
-        # Get absolute path for the agent
-        absolute_path = os.path.abspath(temp_file_path)
-        
-        # Trigger Celery task
-        task = analyze_video_task.delay(absolute_path)
+        spooled = await upload_spool.ingest(video)
+    except UploadTooLarge:
+        raise HTTPException(status_code=400, detail="File too large. Maximum size is 50MB.")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    task = None
+    try:
+        # Trigger Celery task; the worker discards the spooled file when done
+        task = analyze_video_task.delay(spooled.path)
         
-        # Create MongoDB Record
-        result_doc = {
-            "task_id": task.id,
-            "video_filename": video.filename,
-            "status": "PENDING",
-            "created_at": datetime.utcnow()
-        }
-        await analysis_results_collection.insert_one(result_doc)
+        # Create MongoDB Record (the worker may already have upserted its first stage)
+        await analysis_results_collection.update_one(
+            {"task_id": task.id},
+            {
+                "$set": {
+                    "video_filename": video.filename,
+                    "content_sha256": spooled.sha256,
+                    "size_bytes": spooled.size,
+                    # Scopes /history?user_id=...; None for anonymous uploads
+                    "user_id": str(current_user["_id"]) if current_user else None
+                },
+                "$setOnInsert": {
+                    "status": "PENDING",
+                    "progress": 0,
+                    "status_version": 0,
+                    "created_at": datetime.utcnow()
+                }
+            },
+            upsert=True
+        )
             
         return JSONResponse(content={"task_id": task.id, "status": "processing"})
         
     except Exception as e:
+        if task is None:
+            upload_spool.discard(spooled.path)
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/status/{task_id}")
-async def get_status(task_id: str):
-    task_result = AsyncResult(task_id)
-    
-    if task_result.state == 'PENDING':
-        return {"state": task_result.state, "status": "Pending..."}
-    elif task_result.state != 'FAILURE':
-        return {
-            "state": task_result.state,
-            "result": task_result.result if task_result.state == 'SUCCESS' else None
-        }
-    else:
-        return {
-            "state": task_result.state,
-            "error": str(task_result.info)
-        }
+async def get_status(task_id: str, request: Request, wait: float = 0):
+    """
+    Compact task status (state, stage, progress).
+
+    Send the previous ETag in If-None-Match together with `wait` (seconds)
+    to long-poll: the request returns as soon as the status changes, or 304
+    once `wait` elapses. Full results are served by /analysis/{task_id}.
+    """
+    status = await get_task_status(task_id)
+    etag = status_etag(status)
+
+    if request.headers.get("if-none-match") == etag:
+        wait = max(0.0, min(wait, settings.STATUS_LONG_POLL_MAX_SECONDS))
+        changed = await wait_for_status_change(task_id, etag, wait) if wait else None
+        if changed is None:
+            return Response(status_code=304, headers={"ETag": etag})
+        status = changed
+        etag = status_etag(status)
+
+    return JSONResponse(content=status, headers={"ETag": etag})
 
 from sse_starlette.sse import EventSourceResponse
-import redis
-import asyncio
+from app.core.task_stream import stream_task_logs, close_redis
 
-# Get Redis URL from env or default to localhost
-REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+@app.on_event("shutdown")
+async def shutdown_redis_client():
+    await close_redis()
+
+@app.on_event("shutdown")
+async def shutdown_metrics_buffers():
+    await close_buffers()
+
+@app.on_event("shutdown")
+async def shutdown_llm_gateway():
+    await llm_gateway.close()
 
 @app.get("/stream/{task_id}")
 async def stream_logs(task_id: str):
-    async def event_generator():
-        r = redis.from_url(REDIS_URL)
-        pubsub = r.pubsub()
-        pubsub.subscribe(f"task_logs:{task_id}")
-        
-        # Yield initial message
-        yield {"data": "Connection Established..."}
-        
-        try:
-            while True:
-                message = pubsub.get_message(ignore_subscribe_messages=True)
-                if message:
-                    data = message['data'].decode('utf-8')
-                    if data == "DONE":
-                        yield {"data": "Analysis Completed."}
-                        break
-                    yield {"data": data}
-                await asyncio.sleep(0.1)
-        except asyncio.CancelledError:
-            pubsub.close()
-            
-    return EventSourceResponse(event_generator())
+    return EventSourceResponse(
+        stream_task_logs(task_id),
+        ping=int(settings.TASK_STREAM_HEARTBEAT_SECONDS)
+    )
 
 # History Endpoint
 @app.get("/history")
-async def get_history():
-    results = await analysis_results_collection.find().sort("created_at", -1).to_list(100)
-    return [
-        {
-            "id": str(r["_id"]),
-            "task_id": r["task_id"],
-            "video_filename": r["video_filename"],
-            "status": r["status"],
-            "created_at": r["created_at"],
-            "total_score": r.get("total_score"),
-            "feedback_summary": r.get("feedback_analysis", {}).get("feedback_summary") if r.get("feedback_analysis") else None
-        }
-        for r in results
-    ]
+async def get_history(limit: int = 100, cursor: Optional[str] = None, user_id: Optional[str] = None):
+    """
+    Newest-first analysis summaries.
+
+    Pages are chained through the X-Next-Cursor response header; pass its
+    value back as `cursor` to fetch the next page.
+    """
+    limit = max(1, min(limit, 100))
+    try:
+        rows, next_cursor = await get_history_page(limit=limit, cursor=cursor, user_id=user_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else {}
+    return JSONResponse(content=jsonable_encoder(rows), headers=headers)
 
 @app.get("/analysis/{task_id}")
-async def get_analysis(task_id: str):
+async def get_analysis(task_id: str, timeline: str = "expanded"):
+    """
+    Full analysis result.
+
+    `timeline=compact` returns the emotion timeline as run-length encoded
+    segments instead of one entry per sampled frame.
+    """
+    if timeline not in ("expanded", "compact"):
+        raise HTTPException(status_code=400, detail="timeline must be 'expanded' or 'compact'")
+
     result = await analysis_results_collection.find_one({"task_id": task_id})
     if not result:
         raise HTTPException(status_code=404, detail="Analysis not found")
     
     return {
-        "facial": result.get("facial_analysis"),
+        "facial": format_facial_analysis(result.get("facial_analysis"), timeline),
         "voice": result.get("voice_analysis"),
         "content": result.get("content_analysis"),
         "feedback": result.get("feedback_analysis"),
@@ -244,18 +299,11 @@ async def end_realtime_session(session_id: str):
     ended_at = datetime.utcnow()
     duration_seconds = int((ended_at - session["started_at"]).total_seconds())
     
-    # Calculate stats from metrics
-    metrics = await realtime_metrics_collection.find({"session_id": session_id}).to_list(1000)
-    
-    average_score = None
-    max_combo = None
-    if metrics:
-        average_score = sum(m["total_score"] for m in metrics) / len(metrics)
-        max_combo = max(m["combo_count"] for m in metrics)
+    # Buffered metrics must land before they are aggregated
+    await flush_session(session_id)
     
-    # Calculate total XP from achievements
-    achievements = await realtime_achievements_collection.find({"session_id": session_id}).to_list(100)
-    total_xp_earned = sum(a["xp_earned"] for a in achievements)
+    # Aggregate stats server-side (independent of session length)
+    stats = await aggregate_session_stats(session_id)
     
     # Update session
     await realtime_sessions_collection.update_one(
@@ -263,19 +311,20 @@ async def end_realtime_session(session_id: str):
         {"$set": {
             "ended_at": ended_at,
             "duration_seconds": duration_seconds,
-            "average_score": average_score,
-            "max_combo": max_combo,
-            "total_xp_earned": total_xp_earned
+            "average_score": stats["average_score"],
+            "max_combo": stats["max_combo"],
+            "total_xp_earned": stats["total_xp_earned"],
+            "filler_words_count": stats["filler_words_count"]
         }}
     )
     
     return {
         "session_id": session_id,
         "duration_seconds": duration_seconds,
-        "average_score": average_score,
-        "max_combo": max_combo,
-        "total_xp_earned": total_xp_earned,
-        "achievements_count": len(achievements)
+        "average_score": stats["average_score"],
+        "max_combo": stats["max_combo"],
+        "total_xp_earned": stats["total_xp_earned"],
+        "achievements_count": stats["achievements_count"]
     }
 
 
@@ -314,6 +363,24 @@ async def get_session_stats(session_id: str):
     }
 
 
+@app.get("/realtime/session/{session_id}/timeline")
+async def get_session_timeline_endpoint(session_id: str, resolution: str = "1s"):
+    """Downsampled metrics timeline for session replay and charts (resolution: 1s or 1m)"""
+    if resolution not in RESOLUTIONS:
+        raise HTTPException(status_code=400, detail=f"resolution must be one of: {', '.join(RESOLUTIONS)}")
+    
+    session = await realtime_sessions_collection.find_one({"session_id": session_id}, {"_id": 1})
+    if not session:
+        raise HTTPException(status_code=404, detail="Session not found")
+    
+    timeline = await get_session_timeline(session_id, resolution)
+    return {
+        "session_id": session_id,
+        "resolution": resolution,
+        "points": jsonable_encoder(timeline)
+    }
+
+
 @app.websocket("/ws/realtime-analysis/{session_id}")
 async def realtime_analysis_websocket(websocket: WebSocket, session_id: str):
     """WebSocket endpoint for real-time video/audio analysis"""
@@ -336,12 +403,14 @@ async def realtime_analysis_websocket(websocket: WebSocket, session_id: str):
         except WebSocketDisconnect:
             logging.info(f"WS Disconnect session {session_id}")
             manager.disconnect(session_id)
+            await flush_session(session_id)
         except Exception as e:
             logging.error(f"WS Error session {session_id}: {e}")
             import traceback
             traceback.print_exc()
             await manager.send_message(session_id, {"error": str(e)})
             manager.disconnect(session_id)
+            await flush_session(session_id)
             
     except Exception as e:
         logging.error(f"WS Connection Setup Error for {session_id}: {e}")
@@ -391,9 +460,8 @@ async def practice_websocket(websocket: WebSocket, session_id: str):
                     score_result = await enhanced_manager.calculate_score(session_id)
                     logging.debug(f"📊 Score result, keys: {list(score_result.keys()) if score_result else 'None'}")
                     
-                    # Periodically get feedback
-                    feedback_result = await enhanced_manager.generate_feedback(session_id)
-                    logging.debug(f"💬 Feedback result: {feedback_result.get('feedback', '')[:50] if feedback_result else 'None'}...")
+                    # Feedback is generated in the background and pushed as coach_feedback
+                    enhanced_manager.schedule_feedback(session_id)
                     
                     # Send comprehensive response
                     response_data = {
@@ -401,7 +469,6 @@ async def practice_websocket(websocket: WebSocket, session_id: str):
                         "facial_analysis": result.get("facial_analysis") if result else None,
                         "voice_analysis": result.get("voice_analysis") if result else None,
                         "score": score_result.get("score") if score_result else None,
-                        "feedback": feedback_result.get("feedback") if feedback_result else None,
                         "timestamp": datetime.now().isoformat()
                     }
                     
@@ -411,6 +478,11 @@ async def practice_websocket(websocket: WebSocket, session_id: str):
                     
                     await enhanced_manager.broadcast_to_session(session_id, response_data)
                     logging.debug(f"✅ Response broadcasted to {session_id}")
+                    
+                    # Push challenge progress only when it moved
+                    challenge_update = enhanced_manager.get_challenge_progress(session_id)
+                    if challenge_update:
+                        await enhanced_manager.broadcast_to_session(session_id, challenge_update)
                 
                 elif message_type == "audio_chunk":
                     # Process audio
@@ -424,6 +496,10 @@ async def practice_websocket(websocket: WebSocket, session_id: str):
                             "voice": result.get("voice_analysis"),
                             "timestamp": datetime.now().isoformat()
                         })
+                        
+                        challenge_update = enhanced_manager.get_challenge_progress(session_id)
+                        if challenge_update:
+                            await enhanced_manager.broadcast_to_session(session_id, challenge_update)
                     else:
                         logging.error(f"❌ Audio processing error: {result.get('error')}")
                 
@@ -445,6 +521,7 @@ async def practice_websocket(websocket: WebSocket, session_id: str):
                         "message": "Practice session ended. Great work!",
                         "timestamp": datetime.now().isoformat()
                     })
+                    await enhanced_manager.close_session(session_id)
                     break
                 
                 else:
@@ -452,7 +529,7 @@ async def practice_websocket(websocket: WebSocket, session_id: str):
                     
         except WebSocketDisconnect:
             logging.info(f"👋 Client disconnected: {session_id}")
-            enhanced_manager.disconnect(session_id)
+            await enhanced_manager.close_session(session_id)
         except Exception as e:
             logging.error(f"❌ WebSocket error in {session_id}: {e}", exc_info=True)
             try:
@@ -463,7 +540,7 @@ async def practice_websocket(websocket: WebSocket, session_id: str):
                 })
             except:
                 pass
-            enhanced_manager.disconnect(session_id)
+            await enhanced_manager.close_session(session_id)
             
     except Exception as e:
         logging.error(f"❌ WebSocket setup error for {session_id}: {e}", exc_info=True)
@@ -8,7 +8,7 @@ import numpy as np
 import cv2
 from datetime import datetime
 
-from app.db.mongodb import realtime_metrics_collection, realtime_achievements_collection
+from app.core.metrics_buffer import metrics_buffer, achievements_buffer
 from app.agents.realtime.realtime_facial_agent import RealtimeFacialAgent
 from app.agents.realtime.realtime_voice_agent import RealtimeVoiceAgent
 from app.agents.realtime.realtime_feedback_agent import RealtimeFeedbackAgent
@@ -177,7 +177,7 @@ async def generate_feedback(session_id: str) -> Dict:
         # Generate feedback
         feedback = feedback_agent.analyze_performance(facial_analysis, voice_analysis)
         
-        # Store metrics in MongoDB
+        # Queue metrics for MongoDB (batched write-behind)
         metric_doc = {
             "session_id": session_id,
             "timestamp": datetime.utcnow(),
@@ -191,9 +191,9 @@ async def generate_feedback(session_id: str) -> Dict:
             "smile_score": facial_analysis["smile_score"] * 100,
             "speech_rate_wpm": voice_analysis["speech_rate_wpm"]
         }
-        await realtime_metrics_collection.insert_one(metric_doc)
+        metrics_buffer.add(session_id, metric_doc)
         
-        # Store achievements if any
+        # Store achievements if any (written behind, like the metrics)
         for achievement in feedback.get("new_achievements", []):
             achievement_doc = {
                 "session_id": session_id,
@@ -203,7 +203,7 @@ async def generate_feedback(session_id: str) -> Dict:
                 "xp_earned": achievement["xp"],
                 "unlocked_at": datetime.utcnow()
             }
-            await realtime_achievements_collection.insert_one(achievement_doc)
+            achievements_buffer.add(session_id, achievement_doc)
         
         return {
             "type": "feedback",
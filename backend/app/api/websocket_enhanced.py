@@ -4,6 +4,7 @@ Drop-in replacement for WebSocket.py with full AI/ML integration
 """
 
 import json
+import logging
 import uuid
 import asyncio
 import base64
@@ -14,6 +15,9 @@ from typing import Dict, Optional
 
 # Add this import to integrate with new AI coach system
 from app.core.ai_coach_session import AICoachSession
+from app.core.feedback_scheduler import FeedbackScheduler
+
+logger = logging.getLogger(__name__)
 
 
 class EnhancedConnectionManager:
@@ -24,6 +28,7 @@ class EnhancedConnectionManager:
     def __init__(self):
         self.active_connections: Dict[str, any] = {}
         self.active_sessions: Dict[str, AICoachSession] = {}
+        self.feedback_schedulers: Dict[str, FeedbackScheduler] = {}
     
     async def connect(self, session_id: str, websocket, user_id: str, difficulty: str = "intermediate"):
         """Accept connection and initialize AI coach session"""
@@ -38,11 +43,21 @@ class EnhancedConnectionManager:
                 user_id=user_id,
                 difficulty=difficulty
             )
+            self.feedback_schedulers[session_id] = FeedbackScheduler(
+                self.active_sessions[session_id],
+                lambda message: self.broadcast_to_session(session_id, message)
+            )
             print(f"✅ Session {session_id} registered. Active sessions: {list(self.active_sessions.keys())}")
         except Exception as e:
             print(f"❌ Failed to init AICoachSession for {session_id}: {e}")
             raise e
         
+        # Challenges are optional for a practice session
+        try:
+            await self.active_sessions[session_id].challenge_tracker.load()
+        except Exception as e:
+            print(f"⚠️ Failed to load challenges for {session_id}: {e}")
+        
         print(f"✅ Client connected: {session_id}")
         
         # Send connection confirmation
@@ -58,12 +73,23 @@ class EnhancedConnectionManager:
         if session_id in self.active_connections:
             del self.active_connections[session_id]
         
+        scheduler = self.feedback_schedulers.pop(session_id, None)
+        if scheduler:
+            asyncio.ensure_future(scheduler.close())
+        
         if session_id in self.active_sessions:
             self.active_sessions[session_id].reset()
             del self.active_sessions[session_id]
         
         print(f"❌ Client disconnected: {session_id}")
     
+    async def close_session(self, session_id: str):
+        """Persist session challenge progress once, then disconnect"""
+        session = self.active_sessions.get(session_id)
+        if session:
+            await session.challenge_tracker.persist()
+        self.disconnect(session_id)
+    
     async def broadcast_to_session(self, session_id: str, message: dict):
         """Send message to specific session"""
         if session_id not in self.active_connections:
@@ -147,6 +173,12 @@ class EnhancedConnectionManager:
             print(f"Error generating feedback: {e}")
             return {"error": str(e), "feedback": "Keep practicing!"}
     
+    def schedule_feedback(self, session_id: str):
+        """Request coach feedback without waiting; it arrives as a coach_feedback message"""
+        scheduler = self.feedback_schedulers.get(session_id)
+        if scheduler:
+            scheduler.request()
+    
     async def calculate_score(self, session_id: str) -> Dict:
         """Calculate performance score"""
         if session_id not in self.active_sessions:
@@ -161,6 +193,26 @@ class EnhancedConnectionManager:
             print(f"Error calculating score: {e}")
             return {"error": str(e)}
     
+    def get_challenge_progress(self, session_id: str) -> Optional[Dict]:
+        """Challenge progress message if any in-session progress changed, else None"""
+        session = self.active_sessions.get(session_id)
+        if not session:
+            return None
+        
+        try:
+            changes = session.challenge_tracker.poll_changes()
+        except Exception:
+            # Runs on every frame; a challenge bug must not end the practice session
+            logger.exception(f"⚠️ Challenge progress check failed for session {session_id}")
+            return None
+        if not changes:
+            return None
+        return {
+            "type": "challenge_progress",
+            "challenges": changes,
+            "timestamp": datetime.now().isoformat()
+        }
+    
     def get_session_summary(self, session_id: str) -> Dict:
         """Get session summary"""
         if session_id not in self.active_sessions:
@@ -9,7 +9,7 @@ import base64
 import cv2
 import numpy as np
 from datetime import datetime
-from typing import Dict, Optional
+from typing import Awaitable, Callable, Dict, Optional
 
 from app.core.emotion_detector import EmotionDetector
 from app.core.voice_quality_analyzer import VoiceQualityAnalyzer
@@ -19,6 +19,9 @@ from app.core.openrouter_coach_engine import OpenRouterCoachEngine
 from app.core.scoring_system import IntelligentScoringSystem
 from app.agents.realtime.realtime_voice_agent import RealtimeVoiceAgent
 from app.agents.realtime.realtime_facial_agent import RealtimeFacialAgent
+from app.core.session_challenges import SessionChallengeTracker
+from app.core.tip_engine import TipEngine, describe
+from app.core.config import settings
 
 
 class AICoachSession:
@@ -36,7 +39,7 @@ class AICoachSession:
         self.emotion_detector = EmotionDetector()
         self.voice_analyzer = VoiceQualityAnalyzer()
         # self.gemini_coach = GeminiCoachEngine()
-        self.gemini_coach = OpenRouterCoachEngine() # Keeping same variable name for compatibility or refactor? Let's keep it but maybe rename internal usage if needed.
+        self.gemini_coach = OpenRouterCoachEngine(user_id=user_id) # Keeping same variable name for compatibility or refactor? Let's keep it but maybe rename internal usage if needed.
         # Actually better to rename it to 'coach' or keep 'gemini_coach' to minimize diffs if logic is same.
         # Let's keep 'gemini_coach' as the attribute name to avoid breaking other methods in this file, 
         # but usage will be OpenRouterCoachEngine.
@@ -44,6 +47,11 @@ class AICoachSession:
         self.scoring_system = IntelligentScoringSystem(difficulty)
         self.facial_agent = RealtimeFacialAgent()
         self.voice_agent = RealtimeVoiceAgent()
+        self.challenge_tracker = SessionChallengeTracker(user_id)
+        self.tip_engine = TipEngine(
+            cooldown=settings.COACH_TIP_COOLDOWN_SECONDS,
+            min_interval=settings.COACH_TIP_MIN_INTERVAL_SECONDS
+        )
         
         # Session metrics
         self.metrics_history = []
@@ -100,6 +108,7 @@ class AICoachSession:
                 }
             
             self.last_facial_analysis = facial_analysis
+            self.challenge_tracker.observe_facial(facial_analysis)
             self.frame_count += 1
             
             return {
@@ -193,6 +202,7 @@ class AICoachSession:
             
             voice_analysis["speech_rate_wpm"] = wpm
             voice_analysis["speech_rate_quality"] = self.voice_analyzer._rate_speech_rate(wpm)
+            self.challenge_tracker.observe_voice(voice_analysis)
             
             print(f"🎙️ Voice metrics: WPM={wpm:.0f} ({word_count} words / {duration_sec:.0f}s), clarity={voice_analysis.get('clarity_score', 0):.2f}, vol_consistency={voice_analysis.get('volume_consistency', 0):.2f}, transcript_len={len(self.transcript_buffer)}")
             
@@ -223,9 +233,51 @@ class AICoachSession:
             traceback.print_exc()
             return {"error": f"Exception in audio processing: {str(e)}", "voice_analysis": None}
     
-    async def generate_real_time_feedback(self) -> Dict:
+    def _coach_metrics(self):
+        """Voice and facial metrics in the shape the coach engine expects"""
+        voice_metrics = {
+            "speech_rate_wpm": self.last_voice_analysis.get("speech_rate_wpm", 0),
+            "speech_rate_quality": self.last_voice_analysis.get("speech_rate_quality", "normal"),
+            "clarity_score": self.last_voice_analysis.get("clarity_score", 0),
+            "volume_consistency": self.last_voice_analysis.get("volume_consistency", 0),
+            "pitch_quality": self.last_voice_analysis.get("pitch_quality", "monotone"),
+            "pitch_variation": self.last_voice_analysis.get("pitch_variation_semitones", 0),
+            "filler_words": self.last_voice_analysis.get("filler_words", []),
+            "overall_voice_score": self.last_voice_analysis.get("overall_voice_score", 0),
+            "recommendations": self.last_voice_analysis.get("recommendations", [])
+        }
+        
+        facial_metrics = {
+            "emotion": self.last_facial_analysis.get("emotion", "neutral"),
+            "emotion_confidence": self.last_facial_analysis.get("emotion_confidence", 0),
+            "engagement_score": self.last_facial_analysis.get("engagement_score", 0),
+            "engagement_level": self.last_facial_analysis.get("engagement_level", "low"),
+            "eye_contact_score": self.last_facial_analysis.get("eye_contact_score", 0),
+            "smile_score": self.last_facial_analysis.get("smile_score", 0)
+        }
+        return voice_metrics, facial_metrics
+    
+    @property
+    def coach_context(self) -> str:
+        return f"User is practicing {self.difficulty} level presentation"
+    
+    def feedback_fingerprint(self):
+        """Quantized key for the current metrics; None until both analyses exist"""
+        if self.last_facial_analysis is None or self.last_voice_analysis is None:
+            return None
+        voice_metrics, facial_metrics = self._coach_metrics()
+        return self.gemini_coach.feedback_fingerprint(voice_metrics, facial_metrics, self.coach_context)
+    
+    def feedback_cooldown(self) -> float:
+        """Seconds the coach engine's rate limit still holds back new feedback"""
+        return self.gemini_coach.feedback_cooldown()
+
+    async def generate_real_time_feedback(self, on_delta: Optional[Callable[[str], Awaitable[None]]] = None) -> Dict:
         """
         Generate real-time AI coaching feedback using Gemini
+        
+        Args:
+            on_delta: Optional callback receiving text deltas while the reply streams
         """
         try:
             if self.last_facial_analysis is None or self.last_voice_analysis is None:
@@ -235,34 +287,15 @@ class AICoachSession:
             transcript_segment = self.transcript_buffer.split()[-20:] if self.transcript_buffer else []
             transcript_segment = " ".join(transcript_segment)
             
-            # Prepare metrics for Gemini
-            voice_metrics = {
-                "speech_rate_wpm": self.last_voice_analysis.get("speech_rate_wpm", 0),
-                "speech_rate_quality": self.last_voice_analysis.get("speech_rate_quality", "normal"),
-                "clarity_score": self.last_voice_analysis.get("clarity_score", 0),
-                "volume_consistency": self.last_voice_analysis.get("volume_consistency", 0),
-                "pitch_quality": self.last_voice_analysis.get("pitch_quality", "monotone"),
-                "pitch_variation": self.last_voice_analysis.get("pitch_variation_semitones", 0),
-                "filler_words": self.last_voice_analysis.get("filler_words", []),
-                "overall_voice_score": self.last_voice_analysis.get("overall_voice_score", 0),
-                "recommendations": self.last_voice_analysis.get("recommendations", [])
-            }
-            
-            facial_metrics = {
-                "emotion": self.last_facial_analysis.get("emotion", "neutral"),
-                "emotion_confidence": self.last_facial_analysis.get("emotion_confidence", 0),
-                "engagement_score": self.last_facial_analysis.get("engagement_score", 0),
-                "engagement_level": self.last_facial_analysis.get("engagement_level", "low"),
-                "eye_contact_score": self.last_facial_analysis.get("eye_contact_score", 0),
-                "smile_score": self.last_facial_analysis.get("smile_score", 0)
-            }
+            voice_metrics, facial_metrics = self._coach_metrics()
             
             # Generate OpenRouter feedback
             feedback = await self.gemini_coach.generate_real_time_feedback(
                 voice_metrics,
                 facial_metrics,
                 transcript_segment,
-                f"User is practicing {self.difficulty} level presentation"
+                self.coach_context,
+                on_delta=on_delta
             )
             
             self.feedback_history.append({
@@ -275,7 +308,8 @@ class AICoachSession:
             return {
                 "feedback": feedback,
                 "timestamp": datetime.now().isoformat(),
-                "confidence": "high" if feedback else "low"
+                "confidence": "high" if feedback else "low",
+                "source": "llm"
             }
             
         except Exception as e:
@@ -284,36 +318,37 @@ class AICoachSession:
             fallback_feedback = self._generate_fallback_feedback(voice_metrics, facial_metrics)
             return {"error": str(e), "feedback": fallback_feedback}
 
+    def local_tip(self) -> Optional[Dict]:
+        """
+        Rule-based tip for the current metrics (no network call).
+        Returns None when nothing is due (hysteresis/cooldowns).
+        """
+        if self.last_facial_analysis is None or self.last_voice_analysis is None:
+            return None
+        
+        tip = self.tip_engine.next_tip(self.last_voice_analysis, self.last_facial_analysis)
+        if not tip:
+            return None
+        
+        timestamp = datetime.now().isoformat()
+        self.feedback_history.append({
+            "timestamp": timestamp,
+            "feedback": tip["message"],
+            "category": tip["category"],
+            "voice_score": self.last_voice_analysis.get("overall_voice_score", 0),
+            "engagement": self.last_facial_analysis.get("engagement_score", 0)
+        })
+        return {
+            "feedback": tip["message"],
+            "category": tip["category"],
+            "timestamp": timestamp,
+            "confidence": "high",
+            "source": "local"
+        }
+
     def _generate_fallback_feedback(self, voice_metrics: Dict, facial_metrics: Dict) -> str:
         """Generate heuristic feedback when AI model is unavailable"""
-        feedback_items = []
-        
-        # Voice feedback
-        if voice_metrics.get("speech_rate_quality") == "too_fast":
-            feedback_items.append("Try to speak a bit slower for better clarity.")
-        elif voice_metrics.get("speech_rate_quality") == "too_slow":
-            feedback_items.append("You can pick up the pace slightly.")
-            
-        if voice_metrics.get("volume_consistency", 1) < 0.6:
-            feedback_items.append("Try to maintain a consistent speaking volume.")
-            
-        if voice_metrics.get("pitch_quality") == "monotone":
-            feedback_items.append("Add more variation to your tone to stay engaging.")
-            
-        # Facial feedback
-        if facial_metrics.get("eye_contact_score", 1) < 0.4:
-            feedback_items.append("Maintain better eye contact with the camera.")
-            
-        if facial_metrics.get("smile_score", 1) < 0.3:
-            feedback_items.append("Don't forget to smile occasionally!")
-            
-        if facial_metrics.get("engagement_level") == "low":
-            feedback_items.append("Keep your energy up to engage the audience.")
-            
-        if not feedback_items:
-            return "You're doing great! Keep maintaining this energy."
-            
-        return " ".join(feedback_items[:2])
+        return describe(voice_metrics, facial_metrics)
     
     async def calculate_frame_score(self) -> Dict:
         """
@@ -416,6 +451,7 @@ class AICoachSession:
             
             self.last_score = score_result
             self.metrics_history.append(score_result)
+            self.challenge_tracker.observe_score(score_result)
             
             return {
                 "score": {
@@ -477,6 +513,7 @@ class AICoachSession:
         """Reset session state"""
         self.facial_agent.reset()
         self.voice_agent.reset()
+        self.tip_engine.reset()
         self.metrics_history = []
         self.feedback_history = []
         self.frame_count = 0
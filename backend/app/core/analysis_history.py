@@ -0,0 +1,103 @@
+"""
+Analysis history queries
+Keyset pagination over `analysis_results` on (created_at, _id), projected
+down to the summary fields the history page renders
+"""
+
+import base64
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+from bson import ObjectId
+
+from app.db.mongodb import analysis_results_collection
+
+EPOCH = datetime(1970, 1, 1)
+
+# Never load emotion timelines or full LLM output for the history list
+HISTORY_PROJECTION = {
+    "task_id": 1,
+    "video_filename": 1,
+    "status": 1,
+    "created_at": 1,
+    "total_score": 1,
+    "feedback_analysis.feedback_summary": 1,
+}
+
+HISTORY_SORT = [("created_at", -1), ("_id", -1)]
+
+
+def encode_cursor(created_at: datetime, doc_id: ObjectId) -> str:
+    """Opaque cursor pointing just after the given row"""
+    if created_at.tzinfo is not None:
+        created_at = created_at.astimezone(timezone.utc).replace(tzinfo=None)
+    millis = (created_at - EPOCH) // timedelta(milliseconds=1)
+    raw = f"{millis}:{doc_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, ObjectId]:
+    """
+    Decode a cursor produced by `encode_cursor`.
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        millis, doc_id = base64.urlsafe_b64decode(padded).decode().split(":", 1)
+        return EPOCH + timedelta(milliseconds=int(millis)), ObjectId(doc_id)
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+async def get_history_page(
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    user_id: Optional[str] = None
+) -> Tuple[List[Dict], Optional[str]]:
+    """
+    Fetch one page of analysis history, newest first.
+
+    Args:
+        limit: Maximum rows to return
+        cursor: Cursor from the previous page, or None for the first page
+        user_id: Restrict to one user's analyses
+
+    Returns:
+        (rows, next_cursor) where next_cursor is None on the last page
+    """
+    query: Dict = {}
+    if user_id:
+        query["user_id"] = user_id
+    if cursor:
+        created_at, doc_id = decode_cursor(cursor)
+        query["$or"] = [
+            {"created_at": {"$lt": created_at}},
+            {"created_at": created_at, "_id": {"$lt": doc_id}},
+        ]
+
+    # Fetch one extra row to learn whether another page exists
+    results = await analysis_results_collection.find(
+        query, HISTORY_PROJECTION
+    ).sort(HISTORY_SORT).limit(limit + 1).to_list(limit + 1)
+
+    next_cursor = None
+    if len(results) > limit:
+        results = results[:limit]
+        last = results[-1]
+        next_cursor = encode_cursor(last["created_at"], last["_id"])
+
+    rows = [
+        {
+            "id": str(r["_id"]),
+            "task_id": r["task_id"],
+            "video_filename": r.get("video_filename"),
+            "status": r.get("status"),
+            "created_at": r.get("created_at"),
+            "total_score": r.get("total_score"),
+            "feedback_summary": (r.get("feedback_analysis") or {}).get("feedback_summary")
+        }
+        for r in results
+    ]
+    return rows, next_cursor
@@ -0,0 +1,56 @@
+"""
+Video analysis LLM schema
+Pydantic models for the content analysis and feedback JSON the analysis
+worker asks the LLM for; defaults fill anything that cannot be recovered
+"""
+
+from typing import List
+
+from pydantic import BaseModel, Field, field_validator
+
+
+def _clamp(value: float, low: float, high: float) -> float:
+    return max(low, min(high, value))
+
+
+class ContentAnalysis(BaseModel):
+    structure: str = Field("Analysis unavailable", description="Detailed assessment of the speech structure")
+    clarity: float = Field(0, description="Clarity, 0-10")
+    persuasion: float = Field(0, description="Persuasiveness, 0-10")
+    summary: str = Field("N/A", description="Overall summary of the spoken content")
+
+    @field_validator("clarity", "persuasion")
+    @classmethod
+    def _ten_point_scale(cls, value: float) -> float:
+        return _clamp(value, 0, 10)
+
+
+class FeedbackScores(BaseModel):
+    voice_score: float = Field(0, description="0-100")
+    facial_score: float = Field(0, description="0-100")
+    content_score: float = Field(0, description="0-100")
+
+    @field_validator("voice_score", "facial_score", "content_score")
+    @classmethod
+    def _percentage(cls, value: float) -> float:
+        return _clamp(value, 0, 100)
+
+
+class FeedbackResponse(BaseModel):
+    total_score: float = Field(0, description="0-100")
+    scores: FeedbackScores = Field(default_factory=FeedbackScores)
+    interpretation: str = Field("Analysis unavailable", description="A brief, punchy result title")
+    feedback_summary: str = Field("", description="Synthesized coaching feedback")
+
+    @field_validator("total_score")
+    @classmethod
+    def _percentage(cls, value: float) -> float:
+        return _clamp(value, 0, 100)
+
+
+class AnalysisLLMResponse(BaseModel):
+    content_analysis_response: ContentAnalysis = Field(default_factory=ContentAnalysis)
+    feedback_response: FeedbackResponse = Field(default_factory=FeedbackResponse)
+    strengths: List[str] = Field(default_factory=list, description="3 specific strengths")
+    weaknesses: List[str] = Field(default_factory=list, description="3 specific improvement areas")
+    suggestions: List[str] = Field(default_factory=list, description="3 actionable coaching tips")
@@ -0,0 +1,118 @@
+"""
+Active challenge catalog
+In-process cache of active challenges shared by the game endpoints and the
+challenge tracker, refreshed on a TTL or when the catalog version changes
+"""
+
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from pymongo import ReturnDocument
+
+from app.core.config import settings
+from app.core.challenge_rules import get_compiled_challenge, invalidate_rules
+from app.db.mongodb import challenges_collection, catalog_versions_collection
+from app.db.serialization import serialize_doc
+
+logger = logging.getLogger(__name__)
+
+CATALOG_VERSION_ID = "challenges"
+
+
+async def bump_catalog_version() -> int:
+    """Mark the challenge catalog as changed; call after writing challenges"""
+    doc = await catalog_versions_collection.find_one_and_update(
+        {"_id": CATALOG_VERSION_ID},
+        {"$inc": {"version": 1}, "$set": {"updated_at": datetime.utcnow()}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    return doc["version"]
+
+
+async def _current_version() -> int:
+    doc = await catalog_versions_collection.find_one({"_id": CATALOG_VERSION_ID}, {"version": 1})
+    return doc["version"] if doc else 0
+
+
+class CatalogSnapshot:
+    """Active challenges as loaded, plus their precomputed serialized forms"""
+
+    def __init__(self, challenges: List[Dict], version: int):
+        self.version = version
+        self.challenges = challenges
+        self.serialized = {c["challenge_id"]: serialize_doc(c) for c in challenges}
+        self.by_id = {c["challenge_id"]: c for c in challenges}
+        # Compile requirement rules once per load
+        for challenge in challenges:
+            get_compiled_challenge(challenge)
+
+    def active(self, now: Optional[datetime] = None) -> List[Dict]:
+        """Challenges that have not expired yet"""
+        now = now or datetime.utcnow()
+        return [
+            c for c in self.challenges
+            if c.get("expires_at") is None or c["expires_at"] > now
+        ]
+
+    def active_serialized(self, now: Optional[datetime] = None) -> List[Dict]:
+        """Serialized active challenges; shallow copies so callers may add fields"""
+        return [dict(self.serialized[c["challenge_id"]]) for c in self.active(now)]
+
+
+class ChallengeCatalog:
+    """
+    Cached `active: True` challenges.
+
+    The version document is checked at most every `version_check_interval`
+    seconds; the catalog is reloaded when the version moved or `ttl` elapsed.
+    Expiry is applied per call, so challenges drop out on time between loads.
+    """
+
+    def __init__(self, ttl: float, version_check_interval: float, limit: int = 100):
+        self.ttl = ttl
+        self.version_check_interval = version_check_interval
+        self.limit = limit
+        self._snapshot: Optional[CatalogSnapshot] = None
+        self._loaded_at = 0.0
+        self._checked_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def get(self) -> CatalogSnapshot:
+        now = time.monotonic()
+        if self._snapshot and now - self._loaded_at < self.ttl and now - self._checked_at < self.version_check_interval:
+            return self._snapshot
+
+        async with self._lock:
+            now = time.monotonic()
+            snapshot = self._snapshot
+            if snapshot and now - self._loaded_at < self.ttl:
+                if now - self._checked_at < self.version_check_interval:
+                    return snapshot
+                version = await _current_version()
+                self._checked_at = time.monotonic()
+                if version == snapshot.version:
+                    return snapshot
+            return await self._load()
+
+    async def _load(self) -> CatalogSnapshot:
+        version = await _current_version()
+        challenges = await challenges_collection.find({"active": True}).to_list(self.limit)
+        invalidate_rules()
+        self._snapshot = CatalogSnapshot(challenges, version)
+        self._loaded_at = self._checked_at = time.monotonic()
+        logger.info(f"📚 Loaded {len(challenges)} active challenges (catalog v{version})")
+        return self._snapshot
+
+    def invalidate(self):
+        """Force a reload on the next read"""
+        self._snapshot = None
+
+
+challenge_catalog = ChallengeCatalog(
+    ttl=settings.CHALLENGE_CATALOG_TTL_SECONDS,
+    version_check_interval=settings.CHALLENGE_CATALOG_VERSION_CHECK_SECONDS
+)
@@ -0,0 +1,209 @@
+"""
+Challenge requirement rules
+Compiles a challenge's `requirements` document into a list of evaluator
+callables with precomputed targets, cached by challenge_id
+"""
+
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+Metrics = Dict[str, Any]
+Evaluator = Callable[[Dict[str, Any], Metrics], bool]
+
+
+class Rule:
+    """
+    One compiled requirement.
+
+    `cumulative` rules add to progress carried over from earlier sessions
+    (durations, session counts) and only make sense once per finished session.
+    """
+
+    __slots__ = ("name", "cumulative", "evaluate")
+
+    def __init__(self, name: str, evaluate: Evaluator, cumulative: bool = False):
+        self.name = name
+        self.evaluate = evaluate
+        self.cumulative = cumulative
+
+
+def _metric(metrics: Metrics, keys: Sequence[str], default: Any) -> Any:
+    """First metric present among `keys` (preferred name, then fallbacks)"""
+    for key in keys:
+        if key in metrics:
+            return metrics[key]
+    return default
+
+
+def _set(user_challenge: Dict[str, Any], current: Any, target: Any, progress: float, completed: bool = False):
+    user_challenge["current_value"] = current
+    user_challenge["target_value"] = target
+    user_challenge["progress"] = progress
+    if completed:
+        user_challenge["completed"] = True
+
+
+def _reach(keys: Sequence[str], default: Any, target: float, at_most: bool = False) -> Evaluator:
+    """All-or-nothing threshold: updates only once the target is reached"""
+    def evaluate(user_challenge, metrics):
+        value = _metric(metrics, keys, default)
+        if (value <= target) if at_most else (value >= target):
+            _set(user_challenge, value, target, 100, completed=True)
+            return True
+        return False
+    return evaluate
+
+
+def _partial(keys: Sequence[str], target: float) -> Evaluator:
+    """Threshold with partial credit proportional to the target"""
+    def evaluate(user_challenge, metrics):
+        value = _metric(metrics, keys, 0)
+        if value >= target:
+            _set(user_challenge, value, target, 100, completed=True)
+        else:
+            _set(user_challenge, value, target, min(100, (value / target) * 100))
+        return True
+    return evaluate
+
+
+def _within(keys: Sequence[str], low: float, high: float, tolerance: float) -> Evaluator:
+    """Range target; partial credit falls off linearly over `tolerance` outside it"""
+    display = f"{low}-{high}"
+
+    def evaluate(user_challenge, metrics):
+        value = _metric(metrics, keys, 0)
+        if low <= value <= high:
+            _set(user_challenge, value, display, 100, completed=True)
+        else:
+            distance = min(abs(value - low), abs(value - high))
+            _set(user_challenge, value, display, max(0, 100 - (distance / tolerance * 100)))
+        return True
+    return evaluate
+
+
+def _accumulate(increment: Callable[[Metrics], float], target: float) -> Evaluator:
+    """Adds each session's contribution to the stored current value"""
+    def evaluate(user_challenge, metrics):
+        current = user_challenge.get("current_value", 0) + increment(metrics)
+        _set(user_challenge, current, target, min(100, (current / target) * 100), completed=current >= target)
+        return True
+    return evaluate
+
+
+def _has(requirements: Dict[str, Any], *keys: str) -> bool:
+    """Requirement set; challenge documents store unused requirement keys as null"""
+    return all(requirements.get(key) is not None for key in keys)
+
+
+def compile_rules(requirements: Dict[str, Any]) -> List[Rule]:
+    """
+    Compile a requirements document into rules, in evaluation order.
+
+    Later rules overwrite the values set by earlier ones, matching the order
+    the requirement keys have always been checked in.
+    """
+    r = requirements
+    rules = []
+
+    if _has(r, "min_score"):
+        rules.append(Rule("min_score", _reach(("average_score",), 0, r["min_score"])))
+    if _has(r, "min_duration"):
+        rules.append(Rule(
+            "min_duration",
+            _accumulate(lambda m: m.get("duration", 0), r["min_duration"]),
+            cumulative=True
+        ))
+    if _has(r, "count"):
+        rules.append(Rule("count", _accumulate(lambda m: 1, r["count"]), cumulative=True))
+    if _has(r, "max_filler_words"):
+        rules.append(Rule("max_filler_words", _reach(("filler_count",), 999, r["max_filler_words"], at_most=True)))
+    if _has(r, "min_combo"):
+        rules.append(Rule("min_combo", _reach(("combo",), 0, r["min_combo"])))
+    if _has(r, "min_facial_score"):
+        rules.append(Rule("min_facial_score", _reach(("facial_score",), 0, r["min_facial_score"])))
+
+    # Micro-challenges
+    if _has(r, "min_eye_contact_percent"):
+        rules.append(Rule(
+            "min_eye_contact_percent",
+            _partial(("eye_contact_avg", "eye_contact_score"), r["min_eye_contact_percent"])
+        ))
+    if _has(r, "target_wpm_min", "target_wpm_max"):
+        rules.append(Rule(
+            "target_wpm",
+            _within(("speech_rate_wpm",), r["target_wpm_min"], r["target_wpm_max"], tolerance=50)
+        ))
+    if _has(r, "min_facial_confidence"):
+        rules.append(Rule(
+            "min_facial_confidence",
+            _partial(("facial_confidence", "facial_score"), r["min_facial_confidence"])
+        ))
+    if _has(r, "min_content_clarity"):
+        rules.append(Rule(
+            "min_content_clarity",
+            _partial(("content_clarity", "content_score"), r["min_content_clarity"])
+        ))
+    if _has(r, "volume_min_db", "volume_max_db"):
+        rules.append(Rule(
+            "volume_db",
+            _within(("volume_db", "volume_avg"), r["volume_min_db"], r["volume_max_db"], tolerance=20)
+        ))
+    if _has(r, "min_engagement_score"):
+        rules.append(Rule("min_engagement_score", _partial(("engagement_score",), r["min_engagement_score"])))
+    if _has(r, "target_session_count"):
+        rules.append(Rule(
+            "target_session_count",
+            _accumulate(lambda m: 1, r["target_session_count"]),
+            cumulative=True
+        ))
+
+    return rules
+
+
+class CompiledChallenge:
+    """A challenge's compiled rules plus the requirements they were built from"""
+
+    def __init__(self, challenge_id: str, requirements: Dict[str, Any]):
+        self.challenge_id = challenge_id
+        self.requirements = dict(requirements)
+        self.rules = compile_rules(self.requirements)
+        self.realtime_rules = [rule for rule in self.rules if not rule.cumulative]
+
+    def apply(self, user_challenge: Dict[str, Any], metrics: Metrics, realtime: bool = False) -> bool:
+        """
+        Apply the rules to a user challenge record in place.
+
+        Args:
+            user_challenge: Record to update
+            metrics: Session (or running in-session) metrics
+            realtime: Skip cumulative rules, for in-session progress checks
+
+        Returns:
+            True if any rule updated the record
+        """
+        updated = False
+        for rule in self.realtime_rules if realtime else self.rules:
+            if rule.evaluate(user_challenge, metrics):
+                updated = True
+        return updated
+
+
+_compiled: Dict[str, CompiledChallenge] = {}
+
+
+def get_compiled_challenge(challenge: Dict[str, Any]) -> CompiledChallenge:
+    """Compiled rules for a challenge document, recompiled if its requirements changed"""
+    challenge_id = challenge["challenge_id"]
+    requirements = challenge.get("requirements") or {}
+    compiled = _compiled.get(challenge_id)
+    if compiled is None or compiled.requirements != requirements:
+        compiled = CompiledChallenge(challenge_id, requirements)
+        _compiled[challenge_id] = compiled
+    return compiled
+
+
+def invalidate_rules(challenge_id: Optional[str] = None):
+    """Drop compiled rules for one challenge, or all of them"""
+    if challenge_id is None:
+        _compiled.clear()
+    else:
+        _compiled.pop(challenge_id, None)
@@ -6,8 +6,11 @@ during practice sessions.
 """
 
 from datetime import datetime
-from typing import Dict, Any, Optional
-from app.db.mongodb import user_challenges_collection, challenges_collection
+from typing import Dict, Any, List, Optional
+from pymongo import UpdateOne
+from app.db.mongodb import user_challenges_collection
+from app.core.challenge_catalog import challenge_catalog
+from app.core.challenge_rules import get_compiled_challenge
 
 
 async def update_challenge_progress(
@@ -17,6 +20,9 @@ async def update_challenge_progress(
     """
     Update user's progress on active challenges based on session metrics.
     
+    All challenges are evaluated in memory and the changed user challenge
+    records are persisted with a single unordered bulk_write.
+    
     Args:
         user_id: User's unique identifier
         session_metrics: Dictionary containing session performance data
@@ -31,8 +37,9 @@ async def update_challenge_progress(
         Dictionary with updated challenges and newly completed challenges
     """
     
-    # Get all active challenges
-    active_challenges = await challenges_collection.find({"active": True}).to_list(100)
+    # Get all active (unexpired) challenges from the shared catalog
+    catalog = await challenge_catalog.get()
+    active_challenges = catalog.active()
     
     # Get user's challenge progress
     user_progress = {}
@@ -43,15 +50,48 @@ async def update_challenge_progress(
     for uc in user_challenges:
         user_progress[uc["challenge_id"]] = uc
     
+    result = evaluate_challenges(user_id, active_challenges, user_progress, session_metrics)
+    
+    if result["operations"]:
+        await user_challenges_collection.bulk_write(result["operations"], ordered=False)
+    
+    return {
+        "updated_challenges": result["updated_challenges"],
+        "newly_completed": result["newly_completed"],
+        "total_updated": len(result["updated_challenges"])
+    }
+
+
+def evaluate_challenges(
+    user_id: str,
+    challenges: List[Dict[str, Any]],
+    user_progress: Dict[str, Dict[str, Any]],
+    session_metrics: Dict[str, Any]
+) -> Dict[str, Any]:
+    """
+    Evaluate session metrics against challenges without touching the database.
+    
+    Args:
+        user_id: User's unique identifier
+        challenges: Active challenge documents
+        user_progress: Existing user challenge records keyed by challenge_id
+        session_metrics: Session performance data
+        
+    Returns:
+        Dictionary with updated_challenges, newly_completed and the
+        UpdateOne operations for records whose fields actually changed
+    """
+    now = datetime.utcnow()
+    operations = []
     updated_challenges = []
     newly_completed = []
     
-    for challenge in active_challenges:
+    for challenge in challenges:
         challenge_id = challenge["challenge_id"]
-        requirements = challenge["requirements"]
+        existing = user_progress.get(challenge_id)
         
-        # Get or create user challenge record
-        if challenge_id not in user_progress:
+        # Get or create user challenge record (never mutate the loaded one)
+        if existing is None:
             user_challenge = {
                 "user_id": user_id,
                 "challenge_id": challenge_id,
@@ -60,234 +100,57 @@ async def update_challenge_progress(
                 "target_value": 0,
                 "completed": False,
                 "claimed": False,
-                "started_at": datetime.utcnow()
+                "started_at": now
             }
         else:
-            user_challenge = user_progress[challenge_id]
+            user_challenge = dict(existing)
         
         # Skip if already completed
         if user_challenge.get("completed", False):
             continue
         
-        # Update progress based on challenge type
-        progress_updated = False
-        
-        # Score-based challenges
-        if "min_score" in requirements:
-            if session_metrics.get("average_score", 0) >= requirements["min_score"]:
-                user_challenge["current_value"] = session_metrics["average_score"]
-                user_challenge["target_value"] = requirements["min_score"]
-                user_challenge["progress"] = 100
-                user_challenge["completed"] = True
-                progress_updated = True
-        
-        # Duration-based challenges
-        if "min_duration" in requirements:
-            current_duration = user_challenge.get("current_value", 0)
-            current_duration += session_metrics.get("duration", 0)
-            user_challenge["current_value"] = current_duration
-            user_challenge["target_value"] = requirements["min_duration"]
-            user_challenge["progress"] = min(100, (current_duration / requirements["min_duration"]) * 100)
-            
-            if current_duration >= requirements["min_duration"]:
-                user_challenge["completed"] = True
-            progress_updated = True
-        
-        # Count-based challenges (e.g., complete N sessions)
-        if "count" in requirements:
-            current_count = user_challenge.get("current_value", 0) + 1
-            user_challenge["current_value"] = current_count
-            user_challenge["target_value"] = requirements["count"]
-            user_challenge["progress"] = min(100, (current_count / requirements["count"]) * 100)
-            
-            if current_count >= requirements["count"]:
-                user_challenge["completed"] = True
-            progress_updated = True
-        
-        # Filler word challenges
-        if "max_filler_words" in requirements:
-            if session_metrics.get("filler_count", 999) <= requirements["max_filler_words"]:
-                user_challenge["current_value"] = session_metrics["filler_count"]
-                user_challenge["target_value"] = requirements["max_filler_words"]
-                user_challenge["progress"] = 100
-                user_challenge["completed"] = True
-                progress_updated = True
-        
-        # Combo challenges
-        if "min_combo" in requirements:
-            if session_metrics.get("combo", 0) >= requirements["min_combo"]:
-                user_challenge["current_value"] = session_metrics["combo"]
-                user_challenge["target_value"] = requirements["min_combo"]
-                user_challenge["progress"] = 100
-                user_challenge["completed"] = True
-                progress_updated = True
-        
-        # Category score challenges
-        if "min_facial_score" in requirements:
-            if session_metrics.get("facial_score", 0) >= requirements["min_facial_score"]:
-                user_challenge["current_value"] = session_metrics["facial_score"]
-                user_challenge["target_value"] = requirements["min_facial_score"]
-                user_challenge["progress"] = 100
-                user_challenge["completed"] = True
-                progress_updated = True
-        
-        # ==================== MICRO-CHALLENGE EVALUATION ====================
-        
-        # Eye contact challenges
-        if "min_eye_contact_percent" in requirements:
-            eye_contact = session_metrics.get("eye_contact_avg", session_metrics.get("eye_contact_score", 0))
-            target = requirements["min_eye_contact_percent"]
-            if eye_contact >= target:
-                user_challenge["current_value"] = eye_contact
-                user_challenge["target_value"] = target
-                user_challenge["progress"] = 100
-                user_challenge["completed"] = True
-                progress_updated = True
-            else:
-                # Partial progress
-                user_challenge["current_value"] = eye_contact
-                user_challenge["target_value"] = target
-                user_challenge["progress"] = min(100, (eye_contact / target) * 100)
-                progress_updated = True
-        
-        # Pacing/WPM challenges - must be within range
-        if "target_wpm_min" in requirements and "target_wpm_max" in requirements:
-            wpm = session_metrics.get("speech_rate_wpm", 0)
-            wpm_min = requirements["target_wpm_min"]
-            wpm_max = requirements["target_wpm_max"]
-            target_mid = (wpm_min + wpm_max) / 2
-            
-            if wpm_min <= wpm <= wpm_max:
-                # In range - complete
-                user_challenge["current_value"] = wpm
-                user_challenge["target_value"] = f"{wpm_min}-{wpm_max}"
-                user_challenge["progress"] = 100
-                user_challenge["completed"] = True
-                progress_updated = True
-            else:
-                # Calculate distance from range
-                distance = min(abs(wpm - wpm_min), abs(wpm - wpm_max))
-                max_distance = 50  # WPM tolerance for partial credit
-                progress = max(0, 100 - (distance / max_distance * 100))
-                user_challenge["current_value"] = wpm
-                user_challenge["target_value"] = f"{wpm_min}-{wpm_max}"
-                user_challenge["progress"] = progress
-                progress_updated = True
-        
-        # Facial confidence challenges
-        if "min_facial_confidence" in requirements:
-            confidence = session_metrics.get("facial_confidence", session_metrics.get("facial_score", 0))
-            target = requirements["min_facial_confidence"]
-            if confidence >= target:
-                user_challenge["current_value"] = confidence
-                user_challenge["target_value"] = target
-                user_challenge["progress"] = 100
-                user_challenge["completed"] = True
-                progress_updated = True
-            else:
-                user_challenge["current_value"] = confidence
-                user_challenge["target_value"] = target
-                user_challenge["progress"] = min(100, (confidence / target) * 100)
-                progress_updated = True
-        
-        # Content clarity challenges
-        if "min_content_clarity" in requirements:
-            clarity = session_metrics.get("content_clarity", session_metrics.get("content_score", 0))
-            target = requirements["min_content_clarity"]
-            if clarity >= target:
-                user_challenge["current_value"] = clarity
-                user_challenge["target_value"] = target
-                user_challenge["progress"] = 100
-                user_challenge["completed"] = True
-                progress_updated = True
-            else:
-                user_challenge["current_value"] = clarity
-                user_challenge["target_value"] = target
-                user_challenge["progress"] = min(100, (clarity / target) * 100)
-                progress_updated = True
-        
-        # Volume consistency challenges
-        if "volume_min_db" in requirements and "volume_max_db" in requirements:
-            volume = session_metrics.get("volume_db", session_metrics.get("volume_avg", 0))
-            vol_min = requirements["volume_min_db"]
-            vol_max = requirements["volume_max_db"]
-            
-            if vol_min <= volume <= vol_max:
-                user_challenge["current_value"] = volume
-                user_challenge["target_value"] = f"{vol_min}-{vol_max}"
-                user_challenge["progress"] = 100
-                user_challenge["completed"] = True
-                progress_updated = True
-            else:
-                distance = min(abs(volume - vol_min), abs(volume - vol_max))
-                max_distance = 20  # dB tolerance
-                progress = max(0, 100 - (distance / max_distance * 100))
-                user_challenge["current_value"] = volume
-                user_challenge["target_value"] = f"{vol_min}-{vol_max}"
-                user_challenge["progress"] = progress
-                progress_updated = True
+        compiled = get_compiled_challenge(challenge)
+        if not compiled.apply(user_challenge, session_metrics):
+            continue
         
-        # Engagement score challenges
-        if "min_engagement_score" in requirements:
-            engagement = session_metrics.get("engagement_score", 0)
-            target = requirements["min_engagement_score"]
-            if engagement >= target:
-                user_challenge["current_value"] = engagement
-                user_challenge["target_value"] = target
-                user_challenge["progress"] = 100
-                user_challenge["completed"] = True
-                progress_updated = True
-            else:
-                user_challenge["current_value"] = engagement
-                user_challenge["target_value"] = target
-                user_challenge["progress"] = min(100, (engagement / target) * 100)
-                progress_updated = True
+        changes = _changed_fields(existing, user_challenge)
+        if changes:
+            changes["updated_at"] = now
+            operations.append(UpdateOne(
+                {"user_id": user_id, "challenge_id": challenge_id},
+                {"$set": changes},
+                upsert=True
+            ))
         
-        # Session count challenges (cumulative)
-        if "target_session_count" in requirements:
-            current_count = user_challenge.get("current_value", 0) + 1
-            target = requirements["target_session_count"]
-            user_challenge["current_value"] = current_count
-            user_challenge["target_value"] = target
-            user_challenge["progress"] = min(100, (current_count / target) * 100)
-            if current_count >= target:
-                user_challenge["completed"] = True
-            progress_updated = True
+        updated_challenges.append({
+            "challenge_id": challenge_id,
+            "title": challenge["title"],
+            "progress": user_challenge["progress"],
+            "completed": user_challenge["completed"]
+        })
         
-        # Update or insert user challenge
-        if progress_updated:
-            user_challenge["updated_at"] = datetime.utcnow()
-            
-            await user_challenges_collection.update_one(
-                {
-                    "user_id": user_id,
-                    "challenge_id": challenge_id
-                },
-                {"$set": user_challenge},
-                upsert=True
-            )
-            
-            updated_challenges.append({
+        if user_challenge["completed"] and not user_challenge.get("claimed", False):
+            newly_completed.append({
                 "challenge_id": challenge_id,
                 "title": challenge["title"],
-                "progress": user_challenge["progress"],
-                "completed": user_challenge["completed"]
+                "rewards": challenge["rewards"]
             })
-            
-            if user_challenge["completed"] and not user_challenge.get("claimed", False):
-                newly_completed.append({
-                    "challenge_id": challenge_id,
-                    "title": challenge["title"],
-                    "rewards": challenge["rewards"]
-                })
     
     return {
+        "operations": operations,
         "updated_challenges": updated_challenges,
-        "newly_completed": newly_completed,
-        "total_updated": len(updated_challenges)
+        "newly_completed": newly_completed
     }
 
 
+def _changed_fields(existing: Optional[Dict[str, Any]], updated: Dict[str, Any]) -> Dict[str, Any]:
+    """Fields of `updated` that differ from the stored record (all of them for a new record)"""
+    fields = {k: v for k, v in updated.items() if k not in ("_id", "updated_at")}
+    if existing is None:
+        return fields
+    return {k: v for k, v in fields.items() if k not in existing or existing[k] != v}
+
+
 async def get_user_challenge_summary(user_id: str) -> Dict[str, Any]:
     """
     Get a summary of user's challenge progress.
@@ -3,6 +3,9 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+# backend/, so relative paths do not depend on where a process was started
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
 class Settings:
     TOGETHER_API_KEY = os.getenv("TOGETHER_API_KEY")
     GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
@@ -10,4 +13,61 @@ class Settings:
     OPENROUTER_MODEL = os.getenv("OPENROUTER_MODEL", "google/gemini-2.0-flash-001")
     OPENROUTER_BASE_URL = "https://openrouter.ai/api/v1"
 
+    # Redis (Celery broker, task log pub/sub)
+    REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+    REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", "200"))
+
+    # /stream SSE behaviour
+    TASK_STREAM_HEARTBEAT_SECONDS = float(os.getenv("TASK_STREAM_HEARTBEAT_SECONDS", "15"))
+    TASK_STREAM_TIMEOUT_SECONDS = float(os.getenv("TASK_STREAM_TIMEOUT_SECONDS", "1800"))
+    STATUS_LONG_POLL_MAX_SECONDS = float(os.getenv("STATUS_LONG_POLL_MAX_SECONDS", "30"))
+
+    # Video upload spool (shared by the API and the Celery worker; relative paths are under backend/)
+    UPLOAD_SPOOL_DIR = os.path.join(BACKEND_DIR, os.getenv("UPLOAD_SPOOL_DIR", "temp_uploads"))
+    MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(50 * 1024 * 1024)))
+    UPLOAD_ORPHAN_MAX_AGE_SECONDS = float(os.getenv("UPLOAD_ORPHAN_MAX_AGE_SECONDS", str(6 * 3600)))
+    UPLOAD_SWEEP_INTERVAL_SECONDS = float(os.getenv("UPLOAD_SWEEP_INTERVAL_SECONDS", "3600"))
+
+    # Active challenge catalog cache
+    CHALLENGE_CATALOG_TTL_SECONDS = float(os.getenv("CHALLENGE_CATALOG_TTL_SECONDS", "300"))
+    CHALLENGE_CATALOG_VERSION_CHECK_SECONDS = float(os.getenv("CHALLENGE_CATALOG_VERSION_CHECK_SECONDS", "5"))
+
+    # Realtime metrics write-behind buffer
+    METRICS_FLUSH_BATCH_SIZE = int(os.getenv("METRICS_FLUSH_BATCH_SIZE", "50"))
+    METRICS_FLUSH_INTERVAL_SECONDS = float(os.getenv("METRICS_FLUSH_INTERVAL_SECONDS", "2"))
+    METRICS_BUFFER_MAX_PENDING = int(os.getenv("METRICS_BUFFER_MAX_PENDING", "10000"))
+
+    # Store realtime metrics in a time-series collection (MongoDB 5.0+)
+    REALTIME_METRICS_TIMESERIES = os.getenv("REALTIME_METRICS_TIMESERIES", "false").lower() == "true"
+    REALTIME_METRICS_RETENTION_SECONDS = int(os.getenv("REALTIME_METRICS_RETENTION_SECONDS", str(30 * 24 * 3600)))
+
+    # Realtime metrics rollup job
+    METRICS_ROLLUP_INTERVAL_SECONDS = float(os.getenv("METRICS_ROLLUP_INTERVAL_SECONDS", "60"))
+    METRICS_ROLLUP_LOOKBACK_SECONDS = float(os.getenv("METRICS_ROLLUP_LOOKBACK_SECONDS", "600"))
+
+    # Shared LLM gateway (OpenRouter)
+    # Per-process total, split between the async callers' loop and the
+    # background loop used by synchronous callers (Celery tasks, sync helpers)
+    LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))
+    LLM_BACKGROUND_CONCURRENCY = int(os.getenv("LLM_BACKGROUND_CONCURRENCY", "4"))
+    LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "32"))
+    LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "60"))
+    LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+    LLM_RETRY_BASE_DELAY_SECONDS = float(os.getenv("LLM_RETRY_BASE_DELAY_SECONDS", "0.5"))
+    LLM_RETRY_MAX_DELAY_SECONDS = float(os.getenv("LLM_RETRY_MAX_DELAY_SECONDS", "10"))
+    LLM_PROMPT_MAX_TOKENS = int(os.getenv("LLM_PROMPT_MAX_TOKENS", "6000"))
+    LLM_SUMMARY_PROMPT_MAX_TOKENS = int(os.getenv("LLM_SUMMARY_PROMPT_MAX_TOKENS", "1500"))
+
+    # Coach feedback cache (quantized snapshot -> tips)
+    FEEDBACK_CACHE_MAX_ENTRIES = int(os.getenv("FEEDBACK_CACHE_MAX_ENTRIES", "1024"))
+    FEEDBACK_CACHE_TTL_SECONDS = float(os.getenv("FEEDBACK_CACHE_TTL_SECONDS", "600"))
+    FEEDBACK_CACHE_VARIANTS = int(os.getenv("FEEDBACK_CACHE_VARIANTS", "3"))
+
+    # Practice coach tips: "hybrid" (local tips + periodic LLM), "local" or "llm"
+    COACH_TIP_POLICY = os.getenv("COACH_TIP_POLICY", "hybrid")
+    COACH_LLM_INTERVAL_SECONDS = float(os.getenv("COACH_LLM_INTERVAL_SECONDS", "20"))
+    COACH_TIP_COOLDOWN_SECONDS = float(os.getenv("COACH_TIP_COOLDOWN_SECONDS", "15"))
+    COACH_TIP_MIN_INTERVAL_SECONDS = float(os.getenv("COACH_TIP_MIN_INTERVAL_SECONDS", "4"))
+    COACH_FEEDBACK_STREAMING = os.getenv("COACH_FEEDBACK_STREAMING", "true").lower() == "true"
+
 settings = Settings()
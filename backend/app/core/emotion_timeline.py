@@ -0,0 +1,117 @@
+"""
+Compact emotion timeline encoding
+Run-length encodes the per-frame emotion timeline produced by the facial
+expression tool into [start, end, emotion_id, samples] segments
+"""
+
+from typing import Any, Dict, List
+
+COMPACT_FORMAT = "rle"
+
+# DeepFace's emotion labels; unknown labels are appended per timeline
+EMOTIONS = ["angry", "disgust", "fear", "happy", "sad", "surprise", "neutral"]
+
+# A gap wider than this many sample steps (frames without a face) splits a run
+GAP_TOLERANCE = 1.5
+
+
+def is_compact(timeline: Any) -> bool:
+    """True if the timeline is already in the compact form"""
+    return isinstance(timeline, dict) and timeline.get("format") == COMPACT_FORMAT
+
+
+def _sample_step(timeline: List[Dict]) -> float:
+    """Typical (median) spacing between consecutive samples"""
+    deltas = sorted(
+        b.get("timestamp", 0) - a.get("timestamp", 0)
+        for a, b in zip(timeline, timeline[1:])
+    )
+    deltas = [d for d in deltas if d > 0]
+    return round(deltas[len(deltas) // 2], 4) if deltas else 0.0
+
+
+def encode_timeline(timeline: List[Dict]) -> Dict:
+    """
+    Encode a list of {"timestamp", "emotion"} samples.
+
+    Consecutive samples with the same emotion collapse into one segment
+    unless frames without a detected face separate them.
+
+    Returns:
+        {"format": "rle", "step": s, "emotions": [...],
+         "segments": [[start, end, emotion_id, samples], ...]}
+    """
+    if is_compact(timeline):
+        return timeline
+
+    emotions = list(EMOTIONS)
+    emotion_ids = {emotion: i for i, emotion in enumerate(emotions)}
+    step = _sample_step(timeline)
+    segments: List[List] = []
+
+    for entry in timeline:
+        timestamp = entry.get("timestamp", 0)
+        emotion = entry.get("emotion", "neutral")
+        if emotion not in emotion_ids:
+            emotion_ids[emotion] = len(emotions)
+            emotions.append(emotion)
+        emotion_id = emotion_ids[emotion]
+
+        if segments:
+            last = segments[-1]
+            contiguous = step == 0 or (timestamp - last[1]) <= step * GAP_TOLERANCE
+            if last[2] == emotion_id and contiguous:
+                last[1] = timestamp
+                last[3] += 1
+                continue
+        segments.append([timestamp, timestamp, emotion_id, 1])
+
+    return {
+        "format": COMPACT_FORMAT,
+        "step": step,
+        "emotions": emotions,
+        "segments": segments,
+    }
+
+
+def decode_timeline(compact: Any) -> List[Dict]:
+    """
+    Expand a compact timeline back into per-sample {"timestamp", "emotion"} dicts.
+
+    Sample timestamps inside a segment are spread evenly between its start
+    and end; legacy (already expanded) timelines are returned unchanged.
+    """
+    if not is_compact(compact):
+        return compact or []
+
+    emotions = compact.get("emotions", EMOTIONS)
+    timeline = []
+
+    for start, end, emotion_id, count in compact.get("segments", []):
+        emotion = emotions[emotion_id]
+        span = end - start
+        for i in range(count):
+            timestamp = start + span * i / (count - 1) if count > 1 else start
+            timeline.append({"timestamp": round(timestamp, 2), "emotion": emotion})
+
+    return timeline
+
+
+def format_facial_analysis(facial_analysis: Dict, form: str = "expanded") -> Dict:
+    """
+    Return facial analysis with its timeline in the requested form.
+
+    Args:
+        facial_analysis: Stored facial analysis (compact or legacy timeline)
+        form: "expanded" or "compact"
+    """
+    if not facial_analysis or "emotion_timeline" not in facial_analysis:
+        return facial_analysis
+
+    timeline = facial_analysis["emotion_timeline"]
+    if form == "compact":
+        converted = encode_timeline(timeline or [])
+    else:
+        converted = decode_timeline(timeline)
+
+    return {**facial_analysis, "emotion_timeline": converted}
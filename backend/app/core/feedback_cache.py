@@ -0,0 +1,141 @@
+"""
+Semantic coach feedback cache
+Process-wide LRU of LLM tips keyed on a quantized fingerprint of the
+performance snapshot, so sessions in a common state reuse earlier tips
+instead of calling the model again
+"""
+
+import time
+from collections import OrderedDict, deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+
+Fingerprint = Tuple
+
+
+def _fraction(value) -> float:
+    """Scores arrive as 0-1 or 0-100 depending on the analyzer"""
+    value = float(value or 0)
+    return value / 100 if value > 1 else value
+
+
+def _band(value: float, step: float) -> int:
+    return int(value // step)
+
+
+def _filler_band(filler_words) -> int:
+    count = len(filler_words or [])
+    return 0 if count == 0 else (1 if count <= 2 else 2)
+
+
+def snapshot_fingerprint(snapshot: Dict, context: str = "") -> Fingerprint:
+    """
+    Quantize a performance snapshot into a cache key.
+
+    Metrics are bucketed coarsely enough that states a coach would give the
+    same tip for collide; the transcript and timestamp are left out.
+    """
+    voice = snapshot.get("voice", {})
+    facial = snapshot.get("facial", {})
+    return (
+        _band(float(voice.get("speech_rate_wpm") or 0), 20),
+        voice.get("speech_rate_quality"),
+        voice.get("pitch_quality"),
+        _band(_fraction(voice.get("clarity_score")), 0.2),
+        _band(_fraction(voice.get("volume_consistency")), 0.2),
+        _band(float(voice.get("voice_score") or 0), 20),
+        _filler_band(voice.get("filler_words")),
+        facial.get("primary_emotion"),
+        _band(_fraction(facial.get("engagement_score")), 0.2),
+        _band(_fraction(facial.get("eye_contact_score")), 0.2),
+        _band(_fraction(facial.get("smile_score")), 0.25),
+        context or "",
+    )
+
+
+class FeedbackCache:
+    """
+    LRU + TTL cache of tips per fingerprint.
+
+    Each fingerprint keeps up to `variants` different tips. A user is never
+    handed a tip they received within their last `recent_per_user` tips; when
+    every cached variant is that recent the lookup misses, and the fresh tip
+    from the model is added as another variant.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 600, variants: int = 3,
+                 recent_per_user: int = 3, max_users: int = 10000):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.variants = variants
+        self.recent_per_user = recent_per_user
+        self.max_users = max_users
+
+        self._entries: "OrderedDict[Fingerprint, Tuple[float, List[str]]]" = OrderedDict()
+        self._recent: "OrderedDict[str, Deque[str]]" = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_key: str, fingerprint: Fingerprint) -> Optional[str]:
+        """A cached tip for this state that the user has not just seen"""
+        entry = self._entries.get(fingerprint)
+        if entry is not None and time.monotonic() - entry[0] > self.ttl:
+            del self._entries[fingerprint]
+            entry = None
+
+        if entry is not None:
+            self._entries.move_to_end(fingerprint)
+            recent = self._recent.get(user_key, ())
+            for tip in entry[1]:
+                if tip not in recent:
+                    self.hits += 1
+                    self.remember(user_key, tip)
+                    return tip
+
+        self.misses += 1
+        return None
+
+    def put(self, fingerprint: Fingerprint, tip: str):
+        """Store a fresh tip as a variant for this state"""
+        entry = self._entries.get(fingerprint)
+        if entry is None or time.monotonic() - entry[0] > self.ttl:
+            self._entries[fingerprint] = (time.monotonic(), [tip])
+        elif tip not in entry[1]:
+            tips = (entry[1] + [tip])[-self.variants:]
+            self._entries[fingerprint] = (entry[0], tips)
+        self._entries.move_to_end(fingerprint)
+
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def remember(self, user_key: str, tip: str):
+        """Record a tip the user was shown"""
+        recent = self._recent.pop(user_key, None)
+        if recent is None:
+            recent = deque(maxlen=self.recent_per_user)
+        recent.append(tip)
+        self._recent[user_key] = recent
+        while len(self._recent) > self.max_users:
+            self._recent.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+        self._recent.clear()
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0
+        }
+
+
+feedback_cache = FeedbackCache(
+    max_entries=settings.FEEDBACK_CACHE_MAX_ENTRIES,
+    ttl=settings.FEEDBACK_CACHE_TTL_SECONDS,
+    variants=settings.FEEDBACK_CACHE_VARIANTS
+)
@@ -0,0 +1,177 @@
+"""
+Background coach feedback scheduling
+Runs LLM feedback generation off the frame path. Streamed replies are
+forwarded token by token and replaced when the metrics move on; otherwise
+requests made while a call is in flight are coalesced into one follow-up call.
+Local rule-based tips are served immediately in between, per the tip policy
+"""
+
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, Optional
+
+from app.core.config import settings
+from app.core.tip_engine import POLICY_LLM, POLICY_LOCAL, tip_policy
+
+logger = logging.getLogger(__name__)
+
+SendFn = Callable[[Dict], Awaitable[None]]
+
+
+class FeedbackScheduler:
+    """
+    One per practice session.
+
+    `request()` never waits. Under the "hybrid" and "local" policies it first
+    sends any due local tip; the LLM is only asked every `llm_interval`
+    seconds ("hybrid") or on every request ("llm").
+
+    When streaming, reply tokens are pushed as `coach_feedback_delta`
+    messages followed by a final `coach_feedback` with the same
+    `feedback_id`. A newer request whose quantized metrics differ from the
+    in-flight one cancels it and starts over; an unchanged one is dropped.
+    A stream that fails, is cancelled or yields no feedback after deltas
+    went out ends with `coach_feedback_abort` for its `feedback_id`.
+    Without streaming, a request made while a call is in flight marks that
+    one more run is wanted. Each run first waits out the coach engine's
+    minimum feedback interval, which would otherwise turn it into a no-op.
+    """
+
+    def __init__(self, session, send: SendFn, policy: Optional[str] = None,
+                 llm_interval: Optional[float] = None, streaming: Optional[bool] = None):
+        self.session = session
+        self.send = send
+        self.policy = policy or tip_policy()
+        self.llm_interval = settings.COACH_LLM_INTERVAL_SECONDS if llm_interval is None else llm_interval
+        self.streaming = settings.COACH_FEEDBACK_STREAMING if streaming is None else streaming
+        self._task: Optional[asyncio.Task] = None
+        self._task_fingerprint = None
+        self._pending = False
+        self._closed = False
+        self._last_llm_request = 0.0
+        self._sequence = 0
+        self._streamed_id: Optional[str] = None
+        self._sends: set = set()
+
+        self.requested = 0
+        self.coalesced = 0
+        self.replaced = 0
+        self.delivered = 0
+        self.aborted = 0
+        self.local_delivered = 0
+
+    def request(self):
+        """Ask for feedback on the session's current metrics"""
+        if self._closed:
+            return
+        self.requested += 1
+
+        if self.policy != POLICY_LLM:
+            tip = self.session.local_tip()
+            if tip:
+                self._send_local(tip)
+        if not self._llm_due():
+            return
+
+        if self._task and not self._task.done():
+            if not self.streaming:
+                self._pending = True
+                self.coalesced += 1
+                return
+            fingerprint = self.session.feedback_fingerprint()
+            if fingerprint == self._task_fingerprint:
+                self.coalesced += 1
+                return
+            # The metrics moved on; the reply being streamed is stale
+            self._task.cancel()
+            self.replaced += 1
+
+        self._last_llm_request = time.monotonic()
+        self._task_fingerprint = self.session.feedback_fingerprint() if self.streaming else None
+        self._task = asyncio.create_task(self._run())
+
+    def _llm_due(self) -> bool:
+        if self.policy == POLICY_LOCAL:
+            return False
+        if self.policy == POLICY_LLM:
+            return True
+        return time.monotonic() - self._last_llm_request >= self.llm_interval
+
+    def _send_soon(self, message: Dict):
+        task = asyncio.create_task(self.send(message))
+        self._sends.add(task)
+        task.add_done_callback(self._sends.discard)
+
+    def _send_local(self, tip: Dict):
+        self._send_soon({"type": "coach_feedback", **tip})
+        self.local_delivered += 1
+
+    def _delta_sender(self, feedback_id: str) -> Callable[[str], Awaitable[None]]:
+        async def send_delta(delta: str):
+            if not self._closed:
+                self._streamed_id = feedback_id
+                await self.send({"type": "coach_feedback_delta", "feedback_id": feedback_id, "delta": delta})
+        return send_delta
+
+    def _abort_draft(self, feedback_id: str):
+        """Tell the client to drop a partially streamed reply that will not be completed"""
+        if self._streamed_id != feedback_id:
+            return
+        self._streamed_id = None
+        # Not awaited: this also runs in a task that is being cancelled
+        self._send_soon({"type": "coach_feedback_abort", "feedback_id": feedback_id})
+        self.aborted += 1
+
+    async def _run(self):
+        while True:
+            self._pending = False
+            self._sequence += 1
+            feedback_id = f"{self.session.session_id}-{self._sequence}"
+            on_delta = self._delta_sender(feedback_id) if self.streaming else None
+            delivered = False
+            try:
+                # The engine answers "" inside its minimum interval; a coalesced
+                # rerun usually starts right after the previous reply, so wait it out
+                delay = self.session.feedback_cooldown()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                    if self._closed:
+                        return
+                result = await self.session.generate_real_time_feedback(on_delta=on_delta)
+                feedback = result.get("feedback") if result else None
+                if feedback and not self._closed:
+                    await self.send({
+                        "type": "coach_feedback",
+                        "feedback_id": feedback_id,
+                        "feedback": feedback,
+                        "confidence": result.get("confidence"),
+                        "source": result.get("source", "llm"),
+                        "timestamp": result.get("timestamp", datetime.now().isoformat())
+                    })
+                    self.delivered += 1
+                    delivered = True
+            except asyncio.CancelledError:
+                self._abort_draft(feedback_id)
+                raise
+            except Exception as e:
+                logger.error(f"❌ Background feedback failed for {self.session.session_id}: {e}")
+            if not delivered:
+                # The engine returns "" when the stream fails partway
+                self._abort_draft(feedback_id)
+
+            # Requests that arrived meanwhile collapse into one more run
+            if not self._pending or self._closed:
+                return
+
+    async def close(self):
+        """Cancel any in-flight feedback call"""
+        self._closed = True
+        if self._task and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+        self._task = None
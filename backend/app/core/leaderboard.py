@@ -0,0 +1,407 @@
+"""
+Leaderboard services
+- submit_score: one bulk_write of conditional upserts into explicit period
+  buckets (daily:YYYY-MM-DD, weekly:YYYY-Www, all_time) in Mongo
+- LeaderboardEngine: per-(category, difficulty, period) Redis sorted sets that
+  serve top-N and rank reads, with Mongo as the durable store
+- Mongo rank fallback: indexed point lookups and counts, used when Redis is
+  unavailable
+"""
+
+import asyncio
+import json
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from pymongo import UpdateOne
+
+from app.db.mongodb import leaderboard_collection
+from app.core.task_stream import get_redis
+
+logger = logging.getLogger(__name__)
+
+LEADERBOARD_CATEGORIES = ["daily", "weekly", "all_time"]
+
+# Total player counts only feed the percentile, so they may lag slightly
+TOTAL_PLAYERS_TTL_SECONDS = 60
+
+_total_players_cache: Dict[Tuple[str, str], Tuple[float, int]] = {}
+
+
+def _scope_query(category: str, difficulty: str) -> Dict:
+    query = {"category": category, "period": period_bucket(category)}
+    if difficulty != "all":
+        query["difficulty"] = difficulty
+    return query
+
+
+async def _count(query: Dict, difficulty: str) -> int:
+    """
+    Players matching query. Rows are per (user, difficulty), so the "all"
+    scope counts distinct users, like the per-user "all" Redis set.
+    """
+    if difficulty != "all":
+        return await leaderboard_collection.count_documents(query)
+    result = await leaderboard_collection.aggregate([
+        {"$match": query},
+        {"$group": {"_id": "$user_id"}},
+        {"$count": "players"}
+    ]).to_list(1)
+    return result[0]["players"] if result else 0
+
+
+async def count_players(category: str, difficulty: str = "all") -> int:
+    """Number of players in a category (cached per process)"""
+    key = (category, difficulty)
+    cached = _total_players_cache.get(key)
+    now = time.monotonic()
+    if cached and cached[0] > now:
+        return cached[1]
+
+    total = await _count(_scope_query(category, difficulty), difficulty)
+    _total_players_cache[key] = (now + TOTAL_PLAYERS_TTL_SECONDS, total)
+    return total
+
+
+def invalidate_player_counts(category: Optional[str] = None):
+    """Drop cached totals, e.g. after a user's first submission"""
+    if category is None:
+        _total_players_cache.clear()
+        return
+    for key in [k for k in _total_players_cache if k[0] == category]:
+        del _total_players_cache[key]
+
+
+async def get_user_rank(user_id: str, category: str = "all_time", difficulty: str = "all") -> Optional[Dict]:
+    """
+    Get a user's rank in a category.
+
+    The user's best entry comes from the (user_id, category, period) index
+    and the rank is one more than the number of players with a strictly
+    higher score, counted over the (category, period[, difficulty], score) index.
+
+    Returns:
+        Dict with rank, score and total_players, or None if the user has no entry
+    """
+    scope = _scope_query(category, difficulty)
+
+    entry = await leaderboard_collection.find_one(
+        {"user_id": user_id, **scope},
+        {"score": 1},
+        sort=[("score", -1)]
+    )
+    if entry is None:
+        return None
+
+    score = entry["score"]
+    higher = await _count({**scope, "score": {"$gt": score}}, difficulty)
+    rank = higher + 1
+    total_players = max(await count_players(category, difficulty), rank)
+
+    return {
+        "rank": rank,
+        "score": score,
+        "total_players": total_players
+    }
+
+
+# ============= PERIOD BUCKETS =============
+
+# Keep finished periods around a little longer than the period itself
+PERIOD_TTL_SECONDS = {
+    "daily": 2 * 24 * 3600,
+    "weekly": 14 * 24 * 3600,
+    "all_time": 0,
+}
+
+
+def period_start(category: str, when: Optional[datetime] = None) -> Optional[datetime]:
+    """Start (UTC) of the period containing `when`; None for all_time"""
+    when = when or datetime.utcnow()
+    day = datetime(when.year, when.month, when.day)
+    if category == "daily":
+        return day
+    if category == "weekly":
+        return day - timedelta(days=day.weekday())
+    return None
+
+
+def period_bucket(category: str, when: Optional[datetime] = None) -> str:
+    """
+    Identifier of the period a score belongs to.
+
+    Examples: "daily:2026-10-16", "weekly:2026-W42", "all_time"
+    """
+    when = when or datetime.utcnow()
+    if category == "daily":
+        return f"daily:{when.strftime('%Y-%m-%d')}"
+    if category == "weekly":
+        year, week, _ = when.isocalendar()
+        return f"weekly:{year}-W{week:02d}"
+    return "all_time"
+
+
+def period_expires_at(category: str, when: Optional[datetime] = None) -> Optional[datetime]:
+    """When a bucket's rows may be removed by the TTL index; None keeps them forever"""
+    start = period_start(category, when)
+    if start is None:
+        return None
+    return start + timedelta(seconds=PERIOD_TTL_SECONDS[category])
+
+
+# ============= MONGO SUBMISSION =============
+
+async def submit_score(
+    user_id: str,
+    username: str,
+    score: float,
+    difficulty: str,
+    session_id: str,
+    timestamp: Optional[datetime] = None
+) -> int:
+    """
+    Record a score in every category's current bucket with a single bulk_write.
+
+    Each bucket row is upserted; the score only ever increases, and the
+    session/timestamp follow the best score. Values are passed through
+    $literal so user input is never interpreted as a field path.
+
+    Returns:
+        Number of bucket rows created (0 if the user already had them all)
+    """
+    timestamp = timestamp or datetime.utcnow()
+    improved = {"$gt": [{"$literal": score}, {"$ifNull": ["$score", float("-inf")]}]}
+
+    operations = []
+    for category in LEADERBOARD_CATEGORIES:
+        bucket = period_bucket(category, timestamp)
+        fields = {
+            "username": {"$literal": username},
+            "score": {"$max": [{"$ifNull": ["$score", score]}, {"$literal": score}]},
+            "session_id": {"$cond": [improved, {"$literal": session_id}, "$session_id"]},
+            "timestamp": {"$cond": [improved, timestamp, "$timestamp"]},
+        }
+        expires_at = period_expires_at(category, timestamp)
+        if expires_at:
+            fields["expires_at"] = expires_at
+
+        operations.append(UpdateOne(
+            {"user_id": user_id, "category": category, "period": bucket, "difficulty": difficulty},
+            [{"$set": fields}],
+            upsert=True
+        ))
+
+    result = await leaderboard_collection.bulk_write(operations, ordered=False)
+    if result.upserted_count:
+        invalidate_player_counts()
+    return result.upserted_count
+
+
+async def backfill_periods() -> int:
+    """
+    Assign period buckets to rows written before bucketing existed.
+
+    Returns:
+        Number of rows updated
+    """
+    operations = []
+    cursor = leaderboard_collection.find(
+        {"period": {"$exists": False}},
+        {"category": 1, "timestamp": 1}
+    )
+    async for entry in cursor:
+        category = entry.get("category", "all_time")
+        when = entry.get("timestamp") or datetime.utcnow()
+        fields = {"period": period_bucket(category, when)}
+        expires_at = period_expires_at(category, when)
+        if expires_at:
+            fields["expires_at"] = expires_at
+        operations.append(UpdateOne({"_id": entry["_id"]}, {"$set": fields}))
+
+    if not operations:
+        return 0
+    result = await leaderboard_collection.bulk_write(operations, ordered=False)
+    return result.modified_count
+
+
+# ============= REDIS SORTED-SET ENGINE =============
+
+# ZADD GT keeps only a user's best score; metadata follows the best score
+_RECORD_SCRIPT = """
+local changed = redis.call('ZADD', KEYS[1], 'GT', 'CH', ARGV[1], ARGV[2])
+if changed == 1 then
+    redis.call('HSET', KEYS[2], ARGV[2], ARGV[3])
+end
+local ttl = tonumber(ARGV[4])
+if ttl > 0 and redis.call('TTL', KEYS[1]) == -1 then
+    redis.call('EXPIRE', KEYS[1], ttl)
+    redis.call('EXPIRE', KEYS[2], ttl)
+end
+return changed
+"""
+
+# Competition rank: 1 + number of strictly higher scores
+_RANK_SCRIPT = """
+local score = redis.call('ZSCORE', KEYS[1], ARGV[1])
+if not score then
+    return nil
+end
+local higher = redis.call('ZCOUNT', KEYS[1], '(' .. score, '+inf')
+return {score, higher, redis.call('ZCARD', KEYS[1])}
+"""
+
+
+class LeaderboardEngine:
+    """
+    Leaderboard reads served from Redis sorted sets.
+
+    One sorted set per (category, difficulty, period) holds each user's best
+    score, plus an "all" difficulty set across difficulties. A companion hash
+    keeps display metadata for the score currently in the set.
+
+    A set missing while Mongo has entries for it (fresh deploy, Redis flush
+    or eviction) is rebuilt from Mongo on first read.
+    """
+
+    def __init__(self, prefix: str = "leaderboard"):
+        self.prefix = prefix
+        self._record_script = None
+        self._rank_script = None
+        self._rebuild_locks: Dict[str, asyncio.Lock] = {}
+
+    def _key(self, category: str, difficulty: str, when: Optional[datetime] = None) -> str:
+        return f"{self.prefix}:{difficulty}:{period_bucket(category, when)}"
+
+    def _scripts(self):
+        if self._record_script is None:
+            redis = get_redis()
+            self._record_script = redis.register_script(_RECORD_SCRIPT)
+            self._rank_script = redis.register_script(_RANK_SCRIPT)
+        return self._record_script, self._rank_script
+
+    async def record(
+        self,
+        user_id: str,
+        username: str,
+        score: float,
+        difficulty: str,
+        session_id: str,
+        timestamp: Optional[datetime] = None,
+        categories: Optional[List[str]] = None
+    ):
+        """Record a score in every category, keeping each user's best (one round-trip)"""
+        timestamp = timestamp or datetime.utcnow()
+        record_script, _ = self._scripts()
+        meta = json.dumps({
+            "username": username,
+            "difficulty": difficulty,
+            "session_id": session_id,
+            "timestamp": timestamp.isoformat()
+        })
+
+        pipe = get_redis().pipeline(transaction=False)
+        for category in categories or LEADERBOARD_CATEGORIES:
+            for scope in (difficulty, "all"):
+                key = self._key(category, scope, timestamp)
+                await record_script(
+                    keys=[key, f"{key}:meta"],
+                    args=[score, user_id, meta, PERIOD_TTL_SECONDS[category]],
+                    client=pipe
+                )
+        await pipe.execute()
+
+    async def _ensure_loaded(self, category: str, difficulty: str):
+        """Rebuild the category's sets if this one is missing but Mongo has scores for it"""
+        key = self._key(category, difficulty)
+        redis = get_redis()
+        if await redis.exists(key):
+            return
+        lock = self._rebuild_locks.setdefault(category, asyncio.Lock())
+        async with lock:
+            # Another reader may have rebuilt it while we waited
+            if await redis.exists(key):
+                return
+            if await leaderboard_collection.find_one(_scope_query(category, difficulty), {"_id": 1}) is None:
+                return  # nobody has scored this period yet
+            logger.warning(f"⚠️ Leaderboard set {key} missing, rebuilding from Mongo")
+            await self.rebuild([category])
+
+    async def top(self, category: str, difficulty: str = "all", limit: int = 100) -> List[Dict]:
+        """Highest scores for the current period, best first"""
+        await self._ensure_loaded(category, difficulty)
+        key = self._key(category, difficulty)
+        redis = get_redis()
+
+        members = await redis.zrevrange(key, 0, limit - 1, withscores=True)
+        if not members:
+            return []
+        metas = await redis.hmget(f"{key}:meta", [user_id for user_id, _ in members])
+
+        entries = []
+        for i, ((user_id, score), meta) in enumerate(zip(members, metas)):
+            entry = json.loads(meta) if meta else {}
+            entries.append({
+                "user_id": user_id,
+                "username": entry.get("username", user_id),
+                "score": score,
+                "difficulty": entry.get("difficulty", difficulty),
+                "session_id": entry.get("session_id"),
+                "timestamp": entry.get("timestamp"),
+                "category": category,
+                "rank": i + 1
+            })
+        return entries
+
+    async def rank(self, user_id: str, category: str, difficulty: str = "all") -> Optional[Dict]:
+        """User's rank for the current period, or None if they have no score"""
+        await self._ensure_loaded(category, difficulty)
+        _, rank_script = self._scripts()
+        result = await rank_script(keys=[self._key(category, difficulty)], args=[user_id])
+        if not result:
+            return None
+
+        score, higher, total = result
+        return {
+            "rank": int(higher) + 1,
+            "score": float(score),
+            "total_players": int(total)
+        }
+
+    async def rebuild(self, categories: Optional[List[str]] = None) -> int:
+        """
+        Rebuild the current period's sorted sets from Mongo.
+
+        Returns:
+            Number of Mongo entries loaded
+        """
+        redis = get_redis()
+        now = datetime.utcnow()
+        loaded = 0
+
+        for category in categories or LEADERBOARD_CATEGORIES:
+            pattern = f"{self.prefix}:*:{period_bucket(category, now)}*"
+            keys = [key async for key in redis.scan_iter(match=pattern)]
+            if keys:
+                await redis.delete(*keys)
+
+            query = {"category": category, "period": period_bucket(category, now)}
+            cursor = leaderboard_collection.find(query)
+            async for entry in cursor:
+                await self.record(
+                    user_id=entry["user_id"],
+                    username=entry.get("username", entry["user_id"]),
+                    score=entry["score"],
+                    difficulty=entry.get("difficulty", "intermediate"),
+                    session_id=entry.get("session_id", ""),
+                    timestamp=entry.get("timestamp") or now,
+                    categories=[category]
+                )
+                loaded += 1
+
+        logger.info(f"🏆 Rebuilt leaderboard sorted sets from {loaded} Mongo entries")
+        return loaded
+
+
+leaderboard_engine = LeaderboardEngine()
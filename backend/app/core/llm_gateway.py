@@ -0,0 +1,331 @@
+"""
+Process-wide LLM gateway
+One pooled OpenRouter client (HTTP/2 keep-alive when available) behind a
+global concurrency limit with per-user fair queuing and jittered retries.
+Synchronous callers run their coroutines on a background event-loop thread
+"""
+
+import asyncio
+import logging
+import random
+import threading
+from collections import OrderedDict, deque
+from typing import AsyncIterator, Coroutine, Deque, Dict, List, Optional, Tuple
+
+import httpx
+from openai import AsyncOpenAI, APIConnectionError, APIStatusError, APITimeoutError, RateLimitError
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+try:
+    import h2  # noqa: F401  (enables httpx HTTP/2)
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+# Required by OpenRouter for attribution
+OPENROUTER_HEADERS = {
+    "HTTP-Referer": "https://speech-trainer-agent.com",
+    "X-Title": "Speech Trainer Agent"
+}
+
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+
+def _concurrency_split() -> Tuple[int, int]:
+    """
+    (async loop, background loop) slots. Each event loop needs its own
+    limiter, so LLM_MAX_CONCURRENCY is divided between them rather than
+    granted twice; each side keeps at least one slot.
+    """
+    total = max(settings.LLM_MAX_CONCURRENCY, 2)
+    background = min(max(settings.LLM_BACKGROUND_CONCURRENCY, 1), total - 1)
+    return total - background, background
+
+
+class FairLimiter:
+    """
+    Concurrency limiter that hands free slots to waiting users round-robin,
+    so one busy user cannot starve everyone else.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.active = 0
+        self._waiters: "OrderedDict[str, Deque[asyncio.Future]]" = OrderedDict()
+
+    @property
+    def waiting(self) -> int:
+        return sum(len(q) for q in self._waiters.values())
+
+    async def acquire(self, user_id: str):
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(user_id, deque()).append(future)
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # The slot was handed over just as we were cancelled
+                self.release()
+            else:
+                self._discard(user_id, future)
+            raise
+
+    def release(self):
+        while self._waiters:
+            user_id, queue = self._waiters.popitem(last=False)
+            future = queue.popleft()
+            if queue:
+                # Back of the line for this user's next request
+                self._waiters[user_id] = queue
+            if not future.done():
+                future.set_result(None)  # the slot passes straight to the waiter
+                return
+        self.active -= 1
+
+    def _discard(self, user_id: str, future: asyncio.Future):
+        queue = self._waiters.get(user_id)
+        if queue is None:
+            return
+        try:
+            queue.remove(future)
+        except ValueError:
+            pass
+        if not queue:
+            del self._waiters[user_id]
+
+
+def _retry_delay(attempt: int, error: Exception) -> float:
+    """Full-jitter exponential backoff, honouring Retry-After when given"""
+    response = getattr(error, "response", None)
+    retry_after = response.headers.get("retry-after") if response is not None else None
+    if retry_after:
+        try:
+            return min(float(retry_after), settings.LLM_RETRY_MAX_DELAY_SECONDS)
+        except ValueError:
+            pass
+    cap = min(settings.LLM_RETRY_MAX_DELAY_SECONDS, settings.LLM_RETRY_BASE_DELAY_SECONDS * (2 ** attempt))
+    return random.uniform(0, cap)
+
+
+def _is_retryable(error: Exception) -> bool:
+    if isinstance(error, (RateLimitError, APIConnectionError, APITimeoutError)):
+        return True
+    return isinstance(error, APIStatusError) and error.status_code in RETRYABLE_STATUS
+
+
+def _create_client() -> AsyncOpenAI:
+    if not settings.OPENROUTER_API_KEY:
+        logger.warning("⚠️ OPENROUTER_API_KEY not found in settings")
+    return AsyncOpenAI(
+        base_url=settings.OPENROUTER_BASE_URL,
+        api_key=settings.OPENROUTER_API_KEY or "dummy_key_to_prevent_crash_on_init",
+        default_headers=OPENROUTER_HEADERS,
+        max_retries=0,
+        http_client=httpx.AsyncClient(
+            http2=HTTP2_AVAILABLE,
+            limits=httpx.Limits(
+                max_connections=settings.LLM_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.LLM_MAX_CONNECTIONS
+            ),
+            timeout=settings.LLM_TIMEOUT_SECONDS
+        )
+    )
+
+
+class BackgroundLoop:
+    """
+    Event loop running forever in a daemon thread.
+
+    Started lazily, so forked workers (Celery prefork) each start their own
+    after the fork. The loop keeps its own client and limiter: connection
+    pools and futures must not be shared across event loops.
+    """
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.client: Optional[AsyncOpenAI] = None
+        self.limiter = FairLimiter(_concurrency_split()[1])
+        self.thread = threading.Thread(target=self._run, name="llm-gateway-loop", daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def submit(self, coro: Coroutine, timeout: Optional[float] = None):
+        future = asyncio.run_coroutine_threadsafe(coro, self.loop)
+        try:
+            return future.result(timeout)
+        except BaseException:
+            future.cancel()
+            raise
+
+    def stop(self):
+        if self.client is not None:
+            self.submit(self.client.close(), timeout=5)
+            self.client = None
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(timeout=5)
+
+
+class LLMGateway:
+    """
+    Shared entry point for chat completions.
+
+    Retries are handled here rather than by the SDK (max_retries=0) so that a
+    request waiting out a backoff does not hold a concurrency slot.
+
+    `limiter` serves callers on their own event loop, the background loop's
+    limiter serves `run_sync`; together they hold LLM_MAX_CONCURRENCY slots.
+    """
+
+    def __init__(self):
+        self.model = settings.OPENROUTER_MODEL
+        self.max_retries = settings.LLM_MAX_RETRIES
+        self.limiter = FairLimiter(_concurrency_split()[0])
+        self._client: Optional[AsyncOpenAI] = None
+        self._background: Optional[BackgroundLoop] = None
+        self._background_lock = threading.Lock()
+
+        self.requests = 0
+        self.retries = 0
+        self.failures = 0
+
+    @property
+    def client(self) -> AsyncOpenAI:
+        if self._client is None:
+            self._client = _create_client()
+        return self._client
+
+    def _bindings(self) -> Tuple[AsyncOpenAI, FairLimiter]:
+        """Client and limiter belonging to the running event loop"""
+        background = self._background
+        if background is not None and asyncio.get_running_loop() is background.loop:
+            if background.client is None:
+                background.client = _create_client()
+            return background.client, background.limiter
+        return self.client, self.limiter
+
+    def run_sync(self, coro: Coroutine, timeout: Optional[float] = None):
+        """
+        Run a coroutine on the gateway's background loop and wait for it.
+
+        For synchronous callers (Celery tasks, sync helpers): connections stay
+        pooled across calls instead of a new loop and client per call.
+        """
+        if self._background is None:
+            with self._background_lock:
+                if self._background is None:
+                    self._background = BackgroundLoop()
+        if threading.current_thread() is self._background.thread:
+            coro.close()
+            raise RuntimeError("run_sync called from the gateway loop; await the coroutine instead")
+        return self._background.submit(coro, timeout)
+
+    async def chat(self, messages: List[Dict], user_id: Optional[str] = None, **params) -> str:
+        """
+        Run a chat completion and return the reply text.
+
+        Args:
+            messages: Chat messages
+            user_id: Used for fair queuing between users
+            **params: Completion parameters (temperature, max_tokens, model, ...)
+        """
+        params.setdefault("model", self.model)
+        self.requests += 1
+        attempt = 0
+        client, limiter = self._bindings()
+        while True:
+            await limiter.acquire(user_id or "anonymous")
+            try:
+                response = await client.chat.completions.create(messages=messages, **params)
+                return response.choices[0].message.content or ""
+            except Exception as e:
+                if not _is_retryable(e) or attempt >= self.max_retries:
+                    self.failures += 1
+                    raise
+                error = e
+            finally:
+                limiter.release()
+
+            delay = _retry_delay(attempt, error)
+            attempt += 1
+            self.retries += 1
+            logger.warning(f"⚠️ LLM request failed ({error}); retry {attempt}/{self.max_retries} in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+    async def chat_stream(self, messages: List[Dict], user_id: Optional[str] = None, **params) -> AsyncIterator[str]:
+        """
+        Stream a chat completion, yielding text deltas as they arrive.
+
+        A failure before the first delta is retried like `chat`; once text has
+        been yielded the error is raised instead, since the caller already
+        forwarded part of the reply. Closing the generator aborts the HTTP
+        stream and frees the slot; consume it inside contextlib.aclosing so
+        that also happens promptly when the consumer is cancelled or fails.
+        """
+        params.setdefault("model", self.model)
+        self.requests += 1
+        attempt = 0
+        client, limiter = self._bindings()
+        while True:
+            await limiter.acquire(user_id or "anonymous")
+            stream = None
+            emitted = False
+            try:
+                stream = await client.chat.completions.create(messages=messages, stream=True, **params)
+                async for chunk in stream:
+                    delta = chunk.choices[0].delta.content if chunk.choices else None
+                    if delta:
+                        emitted = True
+                        yield delta
+                return
+            except Exception as e:
+                if emitted or not _is_retryable(e) or attempt >= self.max_retries:
+                    self.failures += 1
+                    raise
+                error = e
+            finally:
+                if stream is not None:
+                    await stream.close()
+                limiter.release()
+
+            delay = _retry_delay(attempt, error)
+            attempt += 1
+            self.retries += 1
+            logger.warning(f"⚠️ LLM stream failed ({error}); retry {attempt}/{self.max_retries} in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
+        if self._background is not None:
+            background, self._background = self._background, None
+            await asyncio.to_thread(background.stop)
+
+    def stats(self) -> Dict:
+        background = self._background
+        return {
+            "active": self.limiter.active,
+            "waiting": self.limiter.waiting,
+            "limit": self.limiter.limit,
+            "background_loop": background is not None,
+            "background_active": background.limiter.active if background else 0,
+            "background_waiting": background.limiter.waiting if background else 0,
+            "background_limit": background.limiter.limit if background else _concurrency_split()[1],
+            "requests": self.requests,
+            "retries": self.retries,
+            "failures": self.failures,
+            "http2": HTTP2_AVAILABLE
+        }
+
+
+llm_gateway = LLMGateway()
@@ -0,0 +1,184 @@
+"""
+Write-behind buffer for realtime metrics
+Queues per-session documents in memory and writes them with insert_many on
+size or time thresholds, keeping Mongo latency off the realtime path
+"""
+
+import asyncio
+import logging
+from collections import deque
+from typing import Deque, Dict, List, Optional
+
+from app.core.config import settings
+from app.db.mongodb import realtime_metrics_collection, realtime_achievements_collection
+
+logger = logging.getLogger(__name__)
+
+
+class _SessionWriter:
+    """Serializes a session's writes; dropped once nobody is using it"""
+
+    __slots__ = ("lock", "users")
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.users = 0
+
+
+class MetricsWriteBuffer:
+    """
+    Per-session write-behind queue for one collection.
+
+    A session is flushed as soon as it has `batch_size` documents queued, and
+    every session is flushed at least every `flush_interval` seconds. At most
+    `max_pending` documents are held in memory; beyond that new documents are
+    dropped and counted rather than blocking the caller.
+
+    A session's batches are taken and written under a per-session lock, so
+    writes stay in order and `drain` cannot return while one is still running.
+    """
+
+    def __init__(self, collection, batch_size: int = 50, flush_interval: float = 2.0, max_pending: int = 10000):
+        self.collection = collection
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+
+        self._queues: Dict[str, Deque[Dict]] = {}
+        self._pending = 0
+        self._flusher: Optional[asyncio.Task] = None
+        self._stop = asyncio.Event()
+        self._writers: Dict[str, _SessionWriter] = {}
+        self._inflight: set = set()
+
+        self.dropped = 0
+        self.written = 0
+
+    def add(self, session_id: str, document: Dict) -> bool:
+        """
+        Queue a document without waiting on the database.
+
+        Returns:
+            False if the buffer was full and the document was dropped
+        """
+        if self._pending >= self.max_pending:
+            self.dropped += 1
+            if self.dropped % 1000 == 1:
+                logger.warning(f"⚠️ Metrics buffer full, dropped {self.dropped} documents so far")
+            return False
+
+        queue = self._queues.setdefault(session_id, deque())
+        queue.append(document)
+        self._pending += 1
+        self._ensure_flusher()
+
+        if len(queue) >= self.batch_size:
+            task = asyncio.create_task(self.flush(session_id))
+            self._inflight.add(task)
+            task.add_done_callback(self._inflight.discard)
+        return True
+
+    async def flush(self, session_id: Optional[str] = None) -> int:
+        """
+        Write queued documents for one session, or all sessions.
+
+        Returns:
+            Number of documents written
+        """
+        session_ids = [session_id] if session_id else list(self._queues)
+        written = 0
+        for sid in session_ids:
+            written += await self._write_session(sid)
+        return written
+
+    async def _write_session(self, session_id: str) -> int:
+        writer = self._writers.get(session_id)
+        if writer is None:
+            writer = self._writers[session_id] = _SessionWriter()
+        writer.users += 1
+        try:
+            # Waits for a write of this session already in progress
+            async with writer.lock:
+                queue = self._queues.pop(session_id, None)
+                if not queue:
+                    return 0
+                batch: List[Dict] = list(queue)
+                self._pending -= len(batch)
+                try:
+                    await self.collection.insert_many(batch, ordered=False)
+                except Exception as e:
+                    self.dropped += len(batch)
+                    logger.error(f"❌ Failed to write {len(batch)} buffered documents for {session_id}: {e}")
+                    return 0
+                self.written += len(batch)
+                return len(batch)
+        finally:
+            writer.users -= 1
+            if not writer.users:
+                del self._writers[session_id]
+
+    async def drain(self, session_id: Optional[str] = None) -> int:
+        """Like flush, but also waits for size-triggered writes already in flight"""
+        if self._inflight:
+            await asyncio.gather(*list(self._inflight), return_exceptions=True)
+        return await self.flush(session_id)
+
+    async def close(self):
+        """Stop the periodic flusher and write everything still queued"""
+        if self._flusher:
+            # Let a flush that is mid-write finish; cancelling it would lose its batch
+            self._stop.set()
+            await asyncio.gather(self._flusher, return_exceptions=True)
+            self._flusher = None
+            self._stop.clear()
+        await self.drain()
+
+    def stats(self) -> Dict:
+        return {
+            "pending": self._pending,
+            "sessions": len(self._queues),
+            "written": self.written,
+            "dropped": self.dropped
+        }
+
+    def _ensure_flusher(self):
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.create_task(self._run_flusher())
+
+    async def _run_flusher(self):
+        while not self._stop.is_set():
+            try:
+                await asyncio.wait_for(self._stop.wait(), self.flush_interval)
+                return
+            except asyncio.TimeoutError:
+                pass
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"❌ Periodic metrics flush failed: {e}")
+
+
+metrics_buffer = MetricsWriteBuffer(
+    realtime_metrics_collection,
+    batch_size=settings.METRICS_FLUSH_BATCH_SIZE,
+    flush_interval=settings.METRICS_FLUSH_INTERVAL_SECONDS,
+    max_pending=settings.METRICS_BUFFER_MAX_PENDING
+)
+
+achievements_buffer = MetricsWriteBuffer(
+    realtime_achievements_collection,
+    batch_size=settings.METRICS_FLUSH_BATCH_SIZE,
+    flush_interval=settings.METRICS_FLUSH_INTERVAL_SECONDS,
+    max_pending=settings.METRICS_BUFFER_MAX_PENDING
+)
+
+
+async def flush_session(session_id: str):
+    """Write everything buffered for a session (on disconnect / before finalizing)"""
+    await metrics_buffer.drain(session_id)
+    await achievements_buffer.drain(session_id)
+
+
+async def close_buffers():
+    await metrics_buffer.close()
+    await achievements_buffer.close()
@@ -0,0 +1,141 @@
+"""
+Realtime metrics rollups
+Downsamples realtime_metrics into per-second and per-minute aggregates per
+session; session replay and history charts read these instead of raw samples
+"""
+
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from app.db.mongodb import realtime_metrics_collection, realtime_metrics_rollups_collection
+
+logger = logging.getLogger(__name__)
+
+# Resolution name -> $dateTrunc unit
+RESOLUTIONS = {"1s": "second", "1m": "minute"}
+BUCKET_SECONDS = {"1s": 1, "1m": 60}
+
+TIMELINE_PROJECTION = {"_id": 0, "session_id": 0, "resolution": 0, "rolled_up_at": 0}
+
+AVERAGED_FIELDS = [
+    "total_score", "facial_score", "voice_score", "content_score",
+    "engagement_score", "eye_contact_score", "smile_score",
+    "speech_rate_wpm", "volume_db", "pitch_hz",
+]
+
+
+def _aggregate_stages(match: Dict, resolution: str) -> List[Dict]:
+    group = {
+        "_id": {
+            "session_id": "$session_id",
+            "bucket": {"$dateTrunc": {"date": "$timestamp", "unit": RESOLUTIONS[resolution]}}
+        },
+        "samples": {"$sum": 1},
+        "max_combo": {"$max": "$combo_count"},
+        "filler_words": {"$sum": {"$cond": [{"$ifNull": ["$filler_word_detected", False]}, 1, 0]}},
+    }
+    for field in AVERAGED_FIELDS:
+        group[field] = {"$avg": f"${field}"}
+
+    return [
+        {"$match": match},
+        {"$group": group},
+        {"$set": {
+            "session_id": "$_id.session_id",
+            "bucket": "$_id.bucket",
+            "resolution": resolution,
+            "rolled_up_at": "$$NOW"
+        }},
+        {"$unset": "_id"},
+    ]
+
+
+def _rollup_pipeline(match: Dict, resolution: str) -> List[Dict]:
+    return _aggregate_stages(match, resolution) + [
+        {"$merge": {
+            "into": realtime_metrics_rollups_collection.name,
+            "on": ["session_id", "resolution", "bucket"],
+            "whenMatched": "replace",
+            "whenNotMatched": "insert"
+        }}
+    ]
+
+
+async def rollup_window(since: datetime, until: datetime, session_id: Optional[str] = None):
+    """
+    (Re)build rollups for samples in [since, until) at every resolution.
+
+    `since` is aligned down to the minute so minute buckets are always built
+    from all of their samples; rebuilding a bucket replaces it.
+    """
+    since = since.replace(second=0, microsecond=0)
+    match: Dict = {"timestamp": {"$gte": since, "$lt": until}}
+    if session_id:
+        match["session_id"] = session_id
+
+    for resolution in RESOLUTIONS:
+        await realtime_metrics_collection.aggregate(_rollup_pipeline(match, resolution)).to_list(None)
+
+
+async def rollup_session(session_id: str):
+    """Build all rollups for one session"""
+    for resolution in RESOLUTIONS:
+        pipeline = _rollup_pipeline({"session_id": session_id}, resolution)
+        await realtime_metrics_collection.aggregate(pipeline).to_list(None)
+
+
+async def get_session_timeline(session_id: str, resolution: str = "1s") -> List[Dict]:
+    """
+    Metrics timeline for a session, oldest bucket first.
+
+    Stored rollups are used for buckets that had closed when they were rolled
+    up. Later buckets are aggregated from the raw samples on each request;
+    `partial` marks a bucket that is still open (more samples may arrive).
+    Sessions the periodic job has not reached yet are rolled up on demand.
+    """
+    query = {"session_id": session_id, "resolution": resolution}
+    projection = {"_id": 0, "session_id": 0, "resolution": 0}
+
+    rows = await realtime_metrics_rollups_collection.find(query, projection).sort("bucket", 1).to_list(None)
+    if not rows:
+        await rollup_session(session_id)
+        rows = await realtime_metrics_rollups_collection.find(query, projection).sort("bucket", 1).to_list(None)
+
+    width = timedelta(seconds=BUCKET_SECONDS[resolution])
+    final = []
+    for row in rows:
+        if row["bucket"] + width > row.pop("rolled_up_at"):
+            break  # this bucket and everything after it may be incomplete
+        row["partial"] = False
+        final.append(row)
+
+    # Fold in the samples recorded after the last closed rollup bucket
+    match: Dict = {"session_id": session_id}
+    if final:
+        match["timestamp"] = {"$gte": final[-1]["bucket"] + width}
+    live = await realtime_metrics_collection.aggregate(
+        _aggregate_stages(match, resolution) + [{"$project": TIMELINE_PROJECTION}, {"$sort": {"bucket": 1}}]
+    ).to_list(None)
+
+    now = datetime.utcnow()
+    for row in live:
+        row["partial"] = row["bucket"] + width > now
+    return final + live
+
+
+async def run_rollups(interval: float, lookback: float):
+    """
+    Periodically roll up recent samples.
+
+    Each pass re-covers `lookback` seconds so samples that arrive late (for
+    example from the write-behind buffer) still land in their buckets.
+    """
+    while True:
+        until = datetime.utcnow()
+        try:
+            await rollup_window(until - timedelta(seconds=lookback), until)
+        except Exception as e:
+            logger.error(f"❌ Metrics rollup failed: {e}")
+        await asyncio.sleep(interval)
@@ -5,30 +5,36 @@ Provides intelligent, context-aware feedback using OpenRouter API (OpenAI-compat
 
 import os
 import json
-import asyncio
+import contextlib
+import logging
 import time
-from typing import Dict, List, Optional, Tuple
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
 from datetime import datetime
-from openai import AsyncOpenAI
 from app.core.config import settings
+from app.core.llm_gateway import llm_gateway
+from app.core.feedback_cache import feedback_cache, snapshot_fingerprint
+from app.core.prompt_budget import bounded_lines, clip_tokens, estimate_tokens, fit_levels
 import numpy as np
 
+logger = logging.getLogger(__name__)
+
+# Session summary list sizes, most to least detailed:
+# (items per list, tokens per strength/weakness, tokens per past feedback)
+SUMMARY_DETAIL_LEVELS = [(5, 40, 60), (3, 30, 40), (2, 20, 25), (1, 15, 15), (0, 0, 0)]
+
 class OpenRouterCoachEngine:
     """
     AI Coach powered by OpenRouter
     Provides real-time feedback based on performance metrics
     """
     
-    def __init__(self):
-        """Initialize OpenRouter API client"""
-        api_key = settings.OPENROUTER_API_KEY
-        if not api_key:
-            print("⚠️ WARNING: OPENROUTER_API_KEY not found in settings")
-        
-        self.client = AsyncOpenAI(
-            base_url="https://openrouter.ai/api/v1",
-            api_key=api_key or "dummy_key_to_prevent_crash_on_init"
-        )
+    def __init__(self, user_id: Optional[str] = None):
+        """Use the process-wide LLM gateway (shared pooled client)"""
+        self.user_id = user_id
+        self.gateway = llm_gateway
+        self.cache = feedback_cache
+        # Variety rules are per user; anonymous sessions are tracked per engine
+        self.cache_key = user_id or f"engine:{id(self)}"
         
         self.model_name = getattr(settings, "OPENROUTER_MODEL", "google/gemini-2.0-flash-001")
         
@@ -87,15 +93,23 @@ METRICS YOU'LL RECEIVE:
 
 Respond ONLY with feedback - no explanations, meta-commentary, or preamble."""
     
+    def feedback_cooldown(self) -> float:
+        """Seconds until generate_real_time_feedback stops returning "" for rate limiting"""
+        return max(0.0, self.min_feedback_interval - (time.time() - self.last_feedback_time))
+
     async def generate_real_time_feedback(
         self,
         voice_metrics: Dict,
         facial_metrics: Dict,
         transcript_segment: str = "",
-        context: str = ""
+        context: str = "",
+        on_delta: Optional[Callable[[str], Awaitable[None]]] = None
     ) -> str:
         """
         Generate real-time feedback based on current performance metrics.
+        
+        If `on_delta` is given the completion is streamed and each text delta
+        is passed to it as it arrives; the full feedback is still returned.
         """
         
         # Rate limiting - don't give feedback too frequently
@@ -111,6 +125,14 @@ Respond ONLY with feedback - no explanations, meta-commentary, or preamble."""
                 transcript_segment
             )
             
+            # Reuse a tip already generated for an equivalent state
+            fingerprint = snapshot_fingerprint(performance_snapshot, context)
+            cached = self.cache.get(self.cache_key, fingerprint)
+            if cached:
+                self._update_feedback_history(cached, performance_snapshot)
+                self.last_feedback_time = current_time
+                return cached
+            
             # Construct prompt
             prompt = self._construct_feedback_prompt(
                 performance_snapshot,
@@ -118,13 +140,19 @@ Respond ONLY with feedback - no explanations, meta-commentary, or preamble."""
             )
             
             # Get feedback from OpenRouter
-            feedback = await self._call_openrouter_async(prompt)
+            if on_delta:
+                feedback = await self._stream_openrouter_async(prompt, on_delta)
+            else:
+                feedback = await self._call_openrouter_async(prompt)
             
             if feedback:
+                feedback = feedback.strip()
+                self.cache.put(fingerprint, feedback)
+                self.cache.remember(self.cache_key, feedback)
                 # Update history and metrics
                 self._update_feedback_history(feedback, performance_snapshot)
                 self.last_feedback_time = current_time
-                return feedback.strip()
+                return feedback
             
             return ""
             
@@ -139,95 +167,64 @@ Respond ONLY with feedback - no explanations, meta-commentary, or preamble."""
         transcript_segment: str = "",
         context: str = ""
     ) -> str:
-        """Synchronous version for non-async contexts - wraps async call"""
-        # Since we are using an async client, we need to run it in a loop
-        # But if this is called from within an async loop (which is likely given it is fastapi),
-        # we might have issues.
-        # However, looking at the error, it seems something expects this method to exist.
-        # Let's verify where it is called from. 
-        # If it's called from a sync context, we can use asyncio.run or loop.run_until_complete
-        # If it's called from async, we should change the caller to use generate_real_time_feedback
+        """
+        Synchronous version for non-async contexts.
         
-        # For now, let's implement a wrapper.
+        Runs on the gateway's background event loop, so repeated calls reuse
+        its pooled connections rather than creating a loop and client each time.
+        """
         try:
-            loop = asyncio.get_event_loop()
-        except RuntimeError:
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            
-        if loop.is_running():
-            # If loop is running, we can't block it. 
-            # We should return a Task or Future, but this function signature expects str.
-            # This implies the design pattern might be flawed for async usage here if the caller is sync.
-            # But let's look at GeminiCoachEngine. It had generate_feedback_sync.
-            # It used self.model.generate_content(prompt) which IS sync blocking I/O in google-generativeai.
-            
-            # For OpenAI/OpenRouter, we can use the synchronous client!
-            # Let's initialize a sync client as well or just for this method.
-            from openai import OpenAI
-            api_key = settings.OPENROUTER_API_KEY
-            client = OpenAI(
-                base_url="https://openrouter.ai/api/v1",
-                api_key=api_key or "dummy"
+            return self.gateway.run_sync(
+                self.generate_real_time_feedback(voice_metrics, facial_metrics, transcript_segment, context)
             )
-            
-            # Rate limiting check
-            if time.time() - self.last_feedback_time < self.min_feedback_interval:
-                return ""
-
-            performance_snapshot = self._build_performance_snapshot(voice_metrics, facial_metrics, transcript_segment)
-            prompt = self._construct_feedback_prompt(performance_snapshot, context)
-            
-            try:
-                response = client.chat.completions.create(
-                    model=self.model_name,
-                    messages=[
-                        {"role": "system", "content": self._get_system_prompt()},
-                        {"role": "user", "content": prompt}
-                    ],
-                    temperature=0.7,
-                    max_tokens=200,
-                    top_p=0.95,
-                    extra_headers={
-                        "HTTP-Referer": "https://speech-trainer-agent.com",
-                        "X-Title": "Speech Trainer Agent"
-                    }
-                )
-                feedback = response.choices[0].message.content
-                if feedback:
-                    self._update_feedback_history(feedback, performance_snapshot)
-                    self.last_feedback_time = time.time()
-                    return feedback.strip()
-            except Exception as e:
-                print(f"❌ OpenRouter Sync Error: {e}")
-                
+        except Exception as e:
+            print(f"❌ OpenRouter Sync Error: {e}")
             return ""
-        else:
-             # Loop not running, standard sync call
-             return asyncio.run(self.generate_real_time_feedback(voice_metrics, facial_metrics, transcript_segment, context))
 
     async def _call_openrouter_async(self, prompt: str) -> str:
-        """Asynchronously call OpenRouter API"""
+        """Asynchronously call OpenRouter API through the shared gateway"""
         try:
-            response = await self.client.chat.completions.create(
-                model=self.model_name,
-                messages=[
+            return await self.gateway.chat(
+                [
                     {"role": "system", "content": self._get_system_prompt()},
                     {"role": "user", "content": prompt}
                 ],
+                user_id=self.user_id,
+                model=self.model_name,
                 temperature=0.7,
                 max_tokens=200,
-                top_p=0.95,
-                extra_headers={
-                    "HTTP-Referer": "https://speech-trainer-agent.com", # Required by OpenRouter
-                    "X-Title": "Speech Trainer Agent"
-                }
+                top_p=0.95
             )
-            return response.choices[0].message.content
         except Exception as e:
             print(f"❌ OpenRouter API Error: {e}")
             raise e
     
+    async def _stream_openrouter_async(self, prompt: str, on_delta: Callable[[str], Awaitable[None]]) -> str:
+        """Stream a completion through the shared gateway, forwarding each delta"""
+        parts = []
+        # aclosing: on cancellation or an on_delta error the HTTP stream and the
+        # limiter slot are released now, not whenever the generator is collected
+        stream = self.gateway.chat_stream(
+            [
+                {"role": "system", "content": self._get_system_prompt()},
+                {"role": "user", "content": prompt}
+            ],
+            user_id=self.user_id,
+            model=self.model_name,
+            temperature=0.7,
+            max_tokens=200,
+            top_p=0.95
+        )
+        async with contextlib.aclosing(stream) as deltas:
+            async for delta in deltas:
+                parts.append(delta)
+                await on_delta(delta)
+        return "".join(parts)
+    
+    def feedback_fingerprint(self, voice_metrics: Dict, facial_metrics: Dict, context: str = ""):
+        """Quantized key for the current metrics (same key the feedback cache uses)"""
+        return snapshot_fingerprint(self._build_performance_snapshot(voice_metrics, facial_metrics, ""), context)
+    
     def _build_performance_snapshot(
         self,
         voice_metrics: Dict,
@@ -373,7 +370,10 @@ Provide ONLY feedback - be brief, specific, and actionable. No meta-commentary."
     ) -> str:
         """Generate comprehensive session summary using OpenRouter"""
         try:
-            summary_prompt = f"""Based on this entire practice session, provide a comprehensive, encouraging summary (2-3 paragraphs):
+            def render(detail):
+                max_items, tokens_each, feedback_tokens = detail
+                history = self.feedback_history[-max_items:] if max_items else []
+                return f"""Based on this entire practice session, provide a comprehensive, encouraging summary (2-3 paragraphs):
 
 SESSION STATISTICS:
 - Total Feedback Points: {len(self.feedback_history)}
@@ -383,20 +383,23 @@ SESSION STATISTICS:
 - Words Spoken: {feedback_session_data.get('word_count', 0)}
 
 KEY STRENGTHS IDENTIFIED:
-{chr(10).join(f"- {s}" for s in feedback_session_data.get('strengths', []))}
+{bounded_lines(feedback_session_data.get('strengths', []), max_items, tokens_each)}
 
 AREAS FOR IMPROVEMENT:
-{chr(10).join(f"- {w}" for w in feedback_session_data.get('weaknesses', []))}
+{bounded_lines(feedback_session_data.get('weaknesses', []), max_items, tokens_each)}
 
 FEEDBACK HISTORY:
-{chr(10).join(f"{i+1}. {f['feedback']}" for i, f in enumerate(self.feedback_history[-5:]))}
+{chr(10).join(f"{i+1}. {clip_tokens(f['feedback'], feedback_tokens)}" for i, f in enumerate(history))}
 
 Provide an encouraging but honest summary that:
 1. Celebrates their efforts and improvements
 2. Identifies key takeaways
 3. Suggests focused practice areas
 4. Motivates them to continue improving"""
-            
+
+            # Shorten the lists until the prompt fits; the instructions are never cut
+            summary_prompt = fit_levels(render, SUMMARY_DETAIL_LEVELS, settings.LLM_SUMMARY_PROMPT_MAX_TOKENS)
+            logger.debug(f"📏 Session summary prompt: ~{estimate_tokens(summary_prompt)} tokens")
             response = await self._call_openrouter_async(summary_prompt)
             return response.strip()
             
@@ -0,0 +1,188 @@
+"""
+LLM prompt budgeting
+Keeps prompts under an input-token cap: long transcripts are windowed to
+head, tail and evenly sampled middle excerpts, counts are summarized
+compactly, and the resulting prompt size is reported back to the caller
+"""
+
+import logging
+import math
+from typing import Callable, Dict, List, Sequence, TypeVar
+
+logger = logging.getLogger(__name__)
+
+try:
+    import tiktoken
+    _ENCODING = tiktoken.get_encoding("cl100k_base")
+except Exception:  # not installed, or encoding files unavailable offline
+    _ENCODING = None
+
+GAP_MARKER = " [...] "
+
+Level = TypeVar("Level")
+
+
+def estimate_tokens(text: str) -> int:
+    """Token count via tiktoken when available, otherwise ~4 characters per token"""
+    if not text:
+        return 0
+    if _ENCODING is not None:
+        return len(_ENCODING.encode(text, disallowed_special=()))
+    return math.ceil(len(text) / 4)
+
+
+def clip_tokens(text: str, max_tokens: int) -> str:
+    """Hard-truncate text to at most max_tokens"""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    if max_tokens <= 0:
+        return ""
+    if _ENCODING is not None:
+        return _ENCODING.decode(_ENCODING.encode(text, disallowed_special=())[:max_tokens])
+    return text[:max_tokens * 4]
+
+
+def window_text(text: str, max_tokens: int, samples: int = 3, head_share: float = 0.35,
+                tail_share: float = 0.35) -> str:
+    """
+    Shorten text to roughly max_tokens, keeping its opening, its ending and a
+    few evenly spaced excerpts from the middle (joined with [...] markers).
+    """
+    if estimate_tokens(text) <= max_tokens:
+        return text
+
+    words = text.split()
+    tokens_per_word = max(estimate_tokens(text) / max(len(words), 1), 0.1)
+    budget_words = int(max_tokens / tokens_per_word)
+
+    while budget_words > 0:
+        head = int(budget_words * head_share)
+        tail = int(budget_words * tail_share)
+        middle_words = words[head:len(words) - tail]
+        excerpt = (budget_words - head - tail) // samples if samples else 0
+
+        parts = [" ".join(words[:head])]
+        if excerpt > 0 and middle_words:
+            stride = len(middle_words) / samples
+            for i in range(samples):
+                # Centre each excerpt in its slice of the middle section
+                start = int(stride * i + max(stride - excerpt, 0) / 2)
+                parts.append(" ".join(middle_words[start:start + excerpt]))
+        parts.append(" ".join(words[len(words) - tail:]) if tail else "")
+
+        windowed = GAP_MARKER.join(p for p in parts if p).strip()
+        if estimate_tokens(windowed) <= max_tokens:
+            return windowed
+        budget_words = int(budget_words * 0.9)
+
+    return clip_tokens(text, max_tokens)
+
+
+def summarize_counts(counts: Dict[str, int], top: int = 5) -> str:
+    """e.g. 'happy 45%, neutral 30%, surprise 15%, other 10% (n=120)'"""
+    total = sum(counts.values())
+    if not total:
+        return "none detected"
+    ranked = sorted(counts.items(), key=lambda kv: kv[1], reverse=True)
+    parts = [f"{name} {count / total:.0%}" for name, count in ranked[:top]]
+    rest = sum(count for _, count in ranked[top:])
+    if rest:
+        parts.append(f"other {rest / total:.0%}")
+    return f"{', '.join(parts)} (n={total})"
+
+
+def bounded_lines(items: List[str], max_items: int, max_tokens_each: int, prefix: str = "- ") -> str:
+    """Newline-joined list limited in length and per-item size"""
+    return "\n".join(f"{prefix}{clip_tokens(str(item), max_tokens_each)}" for item in items[:max_items])
+
+
+class BudgetedPrompt:
+    """A prompt fitted to a token budget, with the numbers behind it"""
+
+    __slots__ = ("text", "tokens", "max_tokens", "transcript_tokens", "original_transcript_tokens")
+
+    def __init__(self, text: str, tokens: int, max_tokens: int, transcript_tokens: int,
+                 original_transcript_tokens: int):
+        self.text = text
+        self.tokens = tokens
+        self.max_tokens = max_tokens
+        self.transcript_tokens = transcript_tokens
+        self.original_transcript_tokens = original_transcript_tokens
+
+    @property
+    def windowed(self) -> bool:
+        return self.transcript_tokens < self.original_transcript_tokens
+
+    def report(self) -> Dict:
+        return {
+            "prompt_tokens": self.tokens,
+            "max_tokens": self.max_tokens,
+            "transcript_tokens": self.transcript_tokens,
+            "original_transcript_tokens": self.original_transcript_tokens,
+            "windowed": self.windowed,
+            "estimator": "tiktoken" if _ENCODING is not None else "chars/4"
+        }
+
+    def describe(self) -> str:
+        note = (f", transcript windowed {self.original_transcript_tokens}->{self.transcript_tokens}"
+                if self.windowed else "")
+        return f"LLM prompt: ~{self.tokens} tokens (cap {self.max_tokens}{note})"
+
+
+def fit_prompt(render: Callable[[str], str], transcript: str, max_tokens: int) -> BudgetedPrompt:
+    """
+    Render a prompt whose only variable-size part is the transcript.
+
+    The transcript gets whatever the rest of the prompt leaves under the cap
+    and is windowed further (down to nothing) if the rendered prompt still
+    comes out too large. The template itself is never cut, so the
+    instructions and output schema at its end always survive.
+
+    Args:
+        render: Builds the full prompt from a (possibly windowed) transcript
+        transcript: Full transcript text
+        max_tokens: Input-token cap for the whole prompt
+
+    Returns:
+        BudgetedPrompt; over max_tokens only if the template alone is
+    """
+    transcript = transcript or ""
+    original_tokens = estimate_tokens(transcript)
+    overhead = estimate_tokens(render(""))
+    budget = max_tokens - overhead
+
+    windowed = window_text(transcript, budget) if budget > 0 else ""
+    text = render(windowed)
+    tokens = estimate_tokens(text)
+    while tokens > max_tokens and windowed:
+        # Token counts are not additive across the join; give the transcript less
+        budget = min(budget - (tokens - max_tokens), int(budget * 0.9))
+        windowed = window_text(transcript, budget) if budget > 0 else ""
+        text = render(windowed)
+        tokens = estimate_tokens(text)
+    if tokens > max_tokens:
+        logger.warning(f"⚠️ Prompt template alone is over budget ({tokens} > {max_tokens})")
+
+    return BudgetedPrompt(text, tokens, max_tokens, estimate_tokens(windowed), original_tokens)
+
+
+def fit_levels(render: Callable[[Level], str], levels: Sequence[Level], max_tokens: int) -> str:
+    """
+    Render a prompt at decreasing levels of detail until it fits.
+
+    Args:
+        render: Builds the full prompt for one level (e.g. list lengths)
+        levels: Most to least detailed; the last should drop the variable parts
+        max_tokens: Input-token cap for the whole prompt
+
+    Returns:
+        The first rendering under max_tokens, else the least detailed one
+    """
+    text = ""
+    for level in levels:
+        text = render(level)
+        tokens = estimate_tokens(text)
+        if tokens <= max_tokens:
+            return text
+    logger.warning(f"⚠️ Prompt template alone is over budget ({tokens} > {max_tokens})")
+    return text
@@ -0,0 +1,55 @@
+"""
+Realtime session statistics
+Server-side $group aggregations over a session's metrics and achievements,
+so finalizing a session costs the same however long it ran
+"""
+
+from typing import Dict
+
+from app.db.mongodb import realtime_metrics_collection, realtime_achievements_collection
+
+
+async def aggregate_session_stats(session_id: str) -> Dict:
+    """
+    Aggregate a realtime session's metrics and achievements.
+    
+    Args:
+        session_id: Session identifier
+        
+    Returns:
+        Dictionary with average_score, max_combo, filler_words_count,
+        metrics_count, total_xp_earned and achievements_count
+    """
+    metrics = await realtime_metrics_collection.aggregate([
+        {"$match": {"session_id": session_id}},
+        {"$group": {
+            "_id": None,
+            "average_score": {"$avg": "$total_score"},
+            "max_combo": {"$max": "$combo_count"},
+            "filler_words_count": {
+                "$sum": {"$cond": [{"$ifNull": ["$filler_word_detected", False]}, 1, 0]}
+            },
+            "metrics_count": {"$sum": 1}
+        }}
+    ]).to_list(1)
+    
+    achievements = await realtime_achievements_collection.aggregate([
+        {"$match": {"session_id": session_id}},
+        {"$group": {
+            "_id": None,
+            "total_xp_earned": {"$sum": "$xp_earned"},
+            "achievements_count": {"$sum": 1}
+        }}
+    ]).to_list(1)
+    
+    metric_stats = metrics[0] if metrics else {}
+    achievement_stats = achievements[0] if achievements else {}
+    
+    return {
+        "average_score": metric_stats.get("average_score"),
+        "max_combo": metric_stats.get("max_combo"),
+        "filler_words_count": metric_stats.get("filler_words_count", 0),
+        "metrics_count": metric_stats.get("metrics_count", 0),
+        "total_xp_earned": achievement_stats.get("total_xp_earned", 0),
+        "achievements_count": achievement_stats.get("achievements_count", 0)
+    }
@@ -0,0 +1,191 @@
+"""
+In-session challenge tracking
+Evaluates a practice session's active challenges against running metric
+averages, reports progress changes for the practice WebSocket and persists
+the final result once when the session ends
+"""
+
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from app.core.challenge_catalog import challenge_catalog
+from app.core.challenge_rules import get_compiled_challenge
+from app.core.challenge_tracker import update_challenge_progress
+from app.db.mongodb import user_challenges_collection
+
+logger = logging.getLogger(__name__)
+
+# Users without an account never get challenge records
+ANONYMOUS_USER = "anonymous"
+
+
+class RunningMean:
+    """Incremental mean that ignores missing samples"""
+
+    __slots__ = ("count", "mean")
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+
+    def add(self, value: Optional[float]):
+        if value is None:
+            return
+        self.count += 1
+        self.mean += (value - self.mean) / self.count
+
+    @property
+    def value(self) -> Optional[float]:
+        return self.mean if self.count else None
+
+
+class SessionChallengeTracker:
+    """
+    Tracks challenge progress for one practice session.
+
+    Metrics are folded into running averages as they stream in. Progress is
+    previewed with the challenges' non-cumulative rules (cumulative ones such
+    as session counts only apply once the session is over).
+    """
+
+    def __init__(self, user_id: str):
+        self.user_id = user_id
+        self.enabled = bool(user_id) and user_id != ANONYMOUS_USER
+        self.started_at = datetime.utcnow()
+
+        self._challenges: List[Dict] = []
+        self._records: Dict[str, Dict] = {}
+        self._last_sent: Dict[str, tuple] = {}
+        self._broken: set = set()
+        self._dirty = False
+        self._persisted = False
+
+        self.eye_contact = RunningMean()
+        self.engagement = RunningMean()
+        self.speech_rate = RunningMean()
+        self.volume_db = RunningMean()
+        self.total_score = RunningMean()
+        self.facial_score = RunningMean()
+        self.voice_score = RunningMean()
+        self.content_score = RunningMean()
+
+    async def load(self):
+        """Load the active challenges the user can still progress"""
+        if not self.enabled:
+            return
+        catalog = await challenge_catalog.get()
+        records = await user_challenges_collection.find(
+            {"user_id": self.user_id},
+            {"_id": 0}
+        ).to_list(100)
+        self._records = {r["challenge_id"]: r for r in records}
+        self._challenges = [
+            c for c in catalog.active()
+            if not self._records.get(c["challenge_id"], {}).get("completed")
+        ]
+
+    # ============= METRIC INGESTION =============
+
+    def observe_facial(self, facial_analysis: Dict):
+        if not facial_analysis or not facial_analysis.get("face_detected", True):
+            return
+        # Eye contact arrives as 0-1, challenge targets are percentages
+        eye_contact = facial_analysis.get("eye_contact_score")
+        self.eye_contact.add(eye_contact * 100 if eye_contact is not None else None)
+        self.engagement.add(facial_analysis.get("engagement_score"))
+        self._dirty = True
+
+    def observe_voice(self, voice_analysis: Dict):
+        if not voice_analysis:
+            return
+        # Silence (0 WPM, 0 dB) would drag the averages towards zero
+        if voice_analysis.get("speech_rate_wpm"):
+            self.speech_rate.add(voice_analysis["speech_rate_wpm"])
+        if voice_analysis.get("volume_db"):
+            self.volume_db.add(voice_analysis["volume_db"])
+        self._dirty = True
+
+    def observe_score(self, score: Dict):
+        if not score:
+            return
+        self.total_score.add(score.get("total_score"))
+        self.facial_score.add(score.get("facial_score"))
+        self.voice_score.add(score.get("voice_score"))
+        self.content_score.add(score.get("content_score"))
+        self._dirty = True
+
+    def session_metrics(self) -> Dict[str, Any]:
+        """Session metrics in the shape update_challenge_progress expects"""
+        metrics = {
+            "duration": (datetime.utcnow() - self.started_at).total_seconds(),
+            "average_score": self.total_score.value,
+            "eye_contact_avg": self.eye_contact.value,
+            "engagement_score": self.engagement.value,
+            "speech_rate_wpm": self.speech_rate.value,
+            "volume_db": self.volume_db.value,
+            "facial_score": self.facial_score.value,
+            "voice_score": self.voice_score.value,
+            "content_score": self.content_score.value,
+        }
+        return {k: v for k, v in metrics.items() if v is not None}
+
+    # ============= PROGRESS =============
+
+    def poll_changes(self) -> List[Dict]:
+        """
+        Challenges whose previewed progress changed since the last poll.
+
+        Returns:
+            List of progress entries (empty if nothing changed)
+        """
+        if not self._dirty or not self._challenges:
+            return []
+        self._dirty = False
+
+        metrics = self.session_metrics()
+        changes = []
+        for challenge in self._challenges:
+            challenge_id = challenge["challenge_id"]
+            if challenge_id in self._broken:
+                continue
+            preview = dict(self._records.get(challenge_id, {}))
+            try:
+                compiled = get_compiled_challenge(challenge)
+                if not compiled.realtime_rules or not compiled.apply(preview, metrics, realtime=True):
+                    continue
+            except Exception:
+                # Skip a malformed challenge for the rest of the session (logged once)
+                # rather than stopping progress on the others
+                self._broken.add(challenge_id)
+                logger.exception(f"⚠️ Could not evaluate challenge {challenge_id}")
+                continue
+
+            entry = {
+                "challenge_id": challenge_id,
+                "title": challenge["title"],
+                "progress": round(preview.get("progress", 0), 1),
+                "current_value": _round(preview.get("current_value", 0)),
+                "target_value": preview.get("target_value"),
+                "completed": preview.get("completed", False),
+            }
+            key = (entry["progress"], entry["current_value"], entry["completed"])
+            if self._last_sent.get(challenge_id) != key:
+                self._last_sent[challenge_id] = key
+                changes.append(entry)
+        return changes
+
+    async def persist(self) -> Optional[Dict]:
+        """Write the session's challenge progress once; later calls are no-ops"""
+        if not self.enabled or self._persisted:
+            return None
+        self._persisted = True
+        try:
+            return await update_challenge_progress(self.user_id, self.session_metrics())
+        except Exception as e:
+            logger.error(f"❌ Failed to persist challenge progress for {self.user_id}: {e}")
+            return None
+
+
+def _round(value: Any) -> Any:
+    return round(value, 1) if isinstance(value, float) else value
@@ -0,0 +1,199 @@
+"""
+Structured LLM output
+Requests JSON mode, validates replies against a Pydantic model, repairs
+common formatting damage locally and re-asks only for the fields that are
+still broken, instead of discarding the whole reply
+"""
+
+import json
+import logging
+import re
+from typing import Dict, List, Optional, Set, Type
+
+from openai import BadRequestError
+from pydantic import BaseModel, ValidationError
+
+logger = logging.getLogger(__name__)
+
+JSON_MODE = {"type": "json_object"}
+
+_FENCE = re.compile(r"^\s*```[a-zA-Z]*\s*|\s*```\s*$")
+_TRAILING_COMMA = re.compile(r",\s*([}\]])")
+_CLOSERS = {"{": "}", "[": "]"}
+
+
+def _balanced_object(text: str) -> Optional[str]:
+    """
+    The first top-level JSON object in text. If the text ends before the
+    object closes (a truncated reply), the open string and brackets are closed.
+    """
+    start = text.find("{")
+    if start == -1:
+        return None
+
+    stack: List[str] = []
+    in_string = False
+    escaped = False
+    for i in range(start, len(text)):
+        char = text[i]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+            continue
+        if char == '"':
+            in_string = True
+        elif char in _CLOSERS:
+            stack.append(_CLOSERS[char])
+        elif char in "}]":
+            if stack:
+                stack.pop()
+            if not stack:
+                return text[start:i + 1]
+
+    tail = text[start:].rstrip().rstrip(",")
+    if in_string:
+        tail += '"'
+    return tail + "".join(reversed(stack))
+
+
+def repair_json(text: str) -> Optional[Dict]:
+    """
+    Parse an LLM reply as a JSON object, fixing the usual damage: code fences,
+    prose around the object, trailing commas and truncation.
+
+    Returns:
+        The parsed object, or None if it could not be recovered
+    """
+    if not text:
+        return None
+    candidates = [text.strip()]
+    unfenced = _FENCE.sub("", text.strip())
+    candidates.append(unfenced)
+    extracted = _balanced_object(unfenced)
+    if extracted:
+        candidates.append(extracted)
+        candidates.append(_TRAILING_COMMA.sub(r"\1", extracted))
+
+    for candidate in candidates:
+        try:
+            data = json.loads(candidate)
+        except ValueError:
+            continue
+        if isinstance(data, dict):
+            return data
+    return None
+
+
+def validate_partial(model: Type[BaseModel], data: Dict):
+    """
+    Validate data, keeping the top-level fields that are valid.
+
+    Returns:
+        (instance, broken) where broken holds the top-level fields that were
+        missing or invalid and were filled with their defaults
+    """
+    data = {k: v for k, v in (data or {}).items() if k in model.model_fields}
+    broken: Set[str] = set(model.model_fields) - set(data)
+    try:
+        return model.model_validate(data), broken
+    except ValidationError as e:
+        invalid = {err["loc"][0] for err in e.errors() if err.get("loc")}
+        broken |= invalid
+        valid = {k: v for k, v in data.items() if k not in invalid}
+        return model.model_validate(valid), broken
+
+
+def _field_schema(model: Type[BaseModel], fields: Set[str]) -> Dict:
+    schema = model.model_json_schema()
+    subset = {
+        "type": "object",
+        "properties": {name: schema["properties"][name] for name in fields},
+        "required": sorted(fields)
+    }
+    if "$defs" in schema:
+        subset["$defs"] = schema["$defs"]
+    return subset
+
+
+class StructuredResult:
+    """Validated reply plus how it was obtained"""
+
+    __slots__ = ("value", "repaired", "retried_fields", "defaulted_fields")
+
+    def __init__(self, value: BaseModel, repaired: bool, retried_fields: Set[str], defaulted_fields: Set[str]):
+        self.value = value
+        self.repaired = repaired
+        self.retried_fields = retried_fields
+        self.defaulted_fields = defaulted_fields
+
+    def describe(self) -> str:
+        notes = []
+        if self.repaired:
+            notes.append("repaired locally")
+        if self.retried_fields:
+            notes.append(f"re-asked for {', '.join(sorted(self.retried_fields))}")
+        if self.defaulted_fields:
+            notes.append(f"defaults used for {', '.join(sorted(self.defaulted_fields))}")
+        return "; ".join(notes) or "valid on first parse"
+
+
+async def _chat_json(gateway, messages: List[Dict], user_id: Optional[str], **params) -> str:
+    """Chat in JSON mode, falling back to plain mode where the provider rejects it"""
+    try:
+        return await gateway.chat(messages, user_id=user_id, response_format=JSON_MODE, **params)
+    except BadRequestError as e:
+        logger.warning(f"⚠️ JSON mode rejected ({e}); retrying without response_format")
+        return await gateway.chat(messages, user_id=user_id, **params)
+
+
+async def structured_chat(gateway, messages: List[Dict], model: Type[BaseModel],
+                          user_id: Optional[str] = None, max_field_retries: int = 1,
+                          **params) -> StructuredResult:
+    """
+    Chat completion validated against `model`.
+
+    The reply is parsed (with local repair if needed) and validated field by
+    field. Fields still missing or invalid are requested again, alone, up to
+    `max_field_retries` times; whatever remains broken falls back to the
+    model's defaults.
+    """
+    reply = await _chat_json(gateway, messages, user_id, **params)
+    data = None
+    repaired = False
+    try:
+        data = json.loads(reply)
+    except ValueError:
+        data = repair_json(reply)
+        repaired = data is not None
+    if not isinstance(data, dict):
+        data = {}
+
+    value, broken = validate_partial(model, data)
+    retried: Set[str] = set()
+
+    for _ in range(max_field_retries):
+        if not broken:
+            break
+        retried |= broken
+        followup = messages + [
+            {"role": "assistant", "content": reply},
+            {"role": "user", "content": (
+                f"The JSON above is invalid or incomplete for: {', '.join(sorted(broken))}. "
+                f"Return ONLY a JSON object with exactly these keys, matching this schema:\n"
+                f"{json.dumps(_field_schema(model, broken))}"
+            )}
+        ]
+        try:
+            reply = await _chat_json(gateway, followup, user_id, **params)
+        except Exception as e:
+            logger.warning(f"⚠️ Field retry failed: {e}")
+            break
+        patch = repair_json(reply) or {}
+        data = {**data, **{k: v for k, v in patch.items() if k in broken}}
+        value, broken = validate_partial(model, data)
+
+    return StructuredResult(value, repaired, retried, broken)
@@ -0,0 +1,99 @@
+"""
+Compact analysis task status
+Reads the small status fields the worker maintains on `analysis_results`
+so /status never touches the Celery result backend or the full payload
+"""
+
+import asyncio
+import time
+from typing import Dict, Optional
+
+from app.db.mongodb import analysis_results_collection
+from app.core.task_stream import task_stream_hub
+
+# Only the fields a progress poller needs; the full result lives behind /analysis/{task_id}
+STATUS_PROJECTION = {
+    "_id": 0,
+    "task_id": 1,
+    "status": 1,
+    "stage": 1,
+    "progress": 1,
+    "status_version": 1,
+    "error": 1,
+}
+
+# Mongo record status -> Celery-style state the frontend already understands
+STATE_BY_STATUS = {
+    "PENDING": "PENDING",
+    "PROCESSING": "PROGRESS",
+    "COMPLETED": "SUCCESS",
+    "FAILED": "FAILURE",
+}
+
+TERMINAL_STATUSES = {"COMPLETED", "FAILED"}
+
+
+async def get_task_status(task_id: str) -> Dict:
+    """
+    Fetch the compact status for a task.
+
+    A task whose record has not been written yet is reported as PENDING,
+    matching what Celery's AsyncResult used to return for unknown IDs.
+    """
+    doc = await analysis_results_collection.find_one(
+        {"task_id": task_id},
+        STATUS_PROJECTION
+    )
+    doc = doc or {"task_id": task_id, "status": "PENDING"}
+
+    status = doc.get("status", "PENDING")
+    result = {
+        "task_id": task_id,
+        "state": STATE_BY_STATUS.get(status, status),
+        "status": status,
+        "stage": doc.get("stage"),
+        "progress": doc.get("progress", 100 if status == "COMPLETED" else 0),
+        "version": doc.get("status_version", 0),
+    }
+    if doc.get("error"):
+        result["error"] = doc["error"]
+    return result
+
+
+def status_etag(status: Dict) -> str:
+    """Weak ETag that changes whenever the worker bumps the status"""
+    return f'W/"{status["version"]}-{status["status"]}"'
+
+
+async def wait_for_status_change(task_id: str, etag: str, timeout: float) -> Optional[Dict]:
+    """
+    Long-poll until the task's status no longer matches `etag`.
+
+    The worker publishes a log line for every stage change, so instead of
+    re-reading Mongo in a tight loop this waits on the task's log channel
+    (shared through the stream hub) and re-reads only when something happened.
+
+    Returns:
+        The new status, or None if nothing changed within `timeout` seconds
+    """
+    queue = await task_stream_hub.subscribe(task_id)
+    try:
+        deadline = time.monotonic() + timeout
+        while True:
+            # Re-read after (re)subscribing so a change between the caller's
+            # read and the subscription is not missed
+            status = await get_task_status(task_id)
+            if status_etag(status) != etag:
+                return status
+            if status["status"] in TERMINAL_STATUSES:
+                return None
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            try:
+                await asyncio.wait_for(queue.get(), timeout=remaining)
+            except asyncio.TimeoutError:
+                return None
+    finally:
+        await task_stream_hub.unsubscribe(task_id, queue)
@@ -0,0 +1,230 @@
+"""
+Async Redis access for analysis task log streaming
+Backs the /stream/{task_id} SSE endpoint with a shared, non-blocking connection pool
+and an in-process hub that fans one Redis subscription per task out to every viewer
+"""
+
+import asyncio
+import logging
+import time
+from typing import AsyncIterator, Dict, Optional, Set
+
+import redis.asyncio as aioredis
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Published by the Celery worker (see app/worker.py)
+TASK_LOG_CHANNEL = "task_logs:{task_id}"
+TERMINAL_MESSAGE = "DONE"
+FAILED_MESSAGE = "FAILED"
+
+_pool: Optional[aioredis.BlockingConnectionPool] = None
+_client: Optional[aioredis.Redis] = None
+
+
+def get_redis() -> aioredis.Redis:
+    """
+    Get the process-wide async Redis client.
+
+    All callers share one connection pool, so opening a stream no longer
+    creates a new client (and TCP connection) per request.
+    """
+    global _pool, _client
+    if _client is None:
+        _pool = aioredis.BlockingConnectionPool.from_url(
+            settings.REDIS_URL,
+            max_connections=settings.REDIS_MAX_CONNECTIONS,
+            decode_responses=True,
+        )
+        _client = aioredis.Redis(connection_pool=_pool)
+    return _client
+
+
+async def close_redis():
+    """Close the shared client and release pooled connections"""
+    global _pool, _client
+    if _client is not None:
+        await _client.close()
+    if _pool is not None:
+        await _pool.disconnect()
+    _client = None
+    _pool = None
+
+
+class _TaskChannel:
+    """One Redis subscription for a task, shared by all local viewers"""
+
+    def __init__(self, task_id: str):
+        self.task_id = task_id
+        self.channel = TASK_LOG_CHANNEL.format(task_id=task_id)
+        self.subscribers: Set[asyncio.Queue] = set()
+        self.ready = asyncio.Event()
+        self.reader: Optional[asyncio.Task] = None
+
+
+class TaskStreamHub:
+    """
+    Multiplexes task log channels to SSE clients.
+
+    Each process holds at most one Redis subscription per task ID, no matter
+    how many browser tabs are watching it. Messages are fanned out through
+    bounded per-client queues; a viewer that falls behind loses messages
+    instead of stalling the others.
+    """
+
+    # Pushed to client queues when the Redis subscription dies unexpectedly
+    CLOSED = object()
+
+    def __init__(self, queue_size: int = 256):
+        self.queue_size = queue_size
+        self._channels: Dict[str, _TaskChannel] = {}
+        self.dropped_messages = 0
+
+    async def subscribe(self, task_id: str) -> asyncio.Queue:
+        """
+        Register a viewer for a task.
+
+        Returns once the Redis subscription is live, so no message published
+        after this call can be missed.
+        """
+        channel = self._channels.get(task_id)
+        if channel is None:
+            channel = _TaskChannel(task_id)
+            self._channels[task_id] = channel
+            channel.reader = asyncio.create_task(self._read(channel))
+
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        channel.subscribers.add(queue)
+        try:
+            await channel.ready.wait()
+        except asyncio.CancelledError:
+            await self.unsubscribe(task_id, queue)
+            raise
+        return queue
+
+    async def unsubscribe(self, task_id: str, queue: asyncio.Queue):
+        """Remove a viewer; the Redis subscription closes with the last one"""
+        channel = self._channels.get(task_id)
+        if channel is None:
+            return
+
+        channel.subscribers.discard(queue)
+        if not channel.subscribers:
+            self._close(channel)
+            if channel.reader is not None and channel.reader is not asyncio.current_task():
+                channel.reader.cancel()
+
+    def active_channels(self) -> int:
+        """Number of Redis subscriptions currently held by this process"""
+        return len(self._channels)
+
+    def _close(self, channel: _TaskChannel):
+        if self._channels.get(channel.task_id) is channel:
+            del self._channels[channel.task_id]
+
+    def _publish(self, channel: _TaskChannel, item, force: bool = False):
+        """Fan an item out to every viewer, dropping it for full queues"""
+        for queue in list(channel.subscribers):
+            try:
+                queue.put_nowait(item)
+            except asyncio.QueueFull:
+                if not force:
+                    self.dropped_messages += 1
+                    continue
+                # Terminal items must arrive: evict the oldest message instead
+                queue.get_nowait()
+                self.dropped_messages += 1
+                queue.put_nowait(item)
+
+    async def _read(self, channel: _TaskChannel):
+        """Reader task: owns the pubsub connection for one task"""
+        pubsub = get_redis().pubsub(ignore_subscribe_messages=True)
+        try:
+            await pubsub.subscribe(channel.channel)
+            channel.ready.set()
+
+            while True:
+                message = await pubsub.get_message(
+                    ignore_subscribe_messages=True,
+                    timeout=settings.TASK_STREAM_HEARTBEAT_SECONDS
+                )
+                if message is None:
+                    continue
+
+                data = message["data"]
+                if data == TERMINAL_MESSAGE:
+                    self._close(channel)
+                    self._publish(channel, data, force=True)
+                    break
+                self._publish(channel, data)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"❌ Task log subscription failed for {channel.channel}: {e}")
+            self._close(channel)
+            self._publish(channel, self.CLOSED, force=True)
+        finally:
+            channel.ready.set()
+            try:
+                await asyncio.shield(_release_pubsub(pubsub, channel.channel))
+            except Exception as e:
+                logger.warning(f"⚠️ Failed to release pubsub for {channel.channel}: {e}")
+
+
+task_stream_hub = TaskStreamHub()
+
+
+async def stream_task_logs(task_id: str, timeout: Optional[float] = None) -> AsyncIterator[Dict]:
+    """
+    Yield SSE events for a task's log channel until a terminal message (DONE or FAILED) arrives.
+
+    Viewers share the task's subscription through the hub and wait on their
+    own queue, so idle streams cost no event-loop time. The viewer is always
+    unregistered on exit, including when the client disconnects and the
+    generator is cancelled.
+
+    Args:
+        task_id: Celery task ID whose logs should be streamed
+        timeout: Seconds to wait for the terminal message before giving up
+
+    Yields:
+        Dictionaries understood by sse_starlette's EventSourceResponse
+    """
+    timeout = settings.TASK_STREAM_TIMEOUT_SECONDS if timeout is None else timeout
+    queue = await task_stream_hub.subscribe(task_id)
+
+    try:
+        yield {"data": "Connection Established..."}
+
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                yield {"data": "Stream timed out waiting for analysis to finish."}
+                break
+
+            try:
+                data = await asyncio.wait_for(queue.get(), timeout=remaining)
+            except asyncio.TimeoutError:
+                continue
+
+            if data is TaskStreamHub.CLOSED:
+                yield {"data": "Log stream interrupted."}
+                break
+            if data == TERMINAL_MESSAGE:
+                yield {"data": "Analysis Completed."}
+                break
+            if data == FAILED_MESSAGE:
+                yield {"data": "Analysis Failed."}
+                break
+            yield {"data": data}
+    finally:
+        await task_stream_hub.unsubscribe(task_id, queue)
+
+
+async def _release_pubsub(pubsub, channel: str):
+    """Unsubscribe and return the pubsub connection to the pool"""
+    await pubsub.unsubscribe(channel)
+    await pubsub.reset()
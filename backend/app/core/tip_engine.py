@@ -0,0 +1,200 @@
+"""
+Local coaching tip engine
+Prioritized rule table over voice, facial and pacing metrics that produces
+realtime tips with no network calls; the LLM is kept for richer periodic advice
+"""
+
+import time
+from typing import Callable, Dict, List, Optional
+
+from app.core.config import settings
+
+Metrics = Dict[str, float]
+
+# Tip policies for practice sessions
+POLICY_LOCAL = "local"    # rule-based tips only
+POLICY_HYBRID = "hybrid"  # local tips immediately, LLM every COACH_LLM_INTERVAL_SECONDS
+POLICY_LLM = "llm"        # LLM on every request (no local tier)
+POLICIES = {POLICY_LOCAL, POLICY_HYBRID, POLICY_LLM}
+
+
+class TipRule:
+    """
+    One coaching tip.
+
+    `enter` decides when the issue starts and `exit` when it is resolved;
+    keeping them apart (hysteresis) stops a metric hovering around a single
+    threshold from toggling the tip on every sample.
+    """
+
+    __slots__ = ("name", "category", "priority", "message", "enter", "exit")
+
+    def __init__(self, name: str, category: str, priority: int, message: str,
+                 enter: Callable[[Metrics], bool], exit: Callable[[Metrics], bool]):
+        self.name = name
+        self.category = category
+        self.priority = priority
+        self.message = message
+        self.enter = enter
+        self.exit = exit
+
+
+def _fraction(value) -> float:
+    """Scores arrive as 0-1 or 0-100 depending on the analyzer"""
+    value = float(value or 0)
+    return value / 100 if value > 1 else value
+
+
+def normalize_metrics(voice: Dict, facial: Dict) -> Metrics:
+    """Flatten analyzer output into the fields the rules read"""
+    voice = voice or {}
+    facial = facial or {}
+    filler_words = voice.get("filler_words") or []
+    if voice.get("filler_word_detected"):
+        filler_words = list(filler_words) + [voice["filler_word_detected"]]
+    return {
+        "wpm": float(voice.get("speech_rate_wpm") or 0),
+        "rate_quality": voice.get("speech_rate_quality"),
+        "clarity": _fraction(voice.get("clarity_score")),
+        "volume_consistency": _fraction(voice.get("volume_consistency")),
+        "pitch_quality": voice.get("pitch_quality"),
+        "filler_count": len(filler_words),
+        "eye_contact": _fraction(facial.get("eye_contact_score")),
+        "smile": _fraction(facial.get("smile_score")),
+        "engagement": _fraction(facial.get("engagement_score")),
+        "engagement_level": facial.get("engagement_level"),
+        "face_detected": facial.get("face_detected", True),
+    }
+
+
+# Highest priority first. Voice thresholds only apply while the user is speaking
+# (non-zero readings), so silence does not trigger corrections.
+TIP_RULES: List[TipRule] = [
+    TipRule(
+        "face_missing", "presence", 100, "Move back into frame so your expressions come through.",
+        enter=lambda m: not m["face_detected"],
+        exit=lambda m: m["face_detected"]
+    ),
+    TipRule(
+        "filler_words", "filler", 90, "Pause instead of using filler words - silence sounds confident.",
+        enter=lambda m: m["filler_count"] > 0,
+        exit=lambda m: m["filler_count"] == 0
+    ),
+    TipRule(
+        "too_fast", "pace", 80, "Try to speak a bit slower for better clarity.",
+        enter=lambda m: m["rate_quality"] == "too_fast" or m["wpm"] > 170,
+        exit=lambda m: m["rate_quality"] != "too_fast" and m["wpm"] < 160
+    ),
+    TipRule(
+        "too_slow", "pace", 75, "You can pick up the pace slightly.",
+        enter=lambda m: m["rate_quality"] == "too_slow" or 0 < m["wpm"] < 100,
+        exit=lambda m: m["rate_quality"] != "too_slow" and (m["wpm"] == 0 or m["wpm"] >= 110)
+    ),
+    TipRule(
+        "eye_contact", "eye_contact", 70, "Maintain better eye contact with the camera.",
+        enter=lambda m: m["face_detected"] and m["eye_contact"] < 0.4,
+        exit=lambda m: m["eye_contact"] >= 0.5
+    ),
+    TipRule(
+        "volume", "volume", 60, "Try to maintain a consistent speaking volume.",
+        enter=lambda m: 0 < m["volume_consistency"] < 0.6,
+        exit=lambda m: m["volume_consistency"] == 0 or m["volume_consistency"] >= 0.7
+    ),
+    TipRule(
+        "monotone", "pitch", 55, "Add more variation to your tone to stay engaging.",
+        enter=lambda m: m["pitch_quality"] == "monotone",
+        exit=lambda m: m["pitch_quality"] not in ("monotone", None)
+    ),
+    TipRule(
+        "clarity", "clarity", 50, "Articulate the ends of your words for clearer speech.",
+        enter=lambda m: 0 < m["clarity"] < 0.6,
+        exit=lambda m: m["clarity"] == 0 or m["clarity"] >= 0.7
+    ),
+    TipRule(
+        "low_energy", "engagement", 45, "Keep your energy up to engage the audience.",
+        enter=lambda m: m["face_detected"] and (m["engagement_level"] == "low" or m["engagement"] < 0.4),
+        exit=lambda m: m["engagement_level"] != "low" and m["engagement"] >= 0.5
+    ),
+    TipRule(
+        "smile", "expression", 30, "Don't forget to smile occasionally!",
+        enter=lambda m: m["face_detected"] and m["smile"] < 0.3,
+        exit=lambda m: m["smile"] >= 0.4
+    ),
+    TipRule(
+        "doing_great", "praise", 10, "You're doing great! Keep maintaining this energy.",
+        enter=lambda m: m["face_detected"] and m["engagement"] >= 0.7 and m["eye_contact"] >= 0.6,
+        exit=lambda m: m["engagement"] < 0.6 or m["eye_contact"] < 0.5
+    ),
+]
+
+
+class TipEngine:
+    """
+    Per-session tip selection.
+
+    Each rule switches on and off with hysteresis. The highest-priority active
+    rule whose category is out of cooldown is served, at most one tip every
+    `min_interval` seconds; a category keeps quiet for `cooldown` seconds
+    after one of its tips is shown.
+    """
+
+    def __init__(self, rules: Optional[List[TipRule]] = None,
+                 cooldown: float = 15.0, min_interval: float = 4.0):
+        self.rules = sorted(rules or TIP_RULES, key=lambda r: -r.priority)
+        self.cooldown = cooldown
+        self.min_interval = min_interval
+
+        self._active: set = set()
+        self._category_served: Dict[str, float] = {}
+        self._last_served = float("-inf")
+        self.served = 0
+
+    def observe(self, metrics: Metrics) -> List[TipRule]:
+        """Update rule states; returns the active rules, highest priority first"""
+        for rule in self.rules:
+            if rule.name in self._active:
+                if rule.exit(metrics):
+                    self._active.discard(rule.name)
+            elif rule.enter(metrics):
+                self._active.add(rule.name)
+        return [r for r in self.rules if r.name in self._active]
+
+    def next_tip(self, voice: Dict, facial: Dict, now: Optional[float] = None) -> Optional[Dict]:
+        """
+        The tip to show now, if any.
+
+        Returns:
+            Tip dict (category, message, priority) or None
+        """
+        now = time.monotonic() if now is None else now
+        active = self.observe(normalize_metrics(voice, facial))
+        if now - self._last_served < self.min_interval:
+            return None
+
+        for rule in active:
+            if now - self._category_served.get(rule.category, float("-inf")) < self.cooldown:
+                continue
+            self._category_served[rule.category] = now
+            self._last_served = now
+            self.served += 1
+            return {"category": rule.category, "message": rule.message, "priority": rule.priority}
+        return None
+
+    def reset(self):
+        self._active.clear()
+        self._category_served.clear()
+        self._last_served = float("-inf")
+
+
+def describe(voice: Dict, facial: Dict, limit: int = 2) -> str:
+    """Stateless summary of the top issues (used when the LLM is unavailable)"""
+    metrics = normalize_metrics(voice, facial)
+    messages = [r.message for r in TIP_RULES if r.category != "praise" and r.enter(metrics)]
+    if not messages:
+        return "You're doing great! Keep maintaining this energy."
+    return " ".join(messages[:limit])
+
+
+def tip_policy() -> str:
+    policy = settings.COACH_TIP_POLICY.lower()
+    return policy if policy in POLICIES else POLICY_HYBRID
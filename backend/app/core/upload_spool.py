@@ -0,0 +1,174 @@
+"""
+Managed spool directory for uploaded videos
+Streams uploads to disk in chunks, enforces the size limit while streaming,
+hashes content on the fly and cleans files up once their analysis is done
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+import time
+import uuid
+from typing import Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+PARTIAL_SUFFIX = ".part"
+
+
+class UploadTooLarge(Exception):
+    """Raised when an upload exceeds the spool's size limit"""
+
+    def __init__(self, max_bytes: int):
+        super().__init__(f"Upload exceeds {max_bytes} bytes")
+        self.max_bytes = max_bytes
+
+
+class SpooledUpload:
+    """A fully written upload sitting in the spool directory"""
+
+    def __init__(self, path: str, size: int, sha256: str, filename: str):
+        self.path = path
+        self.size = size
+        self.sha256 = sha256
+        self.filename = filename
+
+
+class UploadSpool:
+    """
+    Owns the lifecycle of files in the upload directory.
+
+    Files are written as `<uuid><ext>.part` and renamed once complete, so a
+    half-written upload is never handed to the worker. The worker calls
+    `discard()` when its task finishes; `sweep_orphans()` removes anything
+    left behind by crashed requests or workers.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        max_bytes: int,
+        chunk_size: int = 1024 * 1024,
+        orphan_max_age: float = 6 * 3600
+    ):
+        self.directory = os.path.realpath(directory)
+        self.max_bytes = max_bytes
+        self.chunk_size = chunk_size
+        self.orphan_max_age = orphan_max_age
+
+    async def ingest(self, upload) -> SpooledUpload:
+        """
+        Stream an UploadFile into the spool.
+
+        Args:
+            upload: Starlette/FastAPI UploadFile
+
+        Returns:
+            SpooledUpload with the absolute path, byte size and SHA-256 digest
+
+        Raises:
+            UploadTooLarge: As soon as more than `max_bytes` have been read
+        """
+        os.makedirs(self.directory, exist_ok=True)
+
+        extension = os.path.splitext(upload.filename or "")[1]
+        final_path = os.path.join(self.directory, f"{uuid.uuid4()}{extension}")
+        partial_path = final_path + PARTIAL_SUFFIX
+
+        digest = hashlib.sha256()
+        size = 0
+        buffer = await asyncio.to_thread(open, partial_path, "wb")
+        try:
+            while True:
+                chunk = await upload.read(self.chunk_size)
+                if not chunk:
+                    break
+
+                size += len(chunk)
+                if size > self.max_bytes:
+                    raise UploadTooLarge(self.max_bytes)
+
+                digest.update(chunk)
+                await asyncio.to_thread(buffer.write, chunk)
+
+            await asyncio.to_thread(buffer.close)
+            await asyncio.to_thread(os.replace, partial_path, final_path)
+        except BaseException:
+            await asyncio.to_thread(buffer.close)
+            self._remove(partial_path)
+            raise
+
+        return SpooledUpload(final_path, size, digest.hexdigest(), upload.filename)
+
+    def discard(self, path: Optional[str]) -> bool:
+        """
+        Delete a spooled file once its task has finished.
+
+        Only paths inside the spool directory are touched, so a task argument
+        can never be used to delete arbitrary files.
+
+        Returns:
+            True if a file was removed
+        """
+        if not path:
+            return False
+
+        path = os.path.realpath(path)
+        if os.path.dirname(path) != self.directory:
+            logger.warning(f"⚠️ Refusing to discard file outside upload spool: {path}")
+            return False
+        return self._remove(path)
+
+    def sweep_orphans(self, max_age: Optional[float] = None) -> int:
+        """
+        Remove spool files older than `max_age` seconds.
+
+        Returns:
+            Number of files removed
+        """
+        max_age = self.orphan_max_age if max_age is None else max_age
+        if not os.path.isdir(self.directory):
+            return 0
+
+        cutoff = time.time() - max_age
+        removed = 0
+        for entry in os.scandir(self.directory):
+            try:
+                if entry.is_file() and entry.stat().st_mtime < cutoff:
+                    if self._remove(entry.path):
+                        removed += 1
+            except OSError:
+                continue
+
+        if removed:
+            logger.info(f"🧹 Removed {removed} orphaned upload(s) from {self.directory}")
+        return removed
+
+    async def run_sweeper(self, interval: float = 3600):
+        """Background task: periodically sweep orphaned uploads"""
+        while True:
+            try:
+                await asyncio.to_thread(self.sweep_orphans)
+            except Exception as e:
+                logger.error(f"❌ Upload spool sweep failed: {e}")
+            await asyncio.sleep(interval)
+
+    def _remove(self, path: str) -> bool:
+        try:
+            os.remove(path)
+            return True
+        except FileNotFoundError:
+            return False
+        except OSError as e:
+            logger.warning(f"⚠️ Could not remove spooled file {path}: {e}")
+            return False
+
+
+upload_spool = UploadSpool(
+    directory=settings.UPLOAD_SPOOL_DIR,
+    max_bytes=settings.MAX_UPLOAD_BYTES,
+    orphan_max_age=settings.UPLOAD_ORPHAN_MAX_AGE_SECONDS
+)
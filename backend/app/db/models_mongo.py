@@ -264,7 +264,9 @@ class LeaderboardEntryInDB(LeaderboardEntryBase):
     id: Optional[PyObjectId] = Field(alias="_id", default=None)
     rank: Optional[int] = None
     category: str  # "daily", "weekly", "all_time"
+    period: Optional[str] = None  # "daily:2026-10-16", "weekly:2026-W42", "all_time"
     timestamp: datetime = Field(default_factory=datetime.utcnow)
+    expires_at: Optional[datetime] = None  # TTL; unset for all_time
     
     class Config:
         populate_by_name = True
@@ -2,6 +2,7 @@ from motor.motor_asyncio import AsyncIOMotorClient
 from pymongo import MongoClient
 import os
 from dotenv import load_dotenv
+from app.core.config import settings
 
 load_dotenv()
 
@@ -23,33 +24,73 @@ analysis_results_collection = async_db.analysis_results
 realtime_sessions_collection = async_db.realtime_sessions
 realtime_metrics_collection = async_db.realtime_metrics
 realtime_achievements_collection = async_db.realtime_achievements
+# Per-second / per-minute aggregates of realtime_metrics
+realtime_metrics_rollups_collection = async_db.realtime_metrics_rollups
 
 # Game Mechanics Collections
 challenges_collection = async_db.challenges
 user_challenges_collection = async_db.user_challenges
 leaderboard_collection = async_db.leaderboard
+# Version counters for cached catalogs (bumped by the seed scripts)
+catalog_versions_collection = async_db.catalog_versions
 
 # Sync collections for Celery
 sync_users_collection = sync_db.users
 sync_analysis_results_collection = sync_db.analysis_results
 
 
+async def _ensure_realtime_metrics_timeseries():
+    """Create realtime_metrics as a time-series collection if it does not exist yet"""
+    existing = await async_db.list_collection_names(filter={"name": "realtime_metrics"})
+    if existing:
+        return
+    await async_db.create_collection(
+        "realtime_metrics",
+        timeseries={"timeField": "timestamp", "metaField": "session_id", "granularity": "seconds"},
+        expireAfterSeconds=settings.REALTIME_METRICS_RETENTION_SECONDS
+    )
+    print("✅ Created realtime_metrics as a time-series collection")
+
+
 async def init_db():
     """Initialize database with indexes"""
     try:
+        # Must run before any index creation implicitly creates the collection
+        if settings.REALTIME_METRICS_TIMESERIES:
+            await _ensure_realtime_metrics_timeseries()
+        
         # Create indexes for better performance
         await users_collection.create_index("email", unique=True)
         await analysis_results_collection.create_index("user_id")
         await analysis_results_collection.create_index("task_id", unique=True)
+        # Keyset pagination for /history, globally and per user
+        await analysis_results_collection.create_index([("created_at", -1), ("_id", -1)])
+        await analysis_results_collection.create_index([("user_id", 1), ("created_at", -1), ("_id", -1)])
         await realtime_sessions_collection.create_index("session_id", unique=True)
         await realtime_sessions_collection.create_index("user_id")
+        # Session finalization aggregates by session_id
+        await realtime_metrics_collection.create_index([("session_id", 1), ("timestamp", 1)])
+        await realtime_achievements_collection.create_index("session_id")
+        # Rollups are merged on (session_id, resolution, bucket)
+        await realtime_metrics_rollups_collection.create_index(
+            [("session_id", 1), ("resolution", 1), ("bucket", 1)],
+            unique=True
+        )
         
         # Game mechanics indexes
         await challenges_collection.create_index("challenge_id", unique=True)
         await challenges_collection.create_index([("active", 1), ("expires_at", 1)])
         await user_challenges_collection.create_index([("user_id", 1), ("challenge_id", 1)])
-        await leaderboard_collection.create_index([("category", 1), ("score", -1)])
-        await leaderboard_collection.create_index([("user_id", 1), ("category", 1)])
+        await leaderboard_collection.create_index([("category", 1), ("period", 1), ("score", -1)])
+        await leaderboard_collection.create_index([("category", 1), ("period", 1), ("difficulty", 1), ("score", -1)])
+        # One row per user per bucket; legacy rows without a period are exempt
+        await leaderboard_collection.create_index(
+            [("user_id", 1), ("category", 1), ("period", 1), ("difficulty", 1)],
+            unique=True,
+            partialFilterExpression={"period": {"$exists": True}}
+        )
+        # Finished daily/weekly buckets expire on their own
+        await leaderboard_collection.create_index("expires_at", expireAfterSeconds=0)
         
         print("✅ MongoDB initialized with indexes")
     except Exception as e:
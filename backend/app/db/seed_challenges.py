@@ -6,6 +6,7 @@ Run this script to populate the database with initial challenges
 from datetime import datetime, timedelta
 from app.db.mongodb import challenges_collection
 from app.db.models_mongo import ChallengeInDB, ChallengeRequirements, ChallengeRewards
+from app.core.challenge_catalog import bump_catalog_version
 import asyncio
 
 # Daily Challenges
@@ -378,6 +379,9 @@ async def seed_challenges():
             print(f"⏭️  Challenge already exists: {challenge_data['title']}")
             skipped_count += 1
     
+    if created_count:
+        await bump_catalog_version()
+    
     print(f"\n✅ Seeded {created_count} new challenges ({skipped_count} skipped)")
     print(f"📊 Total: {len(all_challenges)} challenges")
     print(f"   - Daily: {len(DAILY_CHALLENGES) + len(DAILY_MICRO_CHALLENGES)}")
@@ -0,0 +1,32 @@
+"""
+MongoDB document serialization
+Converts ObjectIds and datetimes so documents can be returned as JSON
+"""
+
+from datetime import datetime
+from bson import ObjectId
+
+
+def serialize_doc(doc):
+    """Convert MongoDB document to JSON-serializable dict"""
+    if doc is None:
+        return None
+    result = {}
+    for key, value in doc.items():
+        if key == "_id":
+            result["id"] = str(value)
+        elif isinstance(value, ObjectId):
+            result[key] = str(value)
+        elif isinstance(value, datetime):
+            result[key] = value.isoformat()
+        elif isinstance(value, dict):
+            result[key] = serialize_doc(value)
+        elif isinstance(value, list):
+            result[key] = [
+                serialize_doc(item) if isinstance(item, dict) else 
+                str(item) if isinstance(item, ObjectId) else item
+                for item in value
+            ]
+        else:
+            result[key] = value
+    return result
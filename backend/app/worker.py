@@ -1,5 +1,6 @@
 import os
 from celery import Celery
+from celery.exceptions import Retry
 from app.core.config import settings
 
 # Get Redis URL from env or default to localhost
@@ -22,6 +23,15 @@ celery_app.conf.update(
     worker_pool="solo",
 )
 
+def _will_retry(task, exc: Exception) -> bool:
+    """True if Celery will run this task again, so its upload is still needed"""
+    if isinstance(exc, Retry):
+        return True
+    autoretry_for = tuple(getattr(task, "autoretry_for", ()) or ())
+    if not autoretry_for or not isinstance(exc, autoretry_for):
+        return False
+    return task.max_retries is None or task.request.retries < task.max_retries
+
 @celery_app.task(bind=True, name="analyze_video_task")
 def analyze_video_task(self, file_path: str):
     """
@@ -51,15 +61,43 @@ def analyze_video_task(self, file_path: str):
                 r.publish(f"task_logs:{self.task_id}", s)
             super().write(s)
 
+    from app.db.mongodb import sync_analysis_results_collection
+
+    def set_stage(stage, progress, status="PROCESSING", **fields):
+        """Record compact progress for /status (before it is announced on the log channel)"""
+        try:
+            sync_analysis_results_collection.update_one(
+                {"task_id": self.request.id},
+                {
+                    "$set": {
+                        "status": status,
+                        "stage": stage,
+                        "progress": progress,
+                        "updated_at": datetime.utcnow(),
+                        **fields
+                    },
+                    "$inc": {"status_version": 1},
+                    "$setOnInsert": {"created_at": datetime.utcnow()}
+                },
+                upsert=True
+            )
+            return True
+        except Exception as se:
+            r.publish(f"task_logs:{self.request.id}", f"Status update error: {str(se)}\n")
+            return False
+
     original_stdout = sys.stdout
     streamer = RedisStreamer(self.request.id)
     sys.stdout = streamer
+    keep_upload = False
 
     try:
         self.update_state(state='PROGRESS', meta={'status': 'Analyzing video...'})
+        set_stage("starting", 5)
         r.publish(f"task_logs:{self.request.id}", "Starting analysis pipeline...\n")
 
         # ─── STEP 1: Run Voice Analysis Tool Directly ────────────────────────────
+        set_stage("voice_analysis", 10)
         r.publish(f"task_logs:{self.request.id}", "Running voice analysis...\n")
         voice_data = {}
         try:
@@ -82,6 +120,7 @@ def analyze_video_task(self, file_path: str):
             }
 
         # ─── STEP 2: Run Facial Expressions Tool Directly ───────────────────────
+        set_stage("facial_analysis", 40)
         r.publish(f"task_logs:{self.request.id}", "Running facial expression analysis...\n")
         facial_data = {}
         try:
@@ -100,6 +139,7 @@ def analyze_video_task(self, file_path: str):
             }
 
         # ─── STEP 3: Ask LLM for Content Analysis + Feedback Based on Real Data ─
+        set_stage("content_analysis", 70)
         r.publish(f"task_logs:{self.request.id}", "Running LLM content analysis...\n")
 
         transcription = voice_data.get("transcription", "No transcription available")
@@ -118,19 +158,23 @@ def analyze_video_task(self, file_path: str):
         eye_contact = engagement.get("eye_contact_frequency", 0)
         smile_freq = engagement.get("smile_frequency", 0)
 
-        llm_prompt = f"""You are an elite public speaking coach. Analyze the following actual data from a user's speech and provide a structured JSON assessment.
+        from app.core.prompt_budget import fit_prompt, summarize_counts
+        emotion_summary = summarize_counts(emotion_counts)
+
+        def render_prompt(transcript_text):
+            return f"""You are an elite public speaking coach. Analyze the following actual data from a user's speech and provide a structured JSON assessment.
 
 ### Actual Speech Data:
-- Transcription: "{transcription}"
+- Transcription: "{transcript_text}"
 - Speech Rate: {speech_rate} WPM
 - Pitch Variation: {pitch_variation}
 - Volume Consistency: {volume_consistency}
-- Facial Emotions Detected: {json.dumps(emotion_counts)}
+- Facial Emotions Detected: {emotion_summary}
 - Eye Contact: {eye_contact:.2f}
 - Smile Frequency: {smile_freq:.2f}
 
 ### Instructions:
-1. Analyze the content based ONLY on the transcription provided.
+1. Analyze the content based ONLY on the transcription provided. Long transcriptions are excerpted; "[...]" marks omitted passages.
 2. If the transcription is empty or indicates an error, provide general public speaking coaching points in 'strengths', 'weaknesses', and 'suggestions' based on best practices, and mention that specific data was unavailable.
 3. ALWAY provide exactly 3 items in 'strengths', 'weaknesses', and 'suggestions'.
 4. Return a JSON object with the following structure:
@@ -158,35 +202,28 @@ def analyze_video_task(self, file_path: str):
 
 Return ONLY valid raw JSON."""
 
-        # Call LLM via OpenRouter directly
-        import httpx
+        # Window long transcripts so the prompt stays under the input-token cap
+        budgeted = fit_prompt(render_prompt, transcription, settings.LLM_PROMPT_MAX_TOKENS)
+        llm_prompt = budgeted.text
+        r.publish(f"task_logs:{self.request.id}", budgeted.describe() + "\n")
+        set_stage("content_analysis", 72, llm_prompt=budgeted.report())
+
+        # Call LLM via the shared gateway's background loop (pooled connections, retries on 429/5xx)
+        from app.core.llm_gateway import llm_gateway
+        from app.core.structured_output import structured_chat
+        from app.core.analysis_schema import AnalysisLLMResponse
         llm_response = {}
         try:
-            llm_response_raw = httpx.post(
-                settings.OPENROUTER_BASE_URL + "/chat/completions",
-                headers={
-                    "Authorization": f"Bearer {settings.OPENROUTER_API_KEY}",
-                    "Content-Type": "application/json"
-                },
-                json={
-                    "model": settings.OPENROUTER_MODEL,
-                    "messages": [{"role": "user", "content": llm_prompt}],
-                    "temperature": 0.1
-                },
-                timeout=60
-            )
-            llm_response_raw.raise_for_status()
-            llm_json = llm_response_raw.json()
-            llm_text = llm_json["choices"][0]["message"]["content"].strip()
-            
-            # Simple JSON extraction: find first '{' and last '}'
-            start_idx = llm_text.find('{')
-            end_idx = llm_text.rfind('}')
-            if start_idx != -1 and end_idx != -1:
-                llm_text = llm_text[start_idx:end_idx+1]
-            
-            llm_response = json.loads(llm_text)
-            r.publish(f"task_logs:{self.request.id}", "LLM content analysis finished successfully.\n")
+            # JSON mode + schema validation; damaged replies are repaired locally
+            # and only the fields that stay broken are asked for again
+            structured = llm_gateway.run_sync(structured_chat(
+                llm_gateway,
+                [{"role": "user", "content": llm_prompt}],
+                AnalysisLLMResponse,
+                temperature=0.1
+            ))
+            llm_response = structured.value.model_dump()
+            r.publish(f"task_logs:{self.request.id}", f"LLM content analysis finished successfully ({structured.describe()}).\n")
         except Exception as le:
             r.publish(f"task_logs:{self.request.id}", f"LLM Processing Error: {str(le)}\n")
             llm_response = {
@@ -196,6 +233,8 @@ Return ONLY valid raw JSON."""
             }
 
         # ─── STEP 4: Build Full Result ───────────────────────────────────────────
+        from app.core.emotion_timeline import encode_timeline
+
         def to_float(val, default=0.0):
             try:
                 return float(val)
@@ -204,7 +243,8 @@ Return ONLY valid raw JSON."""
 
         result = {
             "facial_expression_response": {
-                "emotion_timeline": emotion_timeline,
+                # Stored run-length encoded; /analysis expands it on request
+                "emotion_timeline": encode_timeline(emotion_timeline),
                 "engagement_metrics": engagement,
                 "dominant_emotion": dominant_emotion,
                 "emotion_counts": emotion_counts,
@@ -227,34 +267,42 @@ Return ONLY valid raw JSON."""
 
         # ─── STEP 5: Save to MongoDB ─────────────────────────────────────────────
         try:
-            from app.db.mongodb import sync_analysis_results_collection
-            result_doc = sync_analysis_results_collection.find_one({"task_id": self.request.id})
-            if result_doc:
-                update_data = {
-                    "status": "COMPLETED",
-                    "completed_at": datetime.utcnow(),
-                    "facial_analysis": result["facial_expression_response"],
-                    "voice_analysis": result["voice_analysis_response"],
-                    "content_analysis": result["content_analysis_response"],
-                    "feedback_analysis": result["feedback_response"],
-                    "strengths": result.get("strengths"),
-                    "weaknesses": result.get("weaknesses"),
-                    "suggestions": result.get("suggestions"),
-                    "total_score": result["feedback_response"].get("total_score", 0)
-                }
-                sync_analysis_results_collection.update_one(
-                    {"task_id": self.request.id},
-                    {"$set": update_data}
-                )
+            saved = set_stage(
+                "completed",
+                100,
+                status="COMPLETED",
+                completed_at=datetime.utcnow(),
+                facial_analysis=result["facial_expression_response"],
+                voice_analysis=result["voice_analysis_response"],
+                content_analysis=result["content_analysis_response"],
+                feedback_analysis=result["feedback_response"],
+                strengths=result.get("strengths"),
+                weaknesses=result.get("weaknesses"),
+                suggestions=result.get("suggestions"),
+                total_score=result["feedback_response"].get("total_score", 0)
+            )
+            if not saved:
+                raise RuntimeError("results could not be saved")
             r.publish(f"task_logs:{self.request.id}", "Analysis Completed Successfully.\n")
             r.publish(f"task_logs:{self.request.id}", "DONE")
         except Exception as db_e:
             r.publish(f"task_logs:{self.request.id}", f"Database Error: {str(db_e)}\n")
+            # Without the saved result the task has failed; the handler below marks it FAILED
+            raise RuntimeError(f"Results could not be saved: {db_e}") from db_e
 
         return result
 
     except Exception as e:
+        if _will_retry(self, e):
+            # The retry reads the same file; only success or the final failure discards it
+            keep_upload = True
+            raise
+        set_stage("failed", 100, status="FAILED", error=str(e))
         r.publish(f"task_logs:{self.request.id}", f"Error: {str(e)}\n")
+        r.publish(f"task_logs:{self.request.id}", "FAILED")
         raise e
     finally:
         sys.stdout = original_stdout
+        if not keep_upload:
+            from app.core.upload_spool import upload_spool
+            upload_spool.discard(file_path)
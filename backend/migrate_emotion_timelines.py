@@ -0,0 +1,60 @@
+"""
+Convert stored emotion timelines to the compact run-length encoding.
+
+Usage:
+    python migrate_emotion_timelines.py [--dry-run] [--batch-size N]
+"""
+
+import argparse
+import asyncio
+from pymongo import UpdateOne
+from app.db.mongodb import analysis_results_collection, close_db
+from app.core.emotion_timeline import encode_timeline
+
+# Legacy documents store the timeline as an array of per-frame dicts
+LEGACY_QUERY = {"facial_analysis.emotion_timeline": {"$type": "array"}}
+
+
+async def migrate_emotion_timelines(dry_run: bool = False, batch_size: int = 200):
+    total = await analysis_results_collection.count_documents(LEGACY_QUERY)
+    print(f"🔎 Found {total} analyses with expanded emotion timelines")
+
+    migrated = 0
+    batch = []
+    cursor = analysis_results_collection.find(
+        LEGACY_QUERY,
+        {"facial_analysis.emotion_timeline": 1}
+    )
+
+    async for doc in cursor:
+        compact = encode_timeline(doc["facial_analysis"]["emotion_timeline"])
+        batch.append(UpdateOne(
+            {"_id": doc["_id"], **LEGACY_QUERY},
+            {"$set": {"facial_analysis.emotion_timeline": compact}}
+        ))
+
+        if len(batch) >= batch_size:
+            migrated += await _flush(batch, dry_run)
+            batch = []
+
+    if batch:
+        migrated += await _flush(batch, dry_run)
+
+    action = "Would migrate" if dry_run else "Migrated"
+    print(f"✅ {action} {migrated} analyses")
+    await close_db()
+
+
+async def _flush(batch, dry_run: bool) -> int:
+    if dry_run:
+        return len(batch)
+    result = await analysis_results_collection.bulk_write(batch, ordered=False)
+    return result.modified_count
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--dry-run", action="store_true", help="Count documents without writing")
+    parser.add_argument("--batch-size", type=int, default=200)
+    args = parser.parse_args()
+    asyncio.run(migrate_emotion_timelines(dry_run=args.dry_run, batch_size=args.batch_size))
@@ -0,0 +1,34 @@
+"""
+Rebuild the Redis leaderboard sorted sets from MongoDB.
+
+Rows written before period buckets existed are assigned one first.
+
+Usage:
+    python rebuild_leaderboard.py [daily|weekly|all_time ...]
+"""
+
+import asyncio
+import sys
+from app.db.mongodb import close_db
+from app.core.leaderboard import LEADERBOARD_CATEGORIES, backfill_periods, leaderboard_engine
+from app.core.task_stream import close_redis
+
+
+async def rebuild_leaderboard(categories):
+    backfilled = await backfill_periods()
+    if backfilled:
+        print(f"🗂️ Assigned period buckets to {backfilled} legacy entries")
+
+    print(f"🔄 Rebuilding leaderboard: {', '.join(categories)}")
+    loaded = await leaderboard_engine.rebuild(categories)
+    print(f"✅ Loaded {loaded} entries into Redis")
+    await close_redis()
+    await close_db()
+
+
+if __name__ == "__main__":
+    categories = sys.argv[1:] or LEADERBOARD_CATEGORIES
+    unknown = [c for c in categories if c not in LEADERBOARD_CATEGORIES]
+    if unknown:
+        sys.exit(f"Unknown category: {', '.join(unknown)}")
+    asyncio.run(rebuild_leaderboard(categories))
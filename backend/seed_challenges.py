@@ -1,6 +1,7 @@
 import asyncio
 from app.db.mongodb import init_db, challenges_collection
 from app.db.models_mongo import ChallengeInDB
+from app.core.challenge_catalog import bump_catalog_version
 from datetime import datetime, timedelta
 
 DEFAULT_CHALLENGES = [
@@ -108,7 +109,8 @@ async def seed():
                 )
             print(f"🔄 Updated challenge: {challenge_data['title']}")
 
-    print("✨ Seeding complete!")
+    version = await bump_catalog_version()
+    print(f"✨ Seeding complete! (catalog v{version})")
 
 if __name__ == "__main__":
     asyncio.run(seed())
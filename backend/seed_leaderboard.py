@@ -3,6 +3,8 @@ import random
 from datetime import datetime, timedelta
 from app.db.mongodb import init_db, leaderboard_collection, close_db
 from app.db.models_mongo import LeaderboardEntryInDB
+from app.core.leaderboard import leaderboard_engine, period_bucket, period_expires_at
+from app.core.task_stream import close_redis
 
 USERNAMES = [
     "SpeechMaster", "VoicePro", "TalkativeTom", "ChattyCathy", "OratorRex",
@@ -50,7 +52,9 @@ async def seed_leaderboard():
                 difficulty=difficulty,
                 session_id=f"session_{i}_{category}",
                 category=category,
-                timestamp=timestamp
+                period=period_bucket(category, timestamp),
+                timestamp=timestamp,
+                expires_at=period_expires_at(category, timestamp)
             )
             entry_dict = entry_data.model_dump(by_alias=True)
             if entry_dict.get("_id") is None:
@@ -63,10 +67,12 @@ async def seed_leaderboard():
         
         await leaderboard_collection.insert_many(entries)
         print(f"✅ Inserted {len(entries)} leaderboard entries.")
+        await leaderboard_engine.rebuild()
     else:
         print("⚠️ No entries generated.")
 
     print("✨ Leaderboard seeding complete!")
+    await close_redis()
     await close_db()
 
 if __name__ == "__main__":
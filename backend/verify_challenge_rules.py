@@ -0,0 +1,267 @@
+"""
+Check the compiled challenge rules against the original if-chain.
+
+Random challenges are built through ChallengeInDB and serialized the way
+seed_challenges.py stores them, so unused requirement keys are present as
+null. Each one is applied to random user challenge records and session
+metrics by both implementations and the resulting records must match.
+
+Usage:
+    python verify_challenge_rules.py [iterations] [seed]
+"""
+
+import copy
+import random
+import sys
+from typing import Any, Dict
+
+from app.core.challenge_rules import CompiledChallenge
+from app.db.models_mongo import ChallengeInDB, ChallengeRequirements, ChallengeRewards
+
+
+def reference_apply(user_challenge: Dict[str, Any], requirements: Dict[str, Any],
+                    session_metrics: Dict[str, Any]) -> bool:
+    """
+    The pre-compilation _apply_requirements, with the same checks in the same
+    order. Only its presence tests changed: `"key" in requirements` became
+    `is not None`, since stored documents carry every unused key as null and
+    the old tests raised TypeError on them.
+    """
+    r = requirements
+    progress_updated = False
+
+    if r.get("min_score") is not None:
+        if session_metrics.get("average_score", 0) >= r["min_score"]:
+            user_challenge["current_value"] = session_metrics["average_score"]
+            user_challenge["target_value"] = r["min_score"]
+            user_challenge["progress"] = 100
+            user_challenge["completed"] = True
+            progress_updated = True
+
+    if r.get("min_duration") is not None:
+        current_duration = user_challenge.get("current_value", 0)
+        current_duration += session_metrics.get("duration", 0)
+        user_challenge["current_value"] = current_duration
+        user_challenge["target_value"] = r["min_duration"]
+        user_challenge["progress"] = min(100, (current_duration / r["min_duration"]) * 100)
+        if current_duration >= r["min_duration"]:
+            user_challenge["completed"] = True
+        progress_updated = True
+
+    if r.get("count") is not None:
+        current_count = user_challenge.get("current_value", 0) + 1
+        user_challenge["current_value"] = current_count
+        user_challenge["target_value"] = r["count"]
+        user_challenge["progress"] = min(100, (current_count / r["count"]) * 100)
+        if current_count >= r["count"]:
+            user_challenge["completed"] = True
+        progress_updated = True
+
+    if r.get("max_filler_words") is not None:
+        if session_metrics.get("filler_count", 999) <= r["max_filler_words"]:
+            user_challenge["current_value"] = session_metrics["filler_count"]
+            user_challenge["target_value"] = r["max_filler_words"]
+            user_challenge["progress"] = 100
+            user_challenge["completed"] = True
+            progress_updated = True
+
+    if r.get("min_combo") is not None:
+        if session_metrics.get("combo", 0) >= r["min_combo"]:
+            user_challenge["current_value"] = session_metrics["combo"]
+            user_challenge["target_value"] = r["min_combo"]
+            user_challenge["progress"] = 100
+            user_challenge["completed"] = True
+            progress_updated = True
+
+    if r.get("min_facial_score") is not None:
+        if session_metrics.get("facial_score", 0) >= r["min_facial_score"]:
+            user_challenge["current_value"] = session_metrics["facial_score"]
+            user_challenge["target_value"] = r["min_facial_score"]
+            user_challenge["progress"] = 100
+            user_challenge["completed"] = True
+            progress_updated = True
+
+    if r.get("min_eye_contact_percent") is not None:
+        eye_contact = session_metrics.get("eye_contact_avg", session_metrics.get("eye_contact_score", 0))
+        target = r["min_eye_contact_percent"]
+        user_challenge["current_value"] = eye_contact
+        user_challenge["target_value"] = target
+        if eye_contact >= target:
+            user_challenge["progress"] = 100
+            user_challenge["completed"] = True
+        else:
+            user_challenge["progress"] = min(100, (eye_contact / target) * 100)
+        progress_updated = True
+
+    if r.get("target_wpm_min") is not None and r.get("target_wpm_max") is not None:
+        wpm = session_metrics.get("speech_rate_wpm", 0)
+        wpm_min, wpm_max = r["target_wpm_min"], r["target_wpm_max"]
+        user_challenge["current_value"] = wpm
+        user_challenge["target_value"] = f"{wpm_min}-{wpm_max}"
+        if wpm_min <= wpm <= wpm_max:
+            user_challenge["progress"] = 100
+            user_challenge["completed"] = True
+        else:
+            distance = min(abs(wpm - wpm_min), abs(wpm - wpm_max))
+            user_challenge["progress"] = max(0, 100 - (distance / 50 * 100))
+        progress_updated = True
+
+    if r.get("min_facial_confidence") is not None:
+        confidence = session_metrics.get("facial_confidence", session_metrics.get("facial_score", 0))
+        target = r["min_facial_confidence"]
+        user_challenge["current_value"] = confidence
+        user_challenge["target_value"] = target
+        if confidence >= target:
+            user_challenge["progress"] = 100
+            user_challenge["completed"] = True
+        else:
+            user_challenge["progress"] = min(100, (confidence / target) * 100)
+        progress_updated = True
+
+    if r.get("min_content_clarity") is not None:
+        clarity = session_metrics.get("content_clarity", session_metrics.get("content_score", 0))
+        target = r["min_content_clarity"]
+        user_challenge["current_value"] = clarity
+        user_challenge["target_value"] = target
+        if clarity >= target:
+            user_challenge["progress"] = 100
+            user_challenge["completed"] = True
+        else:
+            user_challenge["progress"] = min(100, (clarity / target) * 100)
+        progress_updated = True
+
+    if r.get("volume_min_db") is not None and r.get("volume_max_db") is not None:
+        volume = session_metrics.get("volume_db", session_metrics.get("volume_avg", 0))
+        vol_min, vol_max = r["volume_min_db"], r["volume_max_db"]
+        user_challenge["current_value"] = volume
+        user_challenge["target_value"] = f"{vol_min}-{vol_max}"
+        if vol_min <= volume <= vol_max:
+            user_challenge["progress"] = 100
+            user_challenge["completed"] = True
+        else:
+            distance = min(abs(volume - vol_min), abs(volume - vol_max))
+            user_challenge["progress"] = max(0, 100 - (distance / 20 * 100))
+        progress_updated = True
+
+    if r.get("min_engagement_score") is not None:
+        engagement = session_metrics.get("engagement_score", 0)
+        target = r["min_engagement_score"]
+        user_challenge["current_value"] = engagement
+        user_challenge["target_value"] = target
+        if engagement >= target:
+            user_challenge["progress"] = 100
+            user_challenge["completed"] = True
+        else:
+            user_challenge["progress"] = min(100, (engagement / target) * 100)
+        progress_updated = True
+
+    if r.get("target_session_count") is not None:
+        current_count = user_challenge.get("current_value", 0) + 1
+        target = r["target_session_count"]
+        user_challenge["current_value"] = current_count
+        user_challenge["target_value"] = target
+        user_challenge["progress"] = min(100, (current_count / target) * 100)
+        if current_count >= target:
+            user_challenge["completed"] = True
+        progress_updated = True
+
+    return progress_updated
+
+
+# Requirement fields and value ranges (targets are never zero, as in the seed data)
+REQUIREMENT_FIELDS = {
+    "min_score": lambda rng: rng.randint(40, 95),
+    "min_duration": lambda rng: rng.randint(30, 1800),
+    "max_filler_words": lambda rng: rng.randint(0, 10),
+    "min_eye_contact_percent": lambda rng: rng.randint(30, 90),
+    "min_facial_confidence": lambda rng: rng.randint(30, 90),
+    "min_content_clarity": lambda rng: rng.randint(30, 90),
+    "min_engagement_score": lambda rng: rng.randint(30, 90),
+    "target_session_count": lambda rng: rng.randint(1, 10),
+}
+RANGE_FIELDS = {
+    ("target_wpm_min", "target_wpm_max"): lambda rng: sorted(rng.sample(range(80, 200), 2)),
+    ("volume_min_db", "volume_max_db"): lambda rng: sorted(rng.sample(range(-40, 0), 2)),
+}
+# Older hand-written documents carry keys the model does not declare
+LEGACY_FIELDS = {
+    "count": lambda rng: rng.randint(1, 10),
+    "min_combo": lambda rng: rng.randint(2, 20),
+    "min_facial_score": lambda rng: rng.randint(30, 90),
+}
+METRIC_FIELDS = [
+    "average_score", "duration", "filler_count", "combo", "facial_score", "eye_contact_avg",
+    "eye_contact_score", "speech_rate_wpm", "facial_confidence", "content_clarity",
+    "content_score", "volume_db", "volume_avg", "engagement_score",
+]
+
+
+def random_challenge(rng: random.Random, n: int) -> Dict[str, Any]:
+    requirements = {}
+    for key, value in REQUIREMENT_FIELDS.items():
+        if rng.random() < 0.3:
+            requirements[key] = value(rng)
+    for (low_key, high_key), values in RANGE_FIELDS.items():
+        roll = rng.random()
+        if roll < 0.3:
+            requirements[low_key], requirements[high_key] = values(rng)
+        elif roll < 0.4:
+            # Half a range: neither implementation should evaluate it
+            requirements[rng.choice((low_key, high_key))] = values(rng)[0]
+
+    challenge = ChallengeInDB(
+        challenge_id=f"verify_{n}",
+        type=rng.choice(["daily", "weekly", "achievement", "micro"]),
+        title=f"Verify {n}",
+        description="Randomized equivalence check",
+        requirements=ChallengeRequirements(**requirements),
+        rewards=ChallengeRewards(xp=rng.randint(10, 500))
+    ).dict(by_alias=True)
+
+    for key, value in LEGACY_FIELDS.items():
+        if rng.random() < 0.15:
+            challenge["requirements"][key] = value(rng)
+    return challenge
+
+
+def random_metrics(rng: random.Random) -> Dict[str, Any]:
+    return {key: rng.choice([0, rng.randint(0, 200), rng.uniform(-50, 200)])
+            for key in METRIC_FIELDS if rng.random() < 0.6}
+
+
+def random_user_challenge(rng: random.Random, challenge_id: str) -> Dict[str, Any]:
+    record = {"challenge_id": challenge_id, "progress": 0, "completed": False}
+    if rng.random() < 0.7:
+        record["current_value"] = rng.randint(0, 1000)
+    return record
+
+
+def verify(iterations: int, seed: int) -> int:
+    rng = random.Random(seed)
+    mismatches = 0
+    for n in range(iterations):
+        challenge = random_challenge(rng, n)
+        compiled = CompiledChallenge(challenge["challenge_id"], challenge["requirements"])
+        for _ in range(5):
+            metrics = random_metrics(rng)
+            record = random_user_challenge(rng, challenge["challenge_id"])
+            expected, actual = copy.deepcopy(record), copy.deepcopy(record)
+            expected_updated = reference_apply(expected, challenge["requirements"], metrics)
+            actual_updated = compiled.apply(actual, metrics)
+            if (expected_updated, expected) != (actual_updated, actual):
+                mismatches += 1
+                if mismatches <= 5:
+                    print(f"❌ Mismatch for {challenge['requirements']}")
+                    print(f"   metrics:  {metrics}")
+                    print(f"   expected: {expected_updated} {expected}")
+                    print(f"   actual:   {actual_updated} {actual}")
+    return mismatches
+
+
+if __name__ == "__main__":
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    seed = int(sys.argv[2]) if len(sys.argv) > 2 else 0
+    mismatches = verify(iterations, seed)
+    if mismatches:
+        sys.exit(f"{mismatches} mismatching evaluations")
+    print(f"✅ {iterations} random challenges evaluated identically (seed {seed})")
@@ -32,7 +32,7 @@ export function SystemConsole({ taskId, isAnalyzing, onComplete }: SystemConsole
         eventSource.onmessage = (event) => {
             const data = event.data;
 
-            if (data === "Analysis Completed.") {
+            if (data === "Analysis Completed." || data === "Analysis Failed.") {
                 eventSource.close();
                 if (onComplete) onComplete();
             }
@@ -5,7 +5,8 @@ import type {
   EmotionAnalysis,
   VoiceQualityMetrics,
   PerformanceScore,
-  SessionSummary
+  SessionSummary,
+  ChallengeProgressUpdate
 } from '@/lib/types';
 
 interface UseAICoachOptions {
@@ -17,6 +18,7 @@ interface UseAICoachOptions {
   onVoiceUpdate?: (voice: VoiceQualityMetrics) => void;
   onScoreUpdate?: (score: PerformanceScore) => void;
   onSessionSummary?: (summary: SessionSummary) => void;
+  onChallengeProgress?: (updates: ChallengeProgressUpdate[]) => void;
   onError?: (error: string) => void;
 }
 
@@ -32,6 +34,7 @@ interface UseAICoachReturn {
   currentEmotion: EmotionAnalysis | null;
   currentVoice: VoiceQualityMetrics | null;
   sessionSummary: SessionSummary | null;
+  challengeProgress: Record<string, ChallengeProgressUpdate>;
 
   // Actions
   connect: () => Promise<void>;
@@ -58,6 +61,7 @@ export function useAICoach(optionsOrSessionId?: UseAICoachOptions | string): Use
     onVoiceUpdate,
     onScoreUpdate,
     onSessionSummary,
+    onChallengeProgress,
     onError
   } = options;
 
@@ -72,6 +76,9 @@ export function useAICoach(optionsOrSessionId?: UseAICoachOptions | string): Use
   const [currentVoice, setCurrentVoice] = useState<VoiceQualityMetrics | null>(null);
   const [sessionSummary, setSessionSummary] = useState<SessionSummary | null>(null);
   const [serverTranscript, setServerTranscript] = useState<string>('');
+  const [challengeProgress, setChallengeProgress] = useState<Record<string, ChallengeProgressUpdate>>({});
+  // Coach reply being streamed token by token
+  const feedbackDraftRef = useRef<{ id: string; text: string } | null>(null);
 
   // Handle incoming WebSocket messages
   const handleMessage = useCallback((event: MessageEvent) => {
@@ -85,22 +92,7 @@ export function useAICoach(optionsOrSessionId?: UseAICoachOptions | string): Use
       }
 
       else if (type === 'analysis_result') {
-        // Real-time analysis with feedback
-        if (message.feedback) {
-          const feedback: RealtimeFeedback = {
-            type: 'feedback',
-            session_id: sessionId,
-            feedback: message.feedback,
-            facial_analysis: message.facial_analysis,
-            voice_analysis: message.voice_analysis,
-            score: message.score,
-            timestamp: message.timestamp || new Date().toISOString()
-          };
-          setCurrentFeedback(feedback);
-          onFeedback?.(feedback);
-        } else {
-          setCurrentFeedback(null);
-        }
+        // Real-time analysis; coach feedback arrives separately as coach_feedback
 
         if (message.facial_analysis) {
           // ensure confidence is mapped correctly from emotion_confidence for UI
@@ -127,6 +119,52 @@ export function useAICoach(optionsOrSessionId?: UseAICoachOptions | string): Use
         }
       }
 
+      else if (type === 'coach_feedback_delta') {
+        // A newer feedback_id means the previous reply was superseded
+        const draft = feedbackDraftRef.current;
+        const text = draft && draft.id === message.feedback_id
+          ? draft.text + message.delta
+          : message.delta;
+        feedbackDraftRef.current = { id: message.feedback_id, text };
+        setCurrentFeedback({
+          type: 'feedback',
+          session_id: sessionId,
+          feedback: text,
+          source: 'llm',
+          feedback_id: message.feedback_id,
+          streaming: true,
+          timestamp: new Date().toISOString()
+        });
+      }
+
+      else if (type === 'coach_feedback') {
+        // Generated in the background, independent of frame analysis
+        if (message.feedback_id && feedbackDraftRef.current?.id === message.feedback_id) {
+          feedbackDraftRef.current = null;
+        }
+        const feedback: RealtimeFeedback = {
+          type: 'feedback',
+          session_id: sessionId,
+          feedback: message.feedback,
+          source: message.source,
+          category: message.category,
+          feedback_id: message.feedback_id,
+          timestamp: message.timestamp || new Date().toISOString()
+        };
+        setCurrentFeedback(feedback);
+        onFeedback?.(feedback);
+      }
+
+      else if (type === 'coach_feedback_abort') {
+        // The streamed reply failed or was cancelled; drop the unfinished draft
+        if (feedbackDraftRef.current?.id === message.feedback_id) {
+          feedbackDraftRef.current = null;
+        }
+        setCurrentFeedback(prev =>
+          prev?.streaming && prev.feedback_id === message.feedback_id ? null : prev
+        );
+      }
+
       else if (type === 'voice_analysis') {
         if (message.voice) {
           setCurrentVoice(message.voice);
@@ -138,6 +176,17 @@ export function useAICoach(optionsOrSessionId?: UseAICoachOptions | string): Use
         }
       }
 
+      else if (type === 'challenge_progress') {
+        // Only changed challenges are sent; merge into the latest known state
+        const updates: ChallengeProgressUpdate[] = message.challenges || [];
+        setChallengeProgress(prev => {
+          const next = { ...prev };
+          updates.forEach(update => { next[update.challenge_id] = update; });
+          return next;
+        });
+        onChallengeProgress?.(updates);
+      }
+
       else if (type === 'session_summary') {
         setSessionSummary(message.summary);
         onSessionSummary?.(message.summary);
@@ -145,6 +194,9 @@ export function useAICoach(optionsOrSessionId?: UseAICoachOptions | string): Use
 
       else if (type === 'session_ended') {
         console.log('✅ Session ended:', message.message);
+        // A reply still streaming now will never be completed
+        feedbackDraftRef.current = null;
+        setCurrentFeedback(prev => (prev?.streaming ? null : prev));
         setSessionSummary(message.summary);
         onSessionSummary?.(message.summary);
       }
@@ -158,7 +210,7 @@ export function useAICoach(optionsOrSessionId?: UseAICoachOptions | string): Use
     } catch (err) {
       console.error('Failed to parse WebSocket message:', err);
     }
-  }, [sessionId, onFeedback, onEmotionUpdate, onVoiceUpdate, onScoreUpdate, onSessionSummary, onError]);
+  }, [sessionId, onFeedback, onEmotionUpdate, onVoiceUpdate, onScoreUpdate, onSessionSummary, onChallengeProgress, onError]);
 
   // Handle WebSocket close
   const handleClose = useCallback(() => {
@@ -277,6 +329,8 @@ export function useAICoach(optionsOrSessionId?: UseAICoachOptions | string): Use
     setCurrentEmotion(null);
     setCurrentVoice(null);
     setSessionSummary(null);
+    setChallengeProgress({});
+    feedbackDraftRef.current = null;
     setError(null);
   }, []);
 
@@ -299,6 +353,7 @@ export function useAICoach(optionsOrSessionId?: UseAICoachOptions | string): Use
     currentEmotion,
     currentVoice,
     sessionSummary,
+    challengeProgress,
     connect,
     disconnect,
     sendVideoFrame,
@@ -164,17 +164,8 @@ export async function pollAnalysis(task_id: string): Promise<ParsedAnalysisResul
         const statusData = await statusResponse.json();
 
         if (statusData.state === "SUCCESS") {
-            const data = statusData.result;
-
-            return {
-                facial: mapFacialAnalysis(data.facial_expression_response),
-                voice: mapVoiceAnalysis(data.voice_analysis_response),
-                content: mapContentAnalysis(data.content_analysis_response),
-                feedback: mapFeedbackAnalysis(data.feedback_response),
-                strengths: Array.isArray(data.strengths) ? data.strengths : [],
-                weaknesses: Array.isArray(data.weaknesses) ? data.weaknesses : [],
-                suggestions: Array.isArray(data.suggestions) ? data.suggestions : [],
-            } as ParsedAnalysisResult;
+            // /status only carries progress; the full result is served separately
+            return await getAnalysis(task_id);
 
         } else if (statusData.state === "FAILURE") {
             throw new Error(`Analysis failed: ${statusData.error || "Unknown error"}`);
@@ -50,9 +50,13 @@ export interface RealtimeFeedback {
     type: string;
     session_id: string;
     feedback: string;
-    facial_analysis: EmotionAnalysis;
-    voice_analysis: VoiceQualityMetrics;
-    score: PerformanceScore;
+    source?: 'local' | 'llm';
+    category?: string;
+    feedback_id?: string;
+    streaming?: boolean;
+    facial_analysis?: EmotionAnalysis;
+    voice_analysis?: VoiceQualityMetrics;
+    score?: PerformanceScore;
     timestamp: string;
 }
 
@@ -238,6 +242,16 @@ export interface ActiveSessionChallenge {
     requirements: ChallengeRequirements;
 }
 
+// Pushed over /ws/practice when in-session progress changes
+export interface ChallengeProgressUpdate {
+    challenge_id: string;
+    title: string;
+    progress: number;
+    current_value: number | string;
+    target_value: number | string;
+    completed: boolean;
+}
+
 export interface ActiveSessionChallengesResponse {
     challenges: ActiveSessionChallenge[];
     by_category: Record<SkillCategory, ActiveSessionChallenge[]>;